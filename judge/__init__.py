@@ -0,0 +1,7 @@
+# _*_ coding:utf-8 _*_
+"""
+评测子系统
+
+提交的代码在受资源限制（rlimit）的子进程中运行，
+评测结果写回 Submission / TestCaseResult。
+"""
@@ -0,0 +1,377 @@
+# _*_ coding:utf-8 _*_
+"""
+评测吞吐量与延迟基准测试
+
+在一台 Linux 机器上离线运行：创建一个基准测试用户和一道"求 n 个整数之和"的编程题（TestCase 数据按随机种子生成），
+为每种已注册且本机安装了编译器/解释器的语言生成通过、答案错误、超时、超内存、运行错误、编译错误六类提交，
+全部入队后启动一个评测进程池（--once 模式）评测完，统计吞吐量、各阶段耗时分布和 CPU 效率，最后删除创建的数据。
+
+各阶段耗时来自提交记录（见 judge.stats.stage_stats）。CPU 时间取自 /proc/stat 中本节点评测用核的忙碌时间，
+包括评测进程、编译器、启动器和被评测程序，机器上的其他负载也会计入，应在空闲的机器上运行。
+同一随机种子和参数生成的题目和代码相同，每次运行的代码带有唯一的注释，编译缓存和评测结果复用不会命中
+（same_code=True 时同一语言同一类型的提交使用相同代码，用于测量缓存命中时的性能）。
+"""
+import os
+import random
+import shutil
+import socket
+import time
+import uuid
+
+from django.db import transaction
+from django.db.models import Sum
+
+from own_models.custom_user_models import CustomUser
+from own_models.judge_models import JudgeNode, JudgeTask, JudgeWorkerHeartbeat
+from own_models.problem_models import Problem
+from own_models.student_practice import Submission, TestCase, TestCaseResult
+from judge.cores import node_cpus
+from judge.languages import registered_languages
+from judge.pool import WorkerPool
+from judge.stats import UNFINISHED_STATUSES, node_stats, stage_stats
+from judge.task_queue import enqueue_submission
+
+# 提交类型：(键, 名称)
+KINDS = (
+    ('accepted', '通过'),
+    ('wrong_answer', '答案错误'),
+    ('time_limit', '超时'),
+    ('memory_limit', '超内存'),
+    ('runtime_error', '运行错误'),
+    ('compile_error', '编译错误'),
+)
+
+# 语言 -> 提交类型 -> (代码, 期望的评测状态)
+# 输入为第一行 n、第二行 n 个整数，输出它们的和
+PROGRAMS = {
+    'python': {
+        'accepted': ("import sys\n"
+                     "data = sys.stdin.buffer.read().split()\n"
+                     "print(sum(map(int, data[1:])))\n", 'accepted'),
+        'wrong_answer': ("import sys\n"
+                         "data = sys.stdin.buffer.read().split()\n"
+                         "print(sum(map(int, data[1:])) + 1)\n", 'wrong_answer'),
+        'time_limit': ("while True:\n"
+                       "    pass\n", 'time_limit_exceeded'),
+        'memory_limit': ("blocks = []\n"
+                         "while True:\n"
+                         "    blocks.append(bytearray(1 << 20))\n", 'memory_limit_exceeded'),
+        'runtime_error': ("import sys\n"
+                          "sys.stdin.read()\n"
+                          "print(1 // 0)\n", 'runtime_error'),
+        # Python 没有编译步骤，语法错误表现为运行错误
+        'compile_error': ("print(\n", 'runtime_error'),
+    },
+    'cpp': {
+        'accepted': ("#include <cstdio>\n"
+                     "int main() {\n"
+                     "    int n; long long s = 0, x;\n"
+                     "    if (scanf(\"%d\", &n) != 1) return 0;\n"
+                     "    for (int i = 0; i < n; i++) { scanf(\"%lld\", &x); s += x; }\n"
+                     "    printf(\"%lld\\n\", s);\n"
+                     "}\n", 'accepted'),
+        'wrong_answer': ("#include <cstdio>\n"
+                         "int main() {\n"
+                         "    int n; long long s = 0, x;\n"
+                         "    if (scanf(\"%d\", &n) != 1) return 0;\n"
+                         "    for (int i = 0; i < n; i++) { scanf(\"%lld\", &x); s += x; }\n"
+                         "    printf(\"%lld\\n\", s + 1);\n"
+                         "}\n", 'wrong_answer'),
+        'time_limit': ("int main() {\n"
+                       "    volatile unsigned long long i = 0;\n"
+                       "    for (;;) i++;\n"
+                       "}\n", 'time_limit_exceeded'),
+        'memory_limit': ("#include <vector>\n"
+                         "int main() {\n"
+                         "    std::vector<std::vector<char>> blocks;\n"
+                         "    for (;;) blocks.emplace_back(1 << 20, 1);\n"
+                         "}\n", 'memory_limit_exceeded'),
+        'runtime_error': ("int main() {\n"
+                          "    volatile int *p = nullptr;\n"
+                          "    *p = 1;\n"
+                          "}\n", 'runtime_error'),
+        'compile_error': ("int main() {\n"
+                          "    return undefined_name;\n"
+                          "}\n", 'compile_error'),
+    },
+    'c': {
+        'accepted': ("#include <stdio.h>\n"
+                     "int main(void) {\n"
+                     "    int n; long long s = 0, x;\n"
+                     "    if (scanf(\"%d\", &n) != 1) return 0;\n"
+                     "    for (int i = 0; i < n; i++) { scanf(\"%lld\", &x); s += x; }\n"
+                     "    printf(\"%lld\\n\", s);\n"
+                     "    return 0;\n"
+                     "}\n", 'accepted'),
+        'wrong_answer': ("#include <stdio.h>\n"
+                         "int main(void) {\n"
+                         "    int n; long long s = 0, x;\n"
+                         "    if (scanf(\"%d\", &n) != 1) return 0;\n"
+                         "    for (int i = 0; i < n; i++) { scanf(\"%lld\", &x); s += x; }\n"
+                         "    printf(\"%lld\\n\", s + 1);\n"
+                         "    return 0;\n"
+                         "}\n", 'wrong_answer'),
+        'time_limit': ("int main(void) {\n"
+                       "    volatile unsigned long long i = 0;\n"
+                       "    for (;;) i++;\n"
+                       "}\n", 'time_limit_exceeded'),
+        'memory_limit': ("#include <stdlib.h>\n"
+                         "#include <string.h>\n"
+                         "int main(void) {\n"
+                         "    for (;;) {\n"
+                         "        char *block = malloc(1 << 20);\n"
+                         "        memset(block, 1, 1 << 20);\n"
+                         "    }\n"
+                         "}\n", 'memory_limit_exceeded'),
+        'runtime_error': ("int main(void) {\n"
+                          "    volatile int *p = 0;\n"
+                          "    *p = 1;\n"
+                          "    return 0;\n"
+                          "}\n", 'runtime_error'),
+        'compile_error': ("int main(void) {\n"
+                          "    return undefined_name;\n"
+                          "}\n", 'compile_error'),
+    },
+    'java': {
+        'accepted': ("import java.io.*;\n"
+                     "public class Main {\n"
+                     "    public static void main(String[] args) throws IOException {\n"
+                     "        StreamTokenizer in = new StreamTokenizer(new BufferedInputStream(System.in));\n"
+                     "        in.nextToken();\n"
+                     "        int n = (int) in.nval;\n"
+                     "        long s = 0;\n"
+                     "        for (int i = 0; i < n; i++) { in.nextToken(); s += (long) in.nval; }\n"
+                     "        System.out.println(s);\n"
+                     "    }\n"
+                     "}\n", 'accepted'),
+        'wrong_answer': ("import java.io.*;\n"
+                         "public class Main {\n"
+                         "    public static void main(String[] args) throws IOException {\n"
+                         "        StreamTokenizer in = new StreamTokenizer(new BufferedInputStream(System.in));\n"
+                         "        in.nextToken();\n"
+                         "        int n = (int) in.nval;\n"
+                         "        long s = 0;\n"
+                         "        for (int i = 0; i < n; i++) { in.nextToken(); s += (long) in.nval; }\n"
+                         "        System.out.println(s + 1);\n"
+                         "    }\n"
+                         "}\n", 'wrong_answer'),
+        'time_limit': ("public class Main {\n"
+                       "    public static void main(String[] args) {\n"
+                       "        long i = 0;\n"
+                       "        while (true) i++;\n"
+                       "    }\n"
+                       "}\n", 'time_limit_exceeded'),
+        'memory_limit': ("import java.util.*;\n"
+                         "public class Main {\n"
+                         "    public static void main(String[] args) {\n"
+                         "        List<long[]> blocks = new ArrayList<>();\n"
+                         "        while (true) blocks.add(new long[1 << 17]);\n"
+                         "    }\n"
+                         "}\n", 'memory_limit_exceeded'),
+        'runtime_error': ("public class Main {\n"
+                          "    public static void main(String[] args) {\n"
+                          "        throw new IllegalStateException(\"benchmark\");\n"
+                          "    }\n"
+                          "}\n", 'runtime_error'),
+        'compile_error': ("public class Main {\n"
+                          "    public static void main(String[] args) {\n"
+                          "        int x = \"benchmark\";\n"
+                          "    }\n"
+                          "}\n", 'compile_error'),
+    },
+    'javascript': {
+        'accepted': ("const data = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/).map(Number);\n"
+                     "let s = 0;\n"
+                     "for (let i = 1; i < data.length; i++) s += data[i];\n"
+                     "console.log(String(s));\n", 'accepted'),
+        'wrong_answer': ("const data = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/).map(Number);\n"
+                         "let s = 0;\n"
+                         "for (let i = 1; i < data.length; i++) s += data[i];\n"
+                         "console.log(String(s + 1));\n", 'wrong_answer'),
+        'time_limit': ("for (;;) {}\n", 'time_limit_exceeded'),
+        'memory_limit': ("const blocks = [];\n"
+                         "for (;;) blocks.push(new Array(1 << 20).fill(1));\n", 'memory_limit_exceeded'),
+        'runtime_error': ("throw new Error('benchmark');\n", 'runtime_error'),
+        # JavaScript 没有编译步骤，语法错误表现为运行错误
+        'compile_error': ("console.log(;\n", 'runtime_error'),
+    },
+}
+
+# 各语言的行注释，用于让每条提交的代码唯一
+COMMENTS = {'python': '#'}
+
+
+class BenchmarkError(Exception):
+    """当前环境不能运行基准测试"""
+
+
+def available_languages(keys=None):
+    """
+    本机可以运行基准测试的语言
+
+    返回 (可用的 LanguageRunner 列表, {语言: 不可用原因})；keys 为 None 时检查全部已注册语言。
+    """
+    available = []
+    skipped = {}
+    for runner in registered_languages():
+        if keys is not None and runner.key not in keys:
+            continue
+        if runner.key not in PROGRAMS:
+            skipped[runner.key] = 'no benchmark programs'
+            continue
+        # 编译产物（./main）在评测时才生成
+        commands = [runner.compile[0]] if runner.compile else []
+        if not runner.run[0].startswith('./'):
+            commands.append(runner.run[0])
+        missing = [command for command in commands if shutil.which(command) is None]
+        if missing:
+            skipped[runner.key] = f"{', '.join(missing)} not found"
+            continue
+        available.append(runner)
+    return available, skipped
+
+
+def _check_idle():
+    """基准测试独占评测队列，队列中有任务或有其他评测节点在运行时不能开始"""
+    if JudgeTask.objects.exists():
+        raise BenchmarkError('The judge queue is not empty')
+    if Submission.objects.filter(status__in=UNFINISHED_STATUSES).exists():
+        raise BenchmarkError('There are submissions waiting to be judged')
+    alive = [node['name'] for node in node_stats() if node['alive']]
+    if alive:
+        raise BenchmarkError(f"Judge nodes are running: {', '.join(alive)}")
+
+
+def _seed(runners, per_kind, cases, case_size, seed, time_limit, memory_limit, same_code):
+    """创建用户、题目、测试用例和提交并入队，返回 (用户, {提交 ID: (语言, 提交类型, 期望状态)})"""
+    rng = random.Random(seed)
+    token = uuid.uuid4().hex[:12]
+    corpus = {}
+    with transaction.atomic():
+        # 不可登录的密码
+        user = CustomUser.objects.create(username=f'judge_benchmark_{token}', password='!', usercode=f'benchmark_{token}',
+                                         role=1)
+        problem = Problem.objects.create(
+            title=f'Judge benchmark {token}', description='Sum of n integers', created_by=user, problem_type=4,
+            time_limit=time_limit, memory_limit=memory_limit,
+        )
+        for index in range(cases):
+            numbers = [rng.randint(-10 ** 9, 10 ** 9) for _ in range(case_size)]
+            TestCase.objects.create(
+                problem=problem,
+                input_data=f"{case_size}\n{' '.join(map(str, numbers))}\n",
+                expected_output=f'{sum(numbers)}\n',
+            )
+        # 交错各语言和类型，队列中相邻的提交彼此不同
+        for repeat in range(per_kind):
+            for kind, name in KINDS:
+                for runner in runners:
+                    code, expected = PROGRAMS[runner.key][kind]
+                    if not same_code:
+                        code += f"{COMMENTS.get(runner.key, '//')} benchmark {token} {repeat}\n"
+                    submission = Submission.objects.create(user=user, problem=problem, code=code,
+                                                           language=runner.key)
+                    enqueue_submission(submission)
+                    corpus[submission.id] = (runner.key, kind, expected)
+    return user, corpus
+
+
+def _busy_seconds(cpus):
+    """/proc/stat 中这些核累计的忙碌时间（秒）"""
+    wanted = {f'cpu{cpu}' for cpu in cpus}
+    busy = 0
+    with open('/proc/stat') as f:
+        for line in f:
+            fields = line.split()
+            if fields and fields[0] in wanted:
+                # user nice system idle iowait irq softirq steal ...
+                values = [int(value) for value in fields[1:9]]
+                busy += sum(values) - values[3] - values[4]
+    return busy / os.sysconf('SC_CLK_TCK')
+
+
+def _cleanup(user, node_name):
+    """删除基准测试创建的数据，提交、测试用例和结果随用户级联删除"""
+    user.delete()
+    JudgeNode.objects.filter(name=node_name).delete()
+    JudgeWorkerHeartbeat.objects.filter(node=node_name).delete()
+
+
+def run_benchmark(languages=None, per_kind=3, cases=5, case_size=1000, processes=None, concurrency=1,
+                  pin_cpus=True, seed=1, time_limit=1000, memory_limit=128, same_code=False, keep=False):
+    """
+    运行一次基准测试并返回结果
+
+    languages 为语言键列表，None 表示全部可用语言；per_kind 为每种语言每类提交的数量。
+    返回 dict：
+    - submissions / wall_s / per_second：提交数、评测总耗时和吞吐量
+    - stages：各阶段耗时分布，见 judge.stats.stage_stats
+    - cpu_s / cpu_utilization / program_cpu_share / cpu_ms_per_submission：评测用核的忙碌时间、
+      占这些核总时间的比例、其中被评测程序（各测试用例 CPU 时间之和）的占比和每条提交的 CPU 时间
+    - languages：[{'language', 'judged', 'avg_judge_ms', 'avg_compile_ms', 'unexpected'}]
+    - kinds：[{'kind', 'name', 'judged', 'statuses', 'unexpected'}]，statuses 为各评测状态的数量
+    - skipped：{语言: 不可用原因}
+    """
+    runners, skipped = available_languages(languages)
+    if not runners:
+        raise BenchmarkError('No language is available for the benchmark')
+    _check_idle()
+
+    user, corpus = _seed(runners, per_kind, cases, case_size, seed, time_limit, memory_limit, same_code)
+    pool = WorkerPool(processes=processes, concurrency=concurrency, pin_cpus=pin_cpus, exit_when_empty=True,
+                      name_prefix=f'benchmark-{socket.gethostname()}-{os.getpid()}')
+    cores = sorted(set(pool.cpus)) if pin_cpus else node_cpus()
+    try:
+        cpu_before = _busy_seconds(cores)
+        started = time.monotonic()
+        pool.run()
+        wall = time.monotonic() - started
+        cpu = _busy_seconds(cores) - cpu_before
+
+        submissions = Submission.objects.filter(id__in=list(corpus))
+        rows = list(submissions.values_list('id', 'status', 'judge_time', 'compile_time'))
+        program_ms = TestCaseResult.objects.filter(submission__in=submissions).aggregate(
+            total=Sum('execution_time')
+        )['total'] or 0
+        report = {
+            'submissions': len(rows),
+            'processes': pool.processes,
+            'concurrency': concurrency,
+            'wall_s': round(wall, 3),
+            'per_second': round(len(rows) / wall, 3) if wall else 0,
+            'stages': stage_stats(submissions),
+            'cpu_s': round(cpu, 3),
+            'cpu_utilization': round(cpu / (wall * len(cores)), 3) if wall else 0,
+            'program_cpu_share': round(program_ms / 1000 / cpu, 3) if cpu else 0,
+            'cpu_ms_per_submission': int(cpu * 1000 / len(rows)) if rows else 0,
+            'languages': [],
+            'kinds': [],
+            'skipped': skipped,
+        }
+
+        for runner in runners:
+            judged = [(status, judge_ms, compile_ms, corpus[sid]) for sid, status, judge_ms, compile_ms in rows
+                      if corpus[sid][0] == runner.key]
+            report['languages'].append({
+                'language': runner.key,
+                'judged': len(judged),
+                'avg_judge_ms': int(sum(row[1] for row in judged) / len(judged)) if judged else 0,
+                'avg_compile_ms': int(sum(row[2] for row in judged) / len(judged)) if judged else 0,
+                'unexpected': sum(1 for status, judge_ms, compile_ms, info in judged if status != info[2]),
+            })
+        for kind, name in KINDS:
+            statuses = {}
+            unexpected = 0
+            for sid, status, judge_ms, compile_ms in rows:
+                if corpus[sid][1] != kind:
+                    continue
+                statuses[status] = statuses.get(status, 0) + 1
+                unexpected += status != corpus[sid][2]
+            report['kinds'].append({
+                'kind': kind, 'name': name, 'judged': sum(statuses.values()), 'statuses': statuses,
+                'unexpected': unexpected,
+            })
+        return report
+    finally:
+        if not keep:
+            _cleanup(user, pool.name_prefix)
@@ -0,0 +1,425 @@
+# _*_ coding:utf-8 _*_
+"""
+流式输出比对
+
+程序输出和标准答案都按固定大小的块读取（标准答案通过 mmap 映射），逐块比较，
+遇到第一处不一致立即停止，比对过程占用的内存与输出大小无关。
+
+比对模式与 Problem.CHECKER_MODE_CHOICES 对应：
+- exact: 逐字节完全一致
+- trailing_whitespace: 忽略行末空白和末尾空行
+- tokens: 按空白分隔的单词逐个比较
+- float: 同 tokens，两边都是数字时允许 epsilon 的绝对或相对误差
+
+标准答案规范化后的形式（去掉行末空白后的字节串、切分好的单词和行号）按测试数据内容哈希
+缓存在评测进程内（ExpectedOutputCache），热门题目的标准答案在每个评测进程中只规范化一次。
+"""
+import functools
+import math
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from judge.sandbox import open_output
+
+CHUNK_SIZE = 64 * 1024
+# 差异摘要中每一侧最多显示的字节数
+EXCERPT_LENGTH = 40
+
+LINE_WHITESPACE = b' \t\r\f\v'
+_TOKEN = re.compile(rb'\S+')
+
+
+class CheckResult(object):
+    """比对结果，不一致时 message 为简短的差异摘要"""
+
+    def __init__(self, accepted, message=None):
+        self.accepted = accepted
+        self.message = message
+
+    def __bool__(self):
+        return self.accepted
+
+
+@contextmanager
+def _open_mapped(path):
+    """只读映射文件；空文件无法映射，返回空字节串"""
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b''
+            return
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def _file_chunks(f):
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _mapped_chunks(mapped):
+    for start in range(0, len(mapped), CHUNK_SIZE):
+        yield mapped[start:start + CHUNK_SIZE]
+
+
+def _stripped_lines(chunks):
+    """
+    忽略行末空白和末尾空行后的字节流
+
+    行末空白只有在确认其后是换行或文件结束时才丢弃，空行计数到出现下一段内容时才补上。
+    每个输入块处理完后把得到的片段拼成一块产出，避免逐行产出的小片段让比较循环次数随行数增长。
+    """
+    pending_space = b''
+    pending_newlines = 0
+    for chunk in chunks:
+        pieces = chunk.split(b'\n')
+        out = []
+        for index, piece in enumerate(pieces):
+            content = piece.rstrip(LINE_WHITESPACE)
+            if content:
+                if pending_newlines:
+                    out.append(b'\n' * pending_newlines)
+                    pending_newlines = 0
+                out.append(pending_space + content)
+                pending_space = piece[len(content):]
+            else:
+                pending_space += piece
+            # 除最后一段外，每段后面都跟着一个换行
+            if index < len(pieces) - 1:
+                pending_space = b''
+                pending_newlines += 1
+        if out:
+            yield b''.join(out)
+
+
+def _token_line(chunk, start_line, shift, carry_line, index):
+    """块中第 index 个单词所在的行号，只在出现差异时计算"""
+    if index == 0 and carry_line is not None:
+        return carry_line
+    for number, match in enumerate(_TOKEN.finditer(chunk)):
+        if number == index - shift:
+            return start_line + chunk.count(b'\n', 0, match.start())
+    return start_line
+
+
+def _token_batches(chunks):
+    """
+    按块切分单词，产出 (单词列表, 计算第 k 个单词行号的函数)
+
+    跨块的单词拼接后放到下一批的开头。
+    """
+    line = 1
+    carry = b''
+    carry_line = 1
+    for chunk in chunks:
+        tokens = chunk.split()
+        # 批内下标与本块中正则匹配下标的差
+        shift = 0
+        first_line = None
+        if carry:
+            first_line = carry_line
+            if tokens and not chunk[:1].isspace():
+                tokens[0] = carry + tokens[0]
+            else:
+                tokens.insert(0, carry)
+                shift = 1
+        carry = b''
+        if tokens and not chunk[-1:].isspace():
+            # 最后一个单词可能延续到下一块
+            if len(tokens) == 1 and first_line is not None:
+                carry_line = first_line
+            else:
+                carry_line = line + chunk.count(b'\n')
+            carry = tokens.pop()
+        yield tokens, functools.partial(_token_line, chunk, line, shift, first_line)
+        line += chunk.count(b'\n')
+    if carry:
+        yield [carry], lambda index: carry_line
+
+
+def _show(data):
+    if data is None:
+        return '<EOF>'
+    return repr(data[:EXCERPT_LENGTH].decode('utf-8', errors='replace'))
+
+
+def _compare_streams(expected_chunks, output_chunks):
+    """逐块比较两个字节流，不一致时给出行号和差异附近的内容"""
+    expected_chunks = iter(expected_chunks)
+    output_chunks = iter(output_chunks)
+    expected = output = b''
+    line = 1
+    # 已比较部分中当前行的内容，用于差异摘要
+    line_prefix = b''
+    while True:
+        if not expected:
+            expected = next(expected_chunks, None)
+        if not output:
+            output = next(output_chunks, None)
+        if expected is None and output is None:
+            return CheckResult(True)
+        if expected is None or output is None:
+            index = 0
+        else:
+            length = min(len(expected), len(output))
+            if expected[:length] == output[:length]:
+                common = expected[:length]
+                newline = common.rfind(b'\n')
+                if newline >= 0:
+                    line += common.count(b'\n')
+                    line_prefix = common[newline + 1:][-EXCERPT_LENGTH:]
+                else:
+                    line_prefix = (line_prefix + common)[-EXCERPT_LENGTH:]
+                expected, output = expected[length:], output[length:]
+                continue
+            index = next(i for i in range(length) if expected[i] != output[i])
+
+        common = (expected or output)[:index]
+        newline = common.rfind(b'\n')
+        if newline >= 0:
+            line += common.count(b'\n')
+            line_prefix = common[newline + 1:]
+        else:
+            line_prefix += common
+        line_prefix = line_prefix[-EXCERPT_LENGTH // 2:]
+
+        def excerpt(data, chunks):
+            if data is None:
+                return '<EOF>' if not line_prefix else _show(line_prefix) + ' <EOF>'
+            rest = data[index:]
+            # 差异可能正好落在块的末尾，再多读一点补全这一行
+            while b'\n' not in rest and len(rest) < EXCERPT_LENGTH:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                rest += chunk
+            return _show(line_prefix + rest.split(b'\n', 1)[0])
+
+        return CheckResult(False, f"Line {line}: expected {excerpt(expected, expected_chunks)}, "
+                                  f"got {excerpt(output, output_chunks)}")
+
+
+def _numbers_close(expected, output, epsilon):
+    try:
+        expected_value, output_value = float(expected), float(output)
+    except ValueError:
+        return False
+    if math.isnan(expected_value) or math.isnan(output_value):
+        return math.isnan(expected_value) and math.isnan(output_value)
+    return math.isclose(expected_value, output_value, rel_tol=epsilon, abs_tol=epsilon)
+
+
+class _TokenReader(object):
+    def __init__(self, chunks=None, batches=None):
+        self.batches = _token_batches(chunks) if batches is None else batches
+        self.tokens = []
+        self.line_of = None
+        self.position = 0
+
+    def fill(self):
+        """当前批次读完时读取下一批，返回是否还有单词"""
+        while self.position >= len(self.tokens):
+            batch = next(self.batches, None)
+            if batch is None:
+                return False
+            self.tokens, self.line_of = batch
+            self.position = 0
+        return True
+
+    def current(self, offset=0):
+        return self.tokens[self.position + offset]
+
+
+def _compare_tokens(expected, output, epsilon=None):
+    """expected / output 为 _TokenReader"""
+    compared = 0
+    while True:
+        has_expected, has_output = expected.fill(), output.fill()
+        if not has_expected and not has_output:
+            return CheckResult(True)
+        mismatch = 0
+        if has_expected and has_output:
+            count = min(len(expected.tokens) - expected.position, len(output.tokens) - output.position)
+            # 整段相同时直接跳过，只有不同时才逐个比较
+            if expected.tokens[expected.position:expected.position + count] \
+                    != output.tokens[output.position:output.position + count]:
+                for mismatch in range(count):
+                    expected_token, output_token = expected.current(mismatch), output.current(mismatch)
+                    if expected_token != output_token and \
+                            (epsilon is None or not _numbers_close(expected_token, output_token, epsilon)):
+                        break
+                else:
+                    mismatch = None
+            else:
+                mismatch = None
+            if mismatch is None:
+                expected.position += count
+                output.position += count
+                compared += count
+                continue
+
+        expected_token = expected.current(mismatch) if has_expected else None
+        output_token = output.current(mismatch) if has_output else None
+        if has_output:
+            line = output.line_of(output.position + mismatch)
+        else:
+            line = expected.line_of(expected.position + mismatch)
+        return CheckResult(False, f"Token {compared + mismatch + 1} (line {line}): "
+                                  f"expected {_show(expected_token)}, got {_show(output_token)}")
+
+
+class NormalizedTokens(object):
+    """切分好的标准答案单词及每个单词所在的行号"""
+
+    # 每个单词的额外内存开销估计：bytes 对象头 + 列表指针 + 行号
+    TOKEN_OVERHEAD = 33 + 8 + 4
+
+    def __init__(self, data):
+        self.tokens = []
+        self.lines = array('I')
+        for number, line in enumerate(data.split(b'\n'), 1):
+            tokens = line.split()
+            if tokens:
+                self.tokens.extend(tokens)
+                self.lines.extend([number] * len(tokens))
+        self.size = sum(len(token) for token in self.tokens) + len(self.tokens) * self.TOKEN_OVERHEAD
+
+    def batches(self):
+        yield self.tokens, self.lines.__getitem__
+
+
+def _normalize(kind, data):
+    if kind == 'lines':
+        return b''.join(_stripped_lines([data]))
+    return NormalizedTokens(data)
+
+
+class ExpectedOutputCache(object):
+    """
+    规范化后的标准答案的 LRU 缓存，按占用字节数淘汰
+
+    键为 (测试数据 SHA-256, 规范化方式)，内容寻址所以不需要失效；各评测进程各自持有一份，
+    命中率通过评测进程心跳上报（见 judge.stats.worker_stats）。
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sha256, kind, path):
+        """
+        规范化后的标准答案；文件本身已超过缓存上限时返回 None，不把整个文件读入内存，
+        由调用者逐块流式比对
+        """
+        key = (sha256, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        if os.path.getsize(path) > self.max_bytes:
+            return None
+        with _open_mapped(path) as data:
+            normalized = _normalize(kind, data[:])
+        size = len(normalized) if kind == 'lines' else normalized.size
+        if size > self.max_bytes:
+            return normalized
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (normalized, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    evicted, evicted_size = self._entries.popitem(last=False)[1]
+                    self.bytes -= evicted_size
+        return normalized
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self.bytes}
+
+
+_expected_cache = None
+
+
+def get_expected_cache():
+    """当前进程的标准答案缓存，未启用时返回 None"""
+    global _expected_cache
+    from judge.conf import judge_setting
+
+    max_bytes = judge_setting('JUDGE_EXPECTED_CACHE_MAX_BYTES')
+    if not max_bytes:
+        return None
+    if _expected_cache is None:
+        _expected_cache = ExpectedOutputCache(max_bytes)
+    return _expected_cache
+
+
+def _check_normalized(output_file, expected_hash, expected_path, mode, epsilon):
+    """标准答案取自缓存的比对，不支持缓存或标准答案过大时返回 None"""
+    cache = get_expected_cache() if mode in ('trailing_whitespace', 'tokens', 'float') else None
+    if cache is None:
+        return None
+    output_chunks = _file_chunks(output_file)
+    if mode == 'trailing_whitespace':
+        expected = cache.get(expected_hash, 'lines', expected_path)
+        if expected is None:
+            return None
+        return _compare_streams(_mapped_chunks(expected), _stripped_lines(output_chunks))
+    expected = cache.get(expected_hash, 'tokens', expected_path)
+    if expected is None:
+        return None
+    return _compare_tokens(_TokenReader(batches=expected.batches()), _TokenReader(output_chunks),
+                           epsilon if mode == 'float' else None)
+
+
+def check_output(output_path, expected_path, mode='trailing_whitespace', epsilon=1e-6, expected_hash=None):
+    """
+    比较程序输出文件和标准答案文件
+
+    expected_hash 为标准答案的 SHA-256，提供时规范化后的标准答案从进程内缓存读取。
+    返回 CheckResult，不一致时 message 形如 "Line 3: expected '1 2', got '1 3'"
+    """
+    try:
+        output_file = open_output(output_path)
+    except OSError:
+        # 被换成了符号链接等
+        return CheckResult(False, 'Output is not a regular file')
+    with output_file:
+        if expected_hash:
+            result = _check_normalized(output_file, expected_hash, expected_path, mode, epsilon)
+            if result is not None:
+                return result
+            output_file.seek(0)
+        return _check_files(output_file, expected_path, mode, epsilon)
+
+
+def _check_files(output_file, expected_path, mode, epsilon):
+    with _open_mapped(expected_path) as expected_data:
+        expected_chunks = _mapped_chunks(expected_data)
+        output_chunks = _file_chunks(output_file)
+        if mode == 'exact':
+            return _compare_streams(expected_chunks, output_chunks)
+        if mode == 'trailing_whitespace':
+            return _compare_streams(_stripped_lines(expected_chunks), _stripped_lines(output_chunks))
+        if mode == 'tokens':
+            return _compare_tokens(_TokenReader(expected_chunks), _TokenReader(output_chunks))
+        if mode == 'float':
+            return _compare_tokens(_TokenReader(expected_chunks), _TokenReader(output_chunks), epsilon)
+    raise ValueError(f"Unknown checker mode: {mode}")
@@ -0,0 +1,181 @@
+# _*_ coding:utf-8 _*_
+"""
+编译结果缓存
+
+以 hash(规范化源码, 语言, 编译器版本, 编译参数) 为键，把编译产物保存在本地磁盘上，
+相同代码（或只有行尾空白、换行符不同）再次提交时跳过编译。
+缓存目录总大小超过上限时按最近使用时间淘汰。
+多个评测进程共用同一个缓存目录，写入时先写临时目录再原子重命名。
+"""
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from judge.sandbox import private_directory
+
+logger = logging.getLogger(__name__)
+
+# 编译日志和编译失败标记的文件名
+LOG_FILE = 'compile.log'
+FAILED_FILE = 'FAILED'
+
+_compiler_versions = {}
+_lock = threading.Lock()
+
+
+def normalize_source(source):
+    """
+    规范化源码：统一换行符、去掉行尾空白和末尾空行
+
+    不删除开头和中间的空行，保证编译错误中的行号不变。
+    """
+    lines = source.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).rstrip('\n') + '\n'
+
+
+def compiler_version(command):
+    """编译器版本信息（每个进程只查询一次）"""
+    key = tuple(command)
+    if key not in _compiler_versions:
+        try:
+            completed = subprocess.run(command, capture_output=True, timeout=10)
+            version = (completed.stdout + completed.stderr).decode('utf-8', errors='replace').strip()
+        except (OSError, subprocess.TimeoutExpired):
+            version = ''
+        _compiler_versions[key] = version
+    return _compiler_versions[key]
+
+
+class CompileCache(object):
+    """磁盘上的编译产物缓存"""
+
+    def __init__(self, directory, max_bytes, scan_interval=50):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # 每写入多少个条目做一次完整的目录大小统计
+        self.scan_interval = scan_interval
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, source, language, version, flags):
+        digest = hashlib.sha256()
+        for part in (normalize_source(source), language, version, '\0'.join(flags)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def restore(self, key, work_dir):
+        """
+        命中时把产物复制到工作目录
+
+        返回 None 表示未命中，否则返回 (是否编译成功, 编译日志)
+        """
+        entry = self._entry_dir(key)
+        try:
+            names = os.listdir(entry)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            for name in names:
+                if name in (LOG_FILE, FAILED_FILE):
+                    continue
+                # 复制而不是硬链接，避免被评测程序改写缓存中的产物
+                shutil.copy2(os.path.join(entry, name), os.path.join(work_dir, name))
+            with open(os.path.join(entry, LOG_FILE), 'r', encoding='utf-8', errors='replace') as f:
+                log = f.read()
+            # 更新修改时间作为最近使用时间
+            os.utime(entry)
+        except OSError:
+            # 条目正在被淘汰
+            self.misses += 1
+            return None
+        self.hits += 1
+        return FAILED_FILE not in names, log
+
+    def store(self, key, work_dir, artifact_patterns, success, log):
+        """保存编译结果；编译失败时只保存编译日志"""
+        entry = self._entry_dir(key)
+        if os.path.isdir(entry):
+            return
+        private_directory(self.directory)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.tmp_', dir=os.path.dirname(entry))
+        try:
+            if success:
+                for pattern in artifact_patterns:
+                    for path in glob.glob(os.path.join(work_dir, pattern)):
+                        shutil.copy2(path, staging)
+            else:
+                open(os.path.join(staging, FAILED_FILE), 'w').close()
+            with open(os.path.join(staging, LOG_FILE), 'w', encoding='utf-8') as f:
+                f.write(log)
+            os.rename(staging, entry)
+        except OSError:
+            # 其他进程已经写入了同一个条目
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        with _lock:
+            self._writes += 1
+            should_scan = self._writes % self.scan_interval == 1 or self.scan_interval <= 1
+        if should_scan:
+            self.evict()
+
+    def _entries(self):
+        """返回 [(最近使用时间, 大小, 路径)]"""
+        entries = []
+        for prefix in glob.glob(os.path.join(self.directory, '??')):
+            for entry in os.listdir(prefix):
+                path = os.path.join(prefix, entry)
+                if entry.startswith('.tmp_'):
+                    continue
+                try:
+                    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+                    entries.append((os.path.getmtime(path), size, path))
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self):
+        """总大小超过上限时删除最久未使用的条目，直到降到上限的 90%"""
+        entries = self._entries()
+        total = sum(size for mtime, size, path in entries)
+        if total <= self.max_bytes:
+            return 0
+        target = self.max_bytes * 0.9
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        logger.info(f"Compile cache evicted {removed} entries, {total} bytes left")
+        return removed
+
+
+_default_cache = None
+
+
+def get_compile_cache():
+    """当前进程使用的编译缓存，未启用时返回 None"""
+    global _default_cache
+    from judge.conf import judge_setting
+
+    if not judge_setting('JUDGE_COMPILE_CACHE_ENABLED'):
+        return None
+    if _default_cache is None:
+        _default_cache = CompileCache(
+            judge_setting('JUDGE_COMPILE_CACHE_DIR'),
+            judge_setting('JUDGE_COMPILE_CACHE_MAX_BYTES'),
+        )
+    return _default_cache
@@ -0,0 +1,98 @@
+# _*_ coding:utf-8 _*_
+"""
+评测相关配置
+
+所有配置项都可以在 settings.py 中以同名变量覆盖，未配置时使用这里的默认值。
+"""
+import os
+import tempfile
+
+from django.conf import settings
+
+DEFAULTS = {
+    # 评测工作目录，每次评测在其中创建临时子目录
+    'JUDGE_WORK_DIR': os.path.join(tempfile.gettempdir(), 'coj_judge'),
+    # 题目未设置限制时使用的默认值
+    'JUDGE_DEFAULT_TIME_LIMIT_MS': 1000,
+    'JUDGE_DEFAULT_MEMORY_LIMIT_MB': 256,
+    # 新增语言或覆盖内置语言的属性，见 judge.languages
+    'JUDGE_LANGUAGES': {},
+    # 程序输出文件大小上限（字节），标准输出和标准错误分别计算，超过时判为输出超限
+    'JUDGE_OUTPUT_LIMIT_BYTES': 16 * 1024 * 1024,
+    # 每个测试用例结果保存的错误信息上限（字节）：只保存第一处差异的摘要或标准错误的末尾
+    'JUDGE_CASE_MESSAGE_LIMIT_BYTES': 512,
+    # 编译限制
+    'JUDGE_COMPILE_TIME_LIMIT_MS': 10000,
+    'JUDGE_COMPILE_MEMORY_LIMIT_MB': 1024,
+    # 编译缓存：相同代码再次提交时跳过编译，目录总大小超过上限时按最近使用时间淘汰
+    'JUDGE_COMPILE_CACHE_ENABLED': True,
+    'JUDGE_COMPILE_CACHE_DIR': os.path.join(tempfile.gettempdir(), 'coj_judge_cache', 'compile'),
+    'JUDGE_COMPILE_CACHE_MAX_BYTES': 1024 * 1024 * 1024,
+    # 相同代码重复提交到同一题目时复用之前的评测结果
+    'JUDGE_VERDICT_CACHE_ENABLED': True,
+    # 每个评测进程缓存的规范化标准答案总大小上限（字节），0 表示不缓存
+    'JUDGE_EXPECTED_CACHE_MAX_BYTES': 64 * 1024 * 1024,
+    # 评测节点本地的测试数据存储目录（按 SHA-256 存放）
+    'JUDGE_TESTDATA_DIR': os.path.join(tempfile.gettempdir(), 'coj_judge_cache', 'testdata'),
+    # 特殊评测程序：各节点编译后的存放目录，以及运行评测程序的限制
+    'JUDGE_CHECKER_DIR': os.path.join(tempfile.gettempdir(), 'coj_judge_cache', 'checkers'),
+    'JUDGE_CHECKER_TIME_LIMIT_MS': 5000,
+    'JUDGE_CHECKER_MEMORY_LIMIT_MB': 512,
+    # 运行测试用例时使用常驻的启动器，Python 程序在预热的解释器中运行，省去每个测试用例的解释器启动时间
+    'JUDGE_PREFORKED_LAUNCHER': True,
+    # 用 RLIMIT_AS 限制内存的语言，地址空间上限为内存限制的倍数：超过内存限制的程序仍能继续分配，
+    # 峰值内存超过限制后判为超内存，而不是在限制处分配失败、访问空指针后表现为运行错误
+    'JUDGE_ADDRESS_SPACE_FACTOR': 2,
+    # 墙钟时间上限 = CPU时间限制 * 倍数 + 附加值，防止 sleep 之类的程序占住评测进程
+    'JUDGE_WALL_TIME_FACTOR': 3,
+    'JUDGE_WALL_TIME_EXTRA_MS': 1000,
+    # 队列为空时评测进程的轮询间隔（秒）
+    'JUDGE_POLL_INTERVAL': 0.5,
+    # 每个评测进程同时评测的任务数；进程绑定到单个核上，大于 1 会让程序互相争抢 CPU
+    'JUDGE_WORKER_CONCURRENCY': 1,
+    # 心跳间隔和超时（秒），超时的评测进程认领的任务会被重新入队
+    'JUDGE_HEARTBEAT_INTERVAL': 10,
+    'JUDGE_HEARTBEAT_TIMEOUT': 60,
+    # 同一任务最多开始评测的次数，超过后提交判为系统错误；认领后超过 JUDGE_TASK_TIMEOUT 秒仍未完成的任务会被回收
+    'JUDGE_MAX_ATTEMPTS': 3,
+    'JUDGE_TASK_TIMEOUT': 600,
+    # 批量重新评测：每分钟最多入队的提交数，以及队列中同时存在的重新评测任务上限
+    'JUDGE_REJUDGE_RATE_PER_MINUTE': 600,
+    'JUDGE_REJUDGE_MAX_QUEUED': 200,
+    # 重新评测全部完成后，每个事务更新统计的学生数
+    'JUDGE_REJUDGE_FINALIZE_CHUNK': 200,
+    # 提交状态推送（SSE）：Web 进程轮询数据库的间隔（秒）、单个连接的最长时间（秒，浏览器会自动重连）和心跳间隔（秒）。
+    # 每个连接占用一个 Web 工作线程，连接时间保持较短，由浏览器重连
+    'JUDGE_EVENTS_POLL_INTERVAL': 1.0,
+    'JUDGE_EVENTS_STREAM_SECONDS': 20,
+    'JUDGE_EVENTS_KEEPALIVE_SECONDS': 15,
+    # 试运行（样例或自定义输入，不保存提交）：时间、内存上限，输入和输出文件大小上限、返回给页面的输出长度（字节），
+    # 全站排队中的试运行数上限，同一会话两次试运行的最短间隔（秒），没有被取走结果的试运行记录保留的时间（秒）
+    'JUDGE_TRIAL_RUN_TIME_LIMIT_MS': 2000,
+    'JUDGE_TRIAL_RUN_MEMORY_LIMIT_MB': 256,
+    'JUDGE_TRIAL_RUN_INPUT_BYTES': 64 * 1024,
+    'JUDGE_TRIAL_RUN_OUTPUT_BYTES': 1024 * 1024,
+    'JUDGE_TRIAL_RUN_DISPLAY_BYTES': 64 * 1024,
+    'JUDGE_TRIAL_RUN_MAX_QUEUED': 50,
+    'JUDGE_TRIAL_RUN_INTERVAL_SECONDS': 2,
+    'JUDGE_TRIAL_RUN_EXPIRE_SECONDS': 600,
+    # 单个提交最多同时运行的测试用例数，只使用空闲的核；设为 1 时逐个运行
+    'JUDGE_CASE_PARALLELISM': 4,
+    # 核占用锁文件的目录，同一节点上的评测进程必须使用同一个目录
+    'JUDGE_CPU_LOCK_DIR': os.path.join(tempfile.gettempdir(), 'coj_judge_cache', 'cpu_locks'),
+    # 被评测程序的运行身份，见 judge.isolation：每次评测独占 [UID_BASE, UID_BASE + UID_COUNT) 中的一个 uid，
+    # 以该 uid 和 JUDGE_SANDBOX_GID 运行，同一 uid 最多 JUDGE_SANDBOX_NPROC 个进程（线程也计入）。
+    # 评测进程需要以 root 运行；UID_BASE 设为 None 时不切换身份，程序可以读取项目文件，只能用于开发环境
+    'JUDGE_SANDBOX_UID_BASE': 60000,
+    'JUDGE_SANDBOX_UID_COUNT': 64,
+    'JUDGE_SANDBOX_GID': 60000,
+    'JUDGE_SANDBOX_NPROC': 128,
+    'JUDGE_SANDBOX_LOCK_DIR': os.path.join(tempfile.gettempdir(), 'coj_judge_cache', 'sandbox_users'),
+    # 运行特殊评测程序的 uid，所有评测程序共用，不能与上面的 uid 重叠；None 表示 UID_BASE + UID_COUNT
+    'JUDGE_SANDBOX_CHECKER_UID': None,
+}
+
+
+def judge_setting(name):
+    """读取评测配置，settings 中未定义时返回默认值"""
+    return getattr(settings, name, DEFAULTS[name])
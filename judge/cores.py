@@ -0,0 +1,81 @@
+# _*_ coding:utf-8 _*_
+"""
+评测节点上的 CPU 核占用
+
+每个核对应 JUDGE_CPU_LOCK_DIR/<cpu>.lock 上的一把 flock 锁：
+绑定到某个核的评测进程在评测期间持有该核的锁；单个提交并行运行测试用例时，
+只能借用当前没有被持有的核，保证每个核上同一时刻只运行一个被评测程序。
+锁随文件描述符关闭（包括进程退出）自动释放。
+"""
+import fcntl
+import os
+
+from judge.conf import judge_setting
+
+_node_cpus = None
+
+
+def available_cpus():
+    """当前进程允许使用的 CPU 列表"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def node_cpus():
+    """
+    本节点可供评测使用的 CPU 列表
+
+    第一次调用时确定，评测进程池在 fork 并绑定核之前调用，子进程继承这个结果。
+    """
+    global _node_cpus
+    if _node_cpus is None:
+        _node_cpus = available_cpus()
+    return _node_cpus
+
+
+class CoreLease(object):
+    """持有一个核的锁"""
+
+    def __init__(self, cpu, fd):
+        self.cpu = cpu
+        self.fd = fd
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def acquire_core(cpu, blocking=True):
+    """获取一个核的锁，非阻塞模式下核被占用时返回 None"""
+    directory = judge_setting('JUDGE_CPU_LOCK_DIR')
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(directory, f'{cpu}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    except BaseException:
+        os.close(fd)
+        raise
+    return CoreLease(cpu, fd)
+
+
+def borrow_idle_cores(count):
+    """借用最多 count 个空闲的核，返回 [CoreLease]"""
+    leases = []
+    if count <= 0:
+        return leases
+    # 当前进程绑定的核由自己使用，不再借用
+    own = set(available_cpus()) if len(available_cpus()) == 1 else set()
+    for cpu in node_cpus():
+        if cpu in own:
+            continue
+        lease = acquire_core(cpu, blocking=False)
+        if lease is not None:
+            leases.append(lease)
+            if len(leases) >= count:
+                break
+    return leases
@@ -0,0 +1,608 @@
+# _*_ coding:utf-8 _*_
+"""
+评测引擎
+
+对一条 Submission 完成 编译 -> 逐个测试用例运行 -> 比对输出 -> 写回结果。
+提交的程序在 judge.sandbox 的受限子进程中运行，评测由 judge.worker 中的评测进程从队列中认领后执行，不在 Web 请求中进行。
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from own_models.judge_models import JudgeTask
+from own_models.organize_competitions_models import PaperAssignment
+from own_models.problem_models import Problem
+from own_models.student_practice import Submission, TestCaseResult, StudentStatistics
+from judge.checker import check_output
+from judge.compile_cache import get_compile_cache, compiler_version
+from judge.conf import judge_setting
+from judge.cores import borrow_idle_cores
+from judge.events import publish_submissions
+from judge.isolation import acquire_sandbox_user
+from judge.languages import get_language
+from judge.objective import MISSING_KEY_MESSAGE, OBJECTIVE_TYPES, grade_problem
+from judge.sandbox import open_output, private_directory, run_process
+from judge.special_judge import CheckerError, get_checker
+from judge.task_queue import is_contest_submission
+from judge.testdata import TestCaseFiles, get_test_data_store
+from judge.verdict_cache import UNCACHEABLE_STATUSES, find_cached_verdict, verdict_key
+
+logger = logging.getLogger(__name__)
+
+# 提交的错误信息（主要是编译输出）最多保留的字节数，测试用例结果的上限见 JUDGE_CASE_MESSAGE_LIMIT_BYTES
+MAX_MESSAGE_LENGTH = 4096
+
+VERDICT_MESSAGES = {
+    'wrong_answer': 'Wrong Answer: Output does not match expected result',
+    'time_limit_exceeded': 'Time Limit Exceeded: Program execution time exceeds limit',
+    'memory_limit_exceeded': 'Memory Limit Exceeded: Program uses too much memory',
+    'runtime_error': 'Runtime Error: Exception occurred during program execution',
+    'output_limit_exceeded': 'Output Limit Exceeded: Program output exceeds limit',
+}
+
+# 内存分配失败时各语言运行时输出的标志
+MEMORY_ERROR_MARKERS = ('MemoryError', 'std::bad_alloc', 'java.lang.OutOfMemoryError',
+                        'JavaScript heap out of memory')
+
+
+def _read_text(path, limit=MAX_MESSAGE_LENGTH):
+    """读取文件开头的一段文本，用于错误信息"""
+    try:
+        with open_output(path) as f:
+            return f.read(limit).decode('utf-8', errors='replace')
+    except OSError:
+        return ''
+
+
+def _read_tail(path, limit):
+    """读取文件末尾不超过 limit 字节的文本，异常信息通常在标准错误的最后几行"""
+    try:
+        with open_output(path) as f:
+            size = f.seek(0, os.SEEK_END)
+            if size <= limit:
+                f.seek(0)
+                return f.read().decode('utf-8', errors='replace')
+            f.seek(size - max(0, limit - 3))
+            return '...' + f.read().decode('utf-8', errors='ignore')
+    except OSError:
+        return ''
+
+
+def clip_message(message, limit):
+    """把错误信息截断到 limit 字节（UTF-8）以内，保存到数据库的信息都经过这里"""
+    if not message:
+        return message
+    data = message.encode('utf-8')
+    if len(data) <= limit:
+        return message
+    return data[:max(0, limit - 3)].decode('utf-8', errors='ignore') + '...'
+
+
+def _limits(problem, runner):
+    """题目在该语言下的时间限制(ms)和内存限制(MB)"""
+    time_limit = (problem.time_limit or runner.default_time_limit_ms
+                  or judge_setting('JUDGE_DEFAULT_TIME_LIMIT_MS'))
+    memory_limit = (problem.memory_limit or runner.default_memory_limit_mb
+                    or judge_setting('JUDGE_DEFAULT_MEMORY_LIMIT_MB'))
+    return runner.time_limit(time_limit), memory_limit
+
+
+def compile_source(language, work_dir, source, user=None):
+    """
+    在工作目录中编译源文件，相同代码命中编译缓存时直接复制编译产物
+
+    user 为运行编译器的身份（judge.isolation.SandboxUser），None 表示以评测进程的身份编译（评测程序）。
+
+    返回 (是否成功, 编译器输出)
+    """
+    runner = get_language(language)
+    if not runner.compile:
+        return True, ''
+    compile_cache = get_compile_cache() if runner.cache_artifacts else None
+    if compile_cache is None:
+        return _compile(runner, work_dir, user=user)
+
+    key = compile_cache.make_key(source, language, compiler_version(runner.version), runner.compile)
+    cached = compile_cache.restore(key, work_dir)
+    if cached is not None:
+        return cached
+    compiled, message, cacheable = _compile(runner, work_dir, with_cacheable=True, user=user)
+    if cacheable:
+        try:
+            compile_cache.store(key, work_dir, runner.artifacts, compiled, message)
+        except OSError:
+            logger.exception("Failed to store compile cache entry")
+    return compiled, message
+
+
+def _compile(runner, work_dir, with_cacheable=False, user=None):
+    """
+    实际执行编译
+
+    with_cacheable 为 True 时额外返回结果是否可以缓存（编译超时与机器负载有关，不缓存）
+    """
+    compile_log = os.path.join(work_dir, 'compile.log')
+    memory_limit_mb = judge_setting('JUDGE_COMPILE_MEMORY_LIMIT_MB')
+    result = run_process(
+        runner.compile, cwd=work_dir,
+        stdout_path=compile_log, stderr_path=compile_log,
+        time_limit_ms=judge_setting('JUDGE_COMPILE_TIME_LIMIT_MS'),
+        memory_limit_kb=memory_limit_mb * 1024,
+        output_limit_bytes=judge_setting('JUDGE_OUTPUT_LIMIT_BYTES'),
+        # 编译器（尤其是 javac）同样会预留大量虚拟内存
+        limit_address_space=False,
+        user=user,
+    )
+    timed_out = result.timed_out or result.cpu_exceeded
+    # 启动器 exec 失败（例如编译器不能被评测用户执行）时退出码为 127 且没有输出，与代码无关
+    not_started = result.exit_code == 127 and not os.path.getsize(compile_log)
+    if result.ok:
+        compiled, message = True, ''
+    else:
+        compiled, message = False, _read_text(compile_log)
+        if timed_out:
+            message = 'Compilation timed out\n' + message
+        elif not_started:
+            message = f'Compiler could not be started: {runner.compile[0]}'
+    if with_cacheable:
+        return compiled, message, not timed_out and not not_started
+    return compiled, message
+
+
+def run_failure(result, error_path, time_limit, memory_limit):
+    """
+    根据运行结果判断程序是否超限或异常退出
+
+    返回 (状态, 错误信息)，程序正常结束时返回 None，此时还需要比对输出
+    """
+    if result.timed_out or result.cpu_exceeded:
+        return 'time_limit_exceeded', VERDICT_MESSAGES['time_limit_exceeded']
+    if result.output_exceeded:
+        return 'output_limit_exceeded', VERDICT_MESSAGES['output_limit_exceeded']
+    # 地址空间上限高于内存限制（JUDGE_ADDRESS_SPACE_FACTOR），不断分配内存的程序在分配失败之前峰值内存就会超过限制
+    if result.memory_kb >= memory_limit * 1024:
+        return 'memory_limit_exceeded', VERDICT_MESSAGES['memory_limit_exceeded']
+    if not result.ok:
+        # 一次申请超过地址空间上限时分配失败，运行时能报告内存不足的按超内存处理
+        if any(marker in _read_text(error_path) for marker in MEMORY_ERROR_MARKERS):
+            return 'memory_limit_exceeded', VERDICT_MESSAGES['memory_limit_exceeded']
+        message = VERDICT_MESSAGES['runtime_error']
+        # 只保留标准错误的末尾，整条信息不超过测试用例结果的保存上限
+        budget = judge_setting('JUDGE_CASE_MESSAGE_LIMIT_BYTES') - len(message) - 1
+        stderr = _read_tail(error_path, budget).strip() if budget > 0 else ''
+        if stderr:
+            message = f"{message}\n{stderr}"
+        return 'runtime_error', message
+    # RLIMIT_CPU 只能精确到秒，按实际 CPU 时间判定超时
+    if result.time_ms > time_limit:
+        return 'time_limit_exceeded', VERDICT_MESSAGES['time_limit_exceeded']
+    return None
+
+
+def run_test(language, work_dir, input_path, expected_path, time_limit, memory_limit,
+             checker_mode='trailing_whitespace', float_epsilon=1e-6, cpu=None, name='case', checker=None,
+             expected_hash=None, timings=None, user=None):
+    """
+    运行一个测试用例
+
+    input_path / expected_path 为本地测试数据文件，输入文件直接作为程序的标准输入。
+    checker_mode / float_epsilon 为输出比对方式，见 judge.checker；checker_mode 为 special 时由 checker
+    （judge.special_judge.CheckerSession）判定，评测程序异常时抛出 CheckerError。
+    cpu 为程序绑定的核，name 用于区分同一工作目录中并行运行的测试用例的输出文件。
+    expected_hash 为标准答案的 SHA-256，提供时规范化后的标准答案从进程内缓存读取。
+    timings 为列表时追加本测试用例运行程序和比对输出的墙钟时间 (运行ms, 比对ms)。
+    user 为运行程序的身份（judge.isolation.SandboxUser），特殊评测程序以它自己的身份运行。
+    返回 (状态, CPU 时间ms, 峰值内存KB, 错误信息)，状态取值同 Submission.STATUS_CHOICES
+    """
+    runner = get_language(language)
+    output_path = os.path.join(work_dir, f'{name}.out.txt')
+    error_path = os.path.join(work_dir, f'{name}.err.txt')
+
+    started = time.monotonic()
+    result = run_process(
+        runner.run_command(memory_limit), cwd=work_dir,
+        stdin_path=input_path, stdout_path=output_path, stderr_path=error_path,
+        time_limit_ms=time_limit,
+        wall_limit_ms=time_limit * judge_setting('JUDGE_WALL_TIME_FACTOR') + judge_setting('JUDGE_WALL_TIME_EXTRA_MS'),
+        memory_limit_kb=memory_limit * 1024,
+        address_space_kb=memory_limit * 1024 * judge_setting('JUDGE_ADDRESS_SPACE_FACTOR'),
+        output_limit_bytes=judge_setting('JUDGE_OUTPUT_LIMIT_BYTES'),
+        limit_address_space=runner.limit_address_space,
+        cpu=cpu,
+        preforked=judge_setting('JUDGE_PREFORKED_LAUNCHER'),
+        user=user,
+    )
+
+    failure = run_failure(result, error_path, time_limit, memory_limit)
+    checked = time.monotonic()
+    if failure is not None:
+        if timings is not None:
+            timings.append((int((checked - started) * 1000), 0))
+        return failure[0], result.time_ms, result.memory_kb, failure[1]
+
+    if checker_mode == 'special':
+        check = checker.check(input_path, output_path, expected_path, name=name, cpu=cpu)
+    else:
+        check = check_output(output_path, expected_path, checker_mode, float_epsilon, expected_hash=expected_hash)
+    if timings is not None:
+        timings.append((int((checked - started) * 1000), int((time.monotonic() - checked) * 1000)))
+    if not check:
+        message = f"{VERDICT_MESSAGES['wrong_answer']}\n{check.message}"
+        return 'wrong_answer', result.time_ms, result.memory_kb, message
+    return 'accepted', result.time_ms, result.memory_kb, None
+
+
+def _run_cases(run_case, cases, groups):
+    """
+    按顺序运行测试用例，返回与 cases 一一对应的结果列表，未运行的测试用例为 None
+
+    run_case(case, cpu, index) 运行单个测试用例。节点上有空闲的核时借用它们并行运行，
+    并行数不超过 JUDGE_CASE_PARALLELISM，每个核上同一时刻只运行一个程序以保证计时准确。
+    groups 为每个测试用例所属的短路分组（见 _case_groups）：同一分组中第一个未通过的测试用例之后的
+    测试用例不再运行，结果与逐个运行一致，其他分组照常运行。
+    """
+    parallelism = min(judge_setting('JUDGE_CASE_PARALLELISM'), len(cases))
+    leases = borrow_idle_cores(parallelism - 1)
+    outcomes = [None] * len(cases)
+    state = {'next': 0}
+    # 分组 -> 第一个未通过的测试用例下标
+    failed = {}
+    lock = threading.Lock()
+
+    def skipped(index):
+        return failed.get(groups[index], len(cases)) < index
+
+    def work(cpu):
+        while True:
+            with lock:
+                index = state['next']
+                while index < len(cases) and skipped(index):
+                    index += 1
+                if index >= len(cases):
+                    return
+                state['next'] = index + 1
+            outcome = run_case(cases[index], cpu, index)
+            outcomes[index] = outcome
+            if outcome[0] != 'accepted':
+                with lock:
+                    failed[groups[index]] = min(failed.get(groups[index], len(cases)), index)
+
+    try:
+        if not leases:
+            work(None)
+        else:
+            # 当前进程自己的核（cpu=None）加上借来的核
+            slots = [None] + [lease.cpu for lease in leases]
+            with ThreadPoolExecutor(max_workers=len(slots), thread_name_prefix='judge-case') as executor:
+                list(executor.map(work, slots))
+    finally:
+        for lease in leases:
+            lease.release()
+
+    # 并行运行时可能已经运行了失败之后的测试用例
+    for index in range(len(cases)):
+        if skipped(index):
+            outcomes[index] = None
+    return outcomes
+
+
+def _case_groups(cases, run_all):
+    """
+    测试用例的短路分组
+
+    有子任务的题目按子任务分组，不属于子任务的测试用例各自一组；没有子任务时，
+    运行全部测试用例则每个测试用例各自一组，否则全部测试用例为一组（第一个未通过即停止）。
+    """
+    if any(case.subtask for case in cases):
+        return [('subtask', case.subtask) if case.subtask else ('case', index) for index, case in enumerate(cases)]
+    if run_all:
+        return [('case', index) for index in range(len(cases))]
+    return [('all', 0)] * len(cases)
+
+
+def _score(cases, outcomes):
+    """
+    百分制得分
+
+    子任务的全部测试用例通过才得到子任务的分值（各测试用例分值之和），不属于子任务的测试用例单独计分；
+    所有测试用例分值都为 0 时每个测试用例分值相同。没有运行的测试用例不得分。
+    """
+    weighted = any(case.score for case in cases)
+    totals = {}
+    passed = {}
+    for index, (case, outcome) in enumerate(zip(cases, outcomes)):
+        key = ('subtask', case.subtask) if case.subtask else ('case', index)
+        totals[key] = totals.get(key, 0) + (case.score if weighted else 1)
+        passed[key] = passed.get(key, True) and outcome is not None and outcome[0] == 'accepted'
+    total = sum(totals.values())
+    if not total:
+        return 0
+    return round(sum(value for key, value in totals.items() if passed[key]) * 100 / total)
+
+
+def _runs_all_cases(submission):
+    """
+    是否运行全部测试用例
+
+    练习默认在第一个未通过的测试用例处停止；题目设置为 run_all，
+    或者提交时提交者有包含该题目的未完成试卷时，运行全部测试用例以便给部分分（重新评测时结论不变）。
+    """
+    if submission.problem.judge_policy == 'run_all':
+        return True
+    return is_contest_submission(submission)
+
+
+def _test_data(problem, work_dir):
+    """
+    题目的测试数据列表 [TestCaseFiles]
+
+    测试数据来自评测节点本地的内容寻址存储；没有配置测试用例的题目退回到样例输入输出，
+    此时 test_case_id 为 None。
+    """
+    test_cases = get_test_data_store().test_cases(problem)
+    if test_cases:
+        return test_cases
+    if problem.sample_output:
+        input_path = os.path.join(work_dir, 'sample.in')
+        output_path = os.path.join(work_dir, 'sample.out')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write(problem.sample_input or '')
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(problem.sample_output)
+        return [TestCaseFiles(None, input_path, output_path)]
+    return []
+
+
+class JudgeResult(object):
+    """一条提交的评测结果，由 save_results 写回数据库"""
+
+    def __init__(self, submission, status, execution_time=0, memory_used=0, error_message=None,
+                 results=None, task=None, judge_key='', judge_time=0, score=0, stage_times=None):
+        self.submission = submission
+        self.status = status
+        self.score = score
+        self.execution_time = execution_time
+        self.memory_used = memory_used
+        self.error_message = clip_message(error_message, MAX_MESSAGE_LENGTH) or None
+        # 未保存的 TestCaseResult 列表
+        self.results = results or []
+        # 队列中认领到的 JudgeTask，写回结果时删除
+        self.task = task
+        # 评测键，见 judge.verdict_cache；系统错误不参与复用
+        self.judge_key = judge_key if status not in UNCACHEABLE_STATUSES else ''
+        # 评测本身花费的时间(ms)，用于统计各语言的评测吞吐量
+        self.judge_time = judge_time
+        # 各阶段耗时(ms)：{'compile', 'run', 'check', 'core_wait'}，运行和比对为各测试用例之和，
+        # core_wait 为评测进程开始评测前等待自己的核的时间，由评测进程填写
+        self.stage_times = stage_times or {}
+
+
+def judge_submission(submission_id, task=None):
+    """评测一条提交记录并写回结果，返回最终状态"""
+    result = evaluate_submission(submission_id, task)
+    save_results([result])
+    return result.status
+
+
+def evaluate_submission(submission_id, task=None):
+    """评测一条提交记录，不写数据库，返回 JudgeResult"""
+    started = time.monotonic()
+    submission = Submission.objects.select_related('problem').get(id=submission_id)
+    problem = submission.problem
+    if problem.problem_type in OBJECTIVE_TYPES:
+        # 客观题通常在提交时已经评分，这里处理重新评测和补建任务的情况
+        status, score = grade_problem(problem, submission.code)
+        return JudgeResult(submission, status, task=task, judge_time=int((time.monotonic() - started) * 1000),
+                           score=score, error_message=MISSING_KEY_MESSAGE if status == 'system_error' else None)
+    try:
+        runner = get_language(submission.language)
+    except KeyError:
+        return JudgeResult(submission, 'system_error', error_message=f'Unsupported language: {submission.language}',
+                           task=task)
+    time_limit, memory_limit = _limits(problem, runner)
+    run_all = _runs_all_cases(submission)
+
+    key = verdict_key(submission, run_all, time_limit, memory_limit)
+    # 重新评测正是为了用新的测试数据或限制得到新结果，不复用旧结果
+    rejudge = task is not None and task.rejudge_job_id is not None
+    if judge_setting('JUDGE_VERDICT_CACHE_ENABLED') and not rejudge:
+        cached = find_cached_verdict(submission, key)
+        if cached is not None:
+            source, results = cached
+            logger.info(f"Submission {submission.id} reuses the verdict of submission {source.id}")
+            return JudgeResult(submission, source.status, source.execution_time, source.memory_used,
+                               source.error_message, results, task, judge_key=key,
+                               judge_time=int((time.monotonic() - started) * 1000), score=source.score)
+
+    status = 'accepted'
+    error_message = None
+    max_time = 0
+    max_memory = 0
+    score = 0
+    results = []
+    stage_times = {}
+
+    # 工作目录的上级目录只允许进入，被评测程序无法列出其他评测的工作目录
+    work_root = private_directory(judge_setting('JUDGE_WORK_DIR'), 0o711)
+    work_dir = tempfile.mkdtemp(prefix=f'sub{submission.id}_', dir=work_root)
+    user = None
+    checker = None
+    try:
+        user = acquire_sandbox_user()
+        if user is not None:
+            user.prepare(work_dir)
+        test_data = _test_data(problem, work_dir)
+
+        if not test_data:
+            status, error_message = 'system_error', 'No test data for this problem'
+        else:
+            with open(os.path.join(work_dir, runner.source), 'w', encoding='utf-8') as f:
+                f.write(submission.code)
+            compile_started = time.monotonic()
+            compiled, compile_output = compile_source(submission.language, work_dir, submission.code, user=user)
+            stage_times['compile'] = int((time.monotonic() - compile_started) * 1000)
+            if not compiled:
+                status = 'compile_error'
+                error_message = compile_output or 'Compilation failed'
+            else:
+                if problem.checker_mode == 'special':
+                    checker = get_checker(problem).open(work_root)
+                timings = []
+
+                def run_case(case, cpu, index):
+                    return run_test(
+                        submission.language, work_dir, case.input_path, case.output_path, time_limit, memory_limit,
+                        problem.checker_mode, problem.float_epsilon, cpu=cpu, name=f'case{index}', checker=checker,
+                        expected_hash=case.output_hash, timings=timings, user=user,
+                    )
+
+                outcomes = _run_cases(run_case, test_data, _case_groups(test_data, run_all))
+                stage_times['run'] = sum(run_ms for run_ms, check_ms in timings)
+                stage_times['check'] = sum(check_ms for run_ms, check_ms in timings)
+                score = _score(test_data, outcomes)
+                for case, outcome in zip(test_data, outcomes):
+                    if outcome is None:
+                        if case.test_case_id is not None:
+                            results.append(TestCaseResult(
+                                submission=submission, test_case_id=case.test_case_id, status='skipped'
+                            ))
+                        continue
+                    case_status, time_ms, memory_kb, message = outcome
+                    message = clip_message(message, judge_setting('JUDGE_CASE_MESSAGE_LIMIT_BYTES'))
+                    max_time = max(max_time, time_ms)
+                    max_memory = max(max_memory, memory_kb)
+                    if case.test_case_id is not None:
+                        results.append(TestCaseResult(
+                            submission=submission,
+                            test_case_id=case.test_case_id,
+                            status='passed' if case_status == 'accepted' else 'failed',
+                            execution_time=time_ms,
+                            memory_used=memory_kb,
+                            error_message=message or None,
+                        ))
+                    # 以第一个未通过的测试用例作为整体结果
+                    if case_status != 'accepted' and status == 'accepted':
+                        status, error_message = case_status, message
+    except CheckerError as e:
+        logger.warning(f"Checker of problem {problem.id} failed on submission {submission_id}: {e}")
+        status, error_message = 'system_error', f'Checker error: {str(e)}'
+    except Exception as e:
+        logger.exception(f"Error judging submission {submission_id}")
+        status, error_message = 'system_error', f'Judge error: {str(e)}'
+    finally:
+        if user is not None:
+            user.release()
+        if checker is not None:
+            checker.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return JudgeResult(submission, status, max_time, max_memory, error_message, results, task, judge_key=key,
+                       judge_time=int((time.monotonic() - started) * 1000),
+                       score=score if status != 'system_error' else 0, stage_times=stage_times)
+
+
+def _owned_tasks(tasks):
+    """仍由本进程持有的任务（可能已被判定超时并由其他评测进程重新认领）"""
+    condition = Q()
+    for task in tasks:
+        condition |= Q(id=task.id, worker=task.worker, claimed_at=task.claimed_at)
+    return set(JudgeTask.objects.select_for_update().filter(condition).values_list('id', flat=True))
+
+
+def save_results(judged):
+    """
+    在一个事务中写回一批评测结果
+
+    不论有多少条提交、多少个测试用例，数据库往返次数只与涉及的题目数和学生数有关：
+    删除任务、更新提交、清除旧的和批量插入新的测试用例结果各一次，每个题目更新一次计数，每个学生更新一次统计。
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = [result.task for result in judged if result.task is not None]
+        owned = _owned_tasks(tasks) if tasks else set()
+        saved = []
+        for result in judged:
+            if result.task is not None and result.task.id not in owned:
+                logger.warning(f"Judge task {result.task.id} was reclaimed, "
+                               f"dropping result of submission {result.submission.id}")
+                continue
+            saved.append(result)
+        if not saved:
+            return []
+        if owned:
+            JudgeTask.objects.filter(id__in=owned).delete()
+
+        submissions = []
+        for result in saved:
+            submission = result.submission
+            submission.status = result.status
+            submission.execution_time = result.execution_time
+            submission.memory_used = result.memory_used
+            submission.error_message = result.error_message
+            submission.score = result.score
+            submission.judge_key = result.judge_key
+            submission.judge_time = result.judge_time
+            submission.compile_time = result.stage_times.get('compile', 0)
+            submission.run_time = result.stage_times.get('run', 0)
+            submission.check_time = result.stage_times.get('check', 0)
+            submission.core_wait = result.stage_times.get('core_wait', 0)
+            if result.task is not None:
+                submission.judge_priority = result.task.priority
+                submission.queue_wait = int((result.task.claimed_at - result.task.created_at).total_seconds() * 1000)
+            submission.updated_at = now
+            submissions.append(submission)
+        Submission.objects.bulk_update(
+            submissions, ['status', 'execution_time', 'memory_used', 'error_message', 'score', 'judge_key',
+                          'judge_time', 'compile_time', 'run_time', 'check_time', 'core_wait', 'judge_priority',
+                          'queue_wait',
+                          'updated_at']
+        )
+        # 重新评测的提交先清除上一次的测试用例结果
+        TestCaseResult.objects.filter(submission_id__in=[result.submission.id for result in saved]).delete()
+        TestCaseResult.objects.bulk_create([case for result in saved for case in result.results])
+
+        # 批量重新评测的题目计数和学生统计在整个重新评测结束时统一更新（见 judge.rejudge）
+        counted = [result for result in saved if result.task is None or result.task.rejudge_job_id is None]
+        counters = {}
+        for result in counted:
+            submitted, accepted = counters.get(result.submission.problem_id, (0, 0))
+            counters[result.submission.problem_id] = (submitted + 1, accepted + (result.status == 'accepted'))
+        # 增量相同的题目合并为一条 UPDATE，一份试卷的客观题通常只需要两条
+        increments = {}
+        for problem_id, counter in counters.items():
+            increments.setdefault(counter, []).append(problem_id)
+        for (submitted, accepted), problem_ids in increments.items():
+            Problem.objects.filter(id__in=problem_ids).update(
+                submission_count=F('submission_count') + submitted,
+                accepted_count=F('accepted_count') + accepted,
+            )
+
+        for user_id in {result.submission.user_id for result in counted}:
+            stats, created = StudentStatistics.objects.get_or_create(user_id=user_id)
+            stats.update_statistics()
+
+        # 试卷的正确率来自各题的最高得分
+        pairs = {(result.submission.user_id, result.submission.problem_id) for result in counted}
+        if pairs:
+            assignments = PaperAssignment.objects.filter(
+                user_id__in={user_id for user_id, problem_id in pairs},
+                paper__problems__in={problem_id for user_id, problem_id in pairs},
+                is_completed=False,
+            ).select_related('paper').distinct()
+            for assignment in assignments:
+                assignment.update_completion_rate()
+
+    # 题目列表页缓存了学生统计；缓存在各进程本地，只有在 Web 进程中评分（客观题）时有效。
+    # 题目详情页的提交列表和统计不缓存未完成的提交，不需要在这里失效
+    cache.delete_many([f'user_stats_{user_id}' for user_id in {result.submission.user_id for result in saved}])
+    publish_submissions([result.submission for result in saved])
+    return saved
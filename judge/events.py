@@ -0,0 +1,130 @@
+# _*_ coding:utf-8 _*_
+"""
+提交状态推送
+
+Web 进程内的发布/订阅：每个 SSE 连接订阅一个用户的提交状态变化（pending -> judging -> 评测结果）。
+评测在同一进程中完成时（例如开发环境直接调用 judge_submission）由 publish_submissions 直接推送；
+评测进程与 Web 进程分离时，由每个 Web 进程一个的后台线程轮询数据库兜底：
+每隔 JUDGE_EVENTS_POLL_INTERVAL 秒用一条查询取出所有订阅用户最近更新的提交，
+数据库查询次数与连接的浏览器数量无关。没有订阅者时后台线程退出。
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from judge.conf import judge_setting
+
+logger = logging.getLogger(__name__)
+
+# 推送给浏览器的提交字段
+EVENT_FIELDS = ('id', 'user_id', 'problem_id', 'status', 'execution_time', 'memory_used', 'score')
+
+# 轮询时往前多查的时间，避免事务提交晚于 updated_at 造成遗漏；重复的事件由 Subscription 按状态去重
+POLL_OVERLAP = timedelta(seconds=2)
+
+
+def submission_event(submission):
+    return {field: getattr(submission, field) for field in EVENT_FIELDS}
+
+
+class Subscription(object):
+    """一个 SSE 连接的事件队列"""
+
+    def __init__(self, hub, user_id):
+        self.hub = hub
+        self.user_id = user_id
+        self.events = queue.Queue()
+        # 提交 ID -> 最近推送的状态，同一提交的同一状态只推送一次
+        self._sent = {}
+
+    def put(self, event):
+        if self._sent.get(event['id']) == event['status']:
+            return
+        self._sent[event['id']] = event['status']
+        self.events.put(event)
+
+    def get(self, timeout):
+        """等待下一个事件，超时返回 None"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class VerdictHub(object):
+    """进程内的提交状态发布/订阅"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._poller = None
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name='verdict-events', daemon=True)
+                self._poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, event):
+        """推送一个提交的状态"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event['user_id'], ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def _poll(self):
+        since = timezone.now() - POLL_OVERLAP
+        try:
+            while True:
+                time.sleep(judge_setting('JUDGE_EVENTS_POLL_INTERVAL'))
+                with self._lock:
+                    user_ids = list(self._subscriptions)
+                    if not user_ids:
+                        self._poller = None
+                        return
+                from own_models.student_practice import Submission
+
+                now = timezone.now()
+                close_old_connections()
+                try:
+                    rows = list(Submission.objects.filter(
+                        user_id__in=user_ids, updated_at__gte=since
+                    ).order_by('updated_at').values(*EVENT_FIELDS))
+                except Exception:
+                    logger.exception("Failed to poll submission status")
+                    continue
+                since = now - POLL_OVERLAP
+                for row in rows:
+                    self.publish(row)
+        finally:
+            close_old_connections()
+
+
+hub = VerdictHub()
+
+
+def publish_submissions(submissions):
+    """评测进程写回状态后调用；本进程没有订阅者时什么也不做"""
+    if not hub._subscriptions:
+        return
+    for submission in submissions:
+        hub.publish(submission_event(submission))
@@ -0,0 +1,167 @@
+# _*_ coding:utf-8 _*_
+"""
+被评测程序的运行身份
+
+每次评测从 [JUDGE_SANDBOX_UID_BASE, JUDGE_SANDBOX_UID_BASE + JUDGE_SANDBOX_UID_COUNT) 中独占一个 uid
+（JUDGE_SANDBOX_LOCK_DIR/<uid>.lock 上的 flock 锁，同 judge.cores），编译和运行测试用例时启动器在 exec 之前
+切换到这个 uid 和 JUDGE_SANDBOX_GID，并用 RLIMIT_NPROC 限制进程数：
+
+- 工作目录属于该 uid、权限 0700，工作目录的上级目录只允许进入不允许列出，其他评测的工作目录不可访问；
+- 测试数据、编译缓存、评测程序和锁目录权限为 0700，只有评测进程（root）可以读取，标准输入由启动器打开后传给程序；
+- 项目目录（包含 settings.py 中的数据库密码）不应允许其他用户读取，而评测进程使用的 Python 解释器必须允许
+  其他用户执行（Python 程序由它运行），评测进程池启动时会检查并警告。
+
+评测结束后杀掉该 uid 的所有进程（包括调用 setsid 脱离进程组的后台进程），再释放锁，
+因此一个 uid 同一时刻只属于一次评测，下一次评测开始时不会有残留进程。
+
+特殊评测程序（出题人的代码）也不以 root 运行，而是以单独的 JUDGE_SANDBOX_CHECKER_UID 运行（见 judge.special_judge）。
+它由所有评测程序共用、不独占，评测进程不会为它等待，但也无法在每次评测后清理它的残留进程。
+"""
+import fcntl
+import os
+import signal
+import stat
+import sys
+
+from judge.conf import judge_setting
+from judge.sandbox import SandboxError, private_directory
+
+
+class SandboxUser(object):
+    """持有一个运行被评测程序的 uid"""
+
+    def __init__(self, uid, gid, nproc, fd):
+        self.uid = uid
+        self.gid = gid
+        self.nproc = nproc
+        self.fd = fd
+
+    def prepare(self, directory):
+        """把工作目录交给该 uid，只有它自己可以访问"""
+        os.chown(directory, self.uid, self.gid)
+        os.chmod(directory, 0o700)
+
+    def release(self):
+        """杀掉该 uid 残留的所有进程并释放锁"""
+        if self.fd is None:
+            return
+        try:
+            kill_user_processes(self.uid)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+
+def kill_user_processes(uid):
+    """
+    杀掉属于 uid 的所有进程
+
+    在 fork 出的子进程中切换到该 uid 后执行 kill(-1, SIGKILL)：信号发给调用者有权限的所有进程（不包括自己），
+    切换身份后恰好是这个 uid 的全部进程，不需要遍历 /proc。
+    """
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.setgroups([])
+            os.setuid(uid)
+            os.kill(-1, signal.SIGKILL)
+        except BaseException:
+            pass
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def acquire_sandbox_user():
+    """
+    独占一个运行被评测程序的 uid，返回 SandboxUser；未启用身份切换时返回 None
+
+    所有 uid 都在使用时阻塞等待其中一个。启用身份切换但当前进程不是 root 时抛出 SandboxError，
+    不以评测进程自己的身份运行被评测程序。
+    """
+    base = judge_setting('JUDGE_SANDBOX_UID_BASE')
+    if base is None:
+        return None
+    if os.geteuid() != 0:
+        raise SandboxError('Judge must run as root to switch to sandbox users '
+                           '(set JUDGE_SANDBOX_UID_BASE = None only for development)')
+    count = judge_setting('JUDGE_SANDBOX_UID_COUNT')
+    directory = private_directory(judge_setting('JUDGE_SANDBOX_LOCK_DIR'))
+    # 从不同的位置开始尝试，减少同一节点上的评测进程互相争抢同一把锁
+    start = os.getpid() % count
+    uids = [base + (start + offset) % count for offset in range(count)]
+    for index, uid in enumerate(uids + uids[:1]):
+        fd = os.open(os.path.join(directory, f'{uid}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # 全部被占用时阻塞在第一个 uid 上
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if index == count else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        except BaseException:
+            os.close(fd)
+            raise
+        user = SandboxUser(uid, judge_setting('JUDGE_SANDBOX_GID'), judge_setting('JUDGE_SANDBOX_NPROC'), fd)
+        try:
+            # 上一个持有者异常退出时可能留下进程
+            kill_user_processes(uid)
+        except BaseException:
+            user.release()
+            raise
+        return user
+
+
+def checker_user():
+    """
+    运行特殊评测程序的身份，返回 SandboxUser；未启用身份切换时返回 None
+
+    所有评测程序共用这个 uid，不加锁，release 时不杀进程。
+    """
+    base = judge_setting('JUDGE_SANDBOX_UID_BASE')
+    if base is None:
+        return None
+    if os.geteuid() != 0:
+        raise SandboxError('Judge must run as root to switch to sandbox users '
+                           '(set JUDGE_SANDBOX_UID_BASE = None only for development)')
+    uid = judge_setting('JUDGE_SANDBOX_CHECKER_UID')
+    if uid is None:
+        uid = base + judge_setting('JUDGE_SANDBOX_UID_COUNT')
+    return SandboxUser(uid, judge_setting('JUDGE_SANDBOX_GID'), judge_setting('JUDGE_SANDBOX_NPROC'), None)
+
+
+def readable_by_others(path):
+    """其他用户能否读取 path：路径上的每一级目录都允许进入，且文件本身允许读取"""
+    path = os.path.abspath(path)
+    try:
+        if not os.stat(path).st_mode & stat.S_IROTH:
+            return False
+        parent = os.path.dirname(path)
+        while True:
+            if not os.stat(parent).st_mode & stat.S_IXOTH:
+                return False
+            if parent == os.path.dirname(parent):
+                return True
+            parent = os.path.dirname(parent)
+    except OSError:
+        return False
+
+
+def check_sandbox_access():
+    """
+    检查评测节点的文件权限，返回警告信息列表
+
+    被评测程序不应能读取 Django 配置文件；Python 程序由评测进程所用的解释器运行，它必须能被其他用户执行。
+    """
+    from django.conf import settings
+
+    if judge_setting('JUDGE_SANDBOX_UID_BASE') is None:
+        return ['JUDGE_SANDBOX_UID_BASE is None: submitted programs run as the judge user and can read project files']
+    warnings = []
+    module = sys.modules.get(settings.SETTINGS_MODULE)
+    path = getattr(module, '__file__', None)
+    if path and readable_by_others(path):
+        warnings.append(f'{path} is readable by sandbox users; '
+                        f'remove read/execute permission for others on the project directory')
+    if not readable_by_others(os.path.realpath(sys.executable)):
+        warnings.append(f'{sys.executable} cannot be run by sandbox users; '
+                        f'install the judge with a Python interpreter outside the project and home directories')
+    return warnings
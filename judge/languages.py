@@ -0,0 +1,153 @@
+# _*_ coding:utf-8 _*_
+"""
+编程语言注册表
+
+每种语言注册一个 LanguageRunner，声明编译与运行方式、默认限制、时间倍数和编译缓存行为，
+评测引擎只通过这里分发。Submission.language 和 Problem.checker_language 不在模型上设 choices
+（否则增删语言都会产生迁移），提交和保存题目时用 is_registered 校验，页面上的语言列表取自 language_choices。
+
+新增语言或调整参数（例如 JVM 启动参数）可以在 settings.py 中配置 JUDGE_LANGUAGES，
+键为语言，值为覆盖的属性；新语言必须提供 name、source 和 run：
+
+    JUDGE_LANGUAGES = {
+        'java': {'run': ['java', '-Xshare:auto', '-Xmx{memory_mb}m', '-cp', '.', 'Main']},
+        'go': {'name': 'Go', 'source': 'main.go', 'compile': ['go', 'build', '-o', 'main', 'main.go'],
+               'version': ['go', 'version'], 'artifacts': ['main'], 'run': ['./main']},
+    }
+"""
+import sys
+
+
+class LanguageRunner(object):
+    """
+    一种语言的编译与运行方式
+
+    - source: 源文件名
+    - compile: 编译命令，None 表示无需编译
+    - version: 查询编译器版本的命令，作为编译缓存键的一部分
+    - artifacts: 编译产物的文件名模式
+    - cache_artifacts: 是否把编译产物放入编译缓存
+    - run: 运行命令，{memory_mb} 会被替换为内存限制
+    - limit_address_space: 是否用 RLIMIT_AS 限制内存（JVM 会预留大量虚拟内存，只能靠 -Xmx 限制）
+    - time_factor: 时间限制倍数，用于启动慢或运行慢的语言
+    - default_time_limit_ms / default_memory_limit_mb: 题目未设置限制时的默认值，None 表示使用全局默认值
+    """
+
+    def __init__(self, key, name, source, run, compile=None, version=None, artifacts=(), cache_artifacts=True,
+                 limit_address_space=True, time_factor=1.0, default_time_limit_ms=None,
+                 default_memory_limit_mb=None):
+        self.key = key
+        self.name = name
+        self.source = source
+        self.run = list(run)
+        self.compile = list(compile) if compile else None
+        self.version = list(version) if version else None
+        self.artifacts = list(artifacts)
+        self.cache_artifacts = cache_artifacts
+        self.limit_address_space = limit_address_space
+        self.time_factor = time_factor
+        self.default_time_limit_ms = default_time_limit_ms
+        self.default_memory_limit_mb = default_memory_limit_mb
+
+    def run_command(self, memory_mb):
+        """运行命令，替换其中的 {memory_mb} 占位符"""
+        return [part.format(memory_mb=memory_mb) for part in self.run]
+
+    def time_limit(self, base_ms):
+        """按时间倍数调整后的时间限制"""
+        return int(base_ms * self.time_factor)
+
+    def __repr__(self):
+        return f"LanguageRunner({self.key!r})"
+
+
+_registry = {}
+_settings_loaded = False
+
+
+def register(runner):
+    """注册或替换一种语言"""
+    _registry[runner.key] = runner
+    return runner
+
+
+def _load_settings():
+    """合并 settings.JUDGE_LANGUAGES 中的配置（只在第一次使用注册表时执行）"""
+    global _settings_loaded
+    if _settings_loaded:
+        return
+    _settings_loaded = True
+    from judge.conf import judge_setting
+
+    for key, options in judge_setting('JUDGE_LANGUAGES').items():
+        if key in _registry:
+            current = dict(vars(_registry[key]))
+            current.update(options)
+            register(LanguageRunner(**current))
+        else:
+            register(LanguageRunner(key=key, **options))
+
+
+def get_language(key):
+    """获取语言，不支持的语言抛出 KeyError"""
+    _load_settings()
+    return _registry[key]
+
+
+def registered_languages():
+    _load_settings()
+    return list(_registry.values())
+
+
+def is_registered(key):
+    """是否是已注册的语言"""
+    _load_settings()
+    return key in _registry
+
+
+def language_name(key):
+    """语言的显示名称，未注册的语言（例如已从配置中删除）返回键本身"""
+    _load_settings()
+    runner = _registry.get(key)
+    return runner.name if runner is not None else key
+
+
+def language_choices():
+    """供表单和页面使用的 (键, 显示名称) 列表"""
+    return tuple((runner.key, runner.name) for runner in registered_languages())
+
+
+register(LanguageRunner(
+    'python', 'Python', source='main.py',
+    # 与启动器使用同一个解释器，可以在预热的解释器中运行
+    run=[sys.executable, '-S', 'main.py'],
+))
+register(LanguageRunner(
+    'java', 'Java', source='Main.java',
+    compile=['javac', '-encoding', 'UTF-8', 'Main.java'],
+    version=['javac', '-version'],
+    artifacts=['*.class'],
+    # 串行 GC 减少 JVM 启动的线程数，类数据共享加快启动
+    run=['java', '-XX:+UseSerialGC', '-Xshare:auto', '-Xss64m', '-Xmx{memory_mb}m', '-cp', '.', 'Main'],
+    limit_address_space=False,
+    time_factor=2.0,
+))
+register(LanguageRunner(
+    'cpp', 'C++', source='main.cpp',
+    compile=['g++', '-O2', '-std=c++17', '-o', 'main', 'main.cpp'],
+    version=['g++', '--version'],
+    artifacts=['main'],
+    run=['./main'],
+))
+register(LanguageRunner(
+    'c', 'C', source='main.c',
+    compile=['gcc', '-O2', '-std=c11', '-o', 'main', 'main.c', '-lm'],
+    version=['gcc', '--version'],
+    artifacts=['main'],
+    run=['./main'],
+))
+register(LanguageRunner(
+    'javascript', 'JavaScript', source='main.js',
+    run=['node', '--max-old-space-size={memory_mb}', 'main.js'],
+    limit_address_space=False,
+))
@@ -0,0 +1,232 @@
+# _*_ coding:utf-8 _*_
+"""
+评测子进程启动器
+
+以独立的小进程运行（python -S -I launcher.py '<json配置>'），由它 fork 出被评测程序、
+在 exec 之前设置 rlimit 并切换到配置中的 uid/gid，用 wait4 回收子进程后杀掉整个进程组，结果以 JSON 写到标准输出。
+调用 setsid 脱离进程组的进程由 judge.isolation 在评测结束时按 uid 清理。
+执行时间取 wait4 返回的 CPU 时间（用户态 + 内核态），不受节点负载和调度影响；墙钟时间单独记录。
+以 --serve 参数启动时常驻运行，从标准输入逐行读取配置、逐行输出结果，省去每次运行的启动开销。
+
+配置中带有 python 项时不 exec 新的解释器，而是在 fork 出的子进程中直接执行 Python 源文件，
+被评测的 Python 程序复用启动器已经初始化好的解释器（预 fork 的 zygote）。
+
+Linux 下 wait4 返回的峰值内存包含 fork 时从父进程继承的内存，
+如果直接从 Django 进程 fork，每个程序都会被算上几十 MB。
+因此这里只能依赖几个很小的标准库模块，保持启动器本身足够小。
+"""
+import builtins
+import json
+import os
+import resource
+import signal
+import sys
+import time
+# os.execvpe 查找 PATH 时才导入，切换身份后可能无法再读取标准库
+import warnings  # noqa: F401
+
+
+def _open_fd(path, flags):
+    if path:
+        return os.open(path, flags, 0o644)
+    return os.open(os.devnull, flags)
+
+
+# 输出文件在被评测程序可以写入的工作目录中，以 root 打开时不跟随符号链接，否则残留进程可以借此截断任意文件
+_OUTPUT_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW
+
+
+def _exec_child(config):
+    """在子进程中设置限制并 exec，不会返回"""
+    try:
+        # 独立进程组，超时后可以连同子孙进程一起杀掉
+        os.setpgid(0, 0)
+        stdin_fd = _open_fd(config.get('stdin'), os.O_RDONLY)
+        stdout_fd = _open_fd(config.get('stdout'), _OUTPUT_FLAGS)
+        if config.get('stderr') and config.get('stderr') == config.get('stdout'):
+            stderr_fd = stdout_fd
+        else:
+            stderr_fd = _open_fd(config.get('stderr'), _OUTPUT_FLAGS)
+        os.dup2(stdin_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        os.closerange(3, 256)
+
+        time_limit_ms = config['time_limit_ms']
+        cpu_seconds = max(1, (time_limit_ms + 999) // 1000)
+        # 软限制到达时发 SIGXCPU，硬限制多留 1 秒兜底 SIGKILL
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        address_space_kb = config.get('address_space_kb') or config.get('memory_limit_kb')
+        if config.get('limit_address_space') and address_space_kb:
+            memory_bytes = address_space_kb * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        output_limit_bytes = config.get('output_limit_bytes')
+        if output_limit_bytes:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (output_limit_bytes, output_limit_bytes))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        # 恢复默认信号处理，Python 会忽略 SIGPIPE/SIGXFSZ
+        for signum in (signal.SIGPIPE, signal.SIGXFSZ):
+            signal.signal(signum, signal.SIG_DFL)
+
+        if config.get('cpu') is not None:
+            os.sched_setaffinity(0, {config['cpu']})
+
+        os.chdir(config['cwd'])
+        # 最后放弃 root 身份：RLIMIT_NPROC 按 uid 统计，对 root 不生效
+        if config.get('uid') is not None:
+            if config.get('nproc'):
+                resource.setrlimit(resource.RLIMIT_NPROC, (config['nproc'], config['nproc']))
+            os.setgroups([])
+            os.setgid(config['gid'])
+            os.setuid(config['uid'])
+        if config.get('python'):
+            _run_python(config)
+        os.execvpe(config['argv'][0], config['argv'], config['env'])
+    except BaseException:
+        pass
+    # exec 失败
+    os._exit(127)
+
+
+def _exit_status(code):
+    """与解释器退出时处理 SystemExit 的方式一致"""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xff
+    sys.stderr.write(f"{code}\n")
+    return 1
+
+
+def _run_python(config):
+    """在当前（已 fork 的）解释器中运行 Python 源文件，不会返回"""
+    script = config['python']['script']
+    os.environ.clear()
+    os.environ.update(config['env'])
+    # 重新创建标准输入输出，丢弃启动器自身的缓冲区
+    sys.stdin = os.fdopen(0, 'r', encoding='utf-8', closefd=False)
+    sys.stdout = os.fdopen(1, 'w', encoding='utf-8', closefd=False)
+    sys.stderr = os.fdopen(2, 'w', encoding='utf-8', errors='backslashreplace', closefd=False)
+    sys.argv = [script] + config['python']['args']
+    sys.path.insert(0, config['cwd'])
+
+    status = 0
+    try:
+        with open(script, 'rb') as f:
+            code = compile(f.read(), script, 'exec')
+        main = type(sys)('__main__')
+        main.__file__ = script
+        main.__builtins__ = builtins
+        sys.modules['__main__'] = main
+        exec(code, main.__dict__)
+    except SystemExit as e:
+        status = _exit_status(e.code)
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        status = 1
+    try:
+        sys.stdout.flush()
+    except BaseException:
+        # 与解释器相同，退出时无法写出缓冲区返回 120
+        status = status or 120
+    try:
+        sys.stderr.flush()
+    except BaseException:
+        pass
+    os._exit(status)
+
+
+def _cpu_time_ms(usage):
+    """子进程消耗的 CPU 时间（用户态 + 内核态）"""
+    return int((usage.ru_utime + usage.ru_stime) * 1000)
+
+
+def launch(config):
+    """
+    fork 并运行一个受限程序，返回结果字典
+
+    CPU 时间由子进程的 RLIMIT_CPU 限制，这里只用一个 SIGALRM 定时器限制墙钟时间（例如程序一直等待输入或 sleep），
+    然后阻塞在 wait4 上直到子进程退出，不做轮询。
+    """
+    start = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        _exec_child(config)
+    # 父进程同样设置一次，保证杀进程组时子进程已经在自己的进程组中
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+
+    state = {'timed_out': False}
+
+    def on_deadline(signum, frame):
+        state['timed_out'] = True
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    # 定时器和信号处理只在等待期间有效，之后 fork 的子进程不会继承
+    previous = signal.signal(signal.SIGALRM, on_deadline)
+    signal.setitimer(signal.ITIMER_REAL, config['wall_limit_ms'] / 1000.0)
+    try:
+        finished, status, usage = os.wait4(pid, 0)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+    # 程序退出后进程组中可能还有它 fork 出的后台进程，不论是否超时都一并杀掉
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    wall_time_ms = int((time.monotonic() - start) * 1000)
+
+    result = {
+        'exit_code': 0,
+        'term_signal': 0,
+        'time_ms': _cpu_time_ms(usage),
+        'wall_time_ms': wall_time_ms,
+        # Linux 下 ru_maxrss 单位为 KB
+        'memory_kb': usage.ru_maxrss,
+        'timed_out': state['timed_out'],
+        'output_exceeded': False,
+    }
+    if os.WIFSIGNALED(status):
+        result['term_signal'] = os.WTERMSIG(status)
+    else:
+        result['exit_code'] = os.WEXITSTATUS(status)
+
+    # 超过 RLIMIT_FSIZE 时内核在 write 时发送 SIGXFSZ，超出的部分不会写入文件；
+    # 忽略该信号的程序会在写入时出错退出，所以同时检查标准输出和标准错误文件是否写满
+    output_limit_bytes = config.get('output_limit_bytes')
+    if output_limit_bytes:
+        paths = {path for path in (config.get('stdout'), config.get('stderr')) if path}
+        result['output_exceeded'] = (result['term_signal'] == signal.SIGXFSZ
+                                     or any(os.path.getsize(path) >= output_limit_bytes for path in paths))
+    return result
+
+
+def serve():
+    """常驻模式：每行一个配置，每行一个结果"""
+    # 预先导入子进程报告异常时用到的模块
+    import traceback  # noqa: F401
+    for line in sys.stdin.buffer:
+        result = launch(json.loads(line))
+        sys.stdout.buffer.write(json.dumps(result).encode('utf-8') + b'\n')
+        sys.stdout.buffer.flush()
+
+
+def main():
+    if sys.argv[1] == '--serve':
+        serve()
+        return
+    config = json.loads(sys.argv[1])
+    result = launch(config)
+    sys.stdout.write(json.dumps(result))
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# _*_ coding:utf-8 _*_
+"""
+客观题评分
+
+选择题、填空题、判断题直接与 Problem.answer_key 比较，在当前进程中完成，不经过评测队列和沙箱。
+标准答案格式：
+- 选择题：选项字母，多选题写出全部正确选项，如 "ACD"，顺序和分隔符不限
+- 填空题：每行一个空，同一个空的多个可接受答案用 | 分隔，如 "O(n)|O(N)\\n递归"
+- 判断题：对/错、正确/错误、T/F、True/False、√/× 均可
+
+一整份试卷的答案一次调用评分：一条查询读取全部题目的标准答案（规范化后的标准答案按题目缓存在进程内），
+逐题比较后在一个事务中批量插入提交记录，统计更新与代码题共用 judge.engine.save_results。
+"""
+import re
+import threading
+import unicodedata
+
+from django.db import transaction
+
+from own_models.problem_models import Problem
+from own_models.student_practice import Submission
+
+# Problem.PROBLEM_TYPE_CHOICES 中的客观题
+CHOICE = 1
+FILL_BLANK = 2
+TRUE_FALSE = 3
+OBJECTIVE_TYPES = (CHOICE, FILL_BLANK, TRUE_FALSE)
+
+TRUE_WORDS = {'t', 'true', 'y', 'yes', '1', '对', '正确', '是', '√', '✓'}
+FALSE_WORDS = {'f', 'false', 'n', 'no', '0', '错', '错误', '否', '×', '✗', 'x'}
+
+# 标准答案为空或无法识别时的评测信息
+MISSING_KEY_MESSAGE = 'No answer key for this problem'
+
+_WHITESPACE = re.compile(r'\s+')
+_OPTION = re.compile(r'[A-Z]')
+
+# 题目 ID -> (更新时间, 规范化后的标准答案)
+_keys = {}
+_lock = threading.Lock()
+
+
+def normalize_text(text):
+    """填空答案规范化：全角转半角、合并空白、忽略大小写"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def normalize_choice(text):
+    """选择题答案规范化为排好序的选项字母"""
+    return ''.join(sorted(set(_OPTION.findall(unicodedata.normalize('NFKC', text or '').upper()))))
+
+
+def normalize_bool(text):
+    """判断题答案规范化为 True/False，无法识别时为 None"""
+    word = normalize_text(text)
+    if word in TRUE_WORDS:
+        return True
+    if word in FALSE_WORDS:
+        return False
+    return None
+
+
+def _blanks(text):
+    return (text or '').replace('\r\n', '\n').split('\n')
+
+
+def parse_key(problem_type, answer_key):
+    """规范化标准答案"""
+    if problem_type == CHOICE:
+        return normalize_choice(answer_key)
+    if problem_type == TRUE_FALSE:
+        return normalize_bool(answer_key)
+    return [{normalize_text(option) for option in blank.split('|')} for blank in _blanks((answer_key or '').strip())]
+
+
+def is_valid_key(problem_type, key):
+    """规范化后的标准答案是否可用：选择题至少一个选项，判断题可识别，填空题每个空至少一个非空答案"""
+    if problem_type == CHOICE:
+        return bool(key)
+    if problem_type == TRUE_FALSE:
+        return key is not None
+    return bool(key) and all(any(options) for options in key)
+
+
+def grade(problem_type, key, answer):
+    """
+    按规范化后的标准答案评一道题
+
+    返回 (状态, 百分制得分)；填空题按答对的空数给部分分，
+    标准答案不可用时为 system_error，避免题目配置错误被当成学生答错
+    """
+    if not is_valid_key(problem_type, key):
+        return 'system_error', 0
+    if problem_type == FILL_BLANK:
+        answers = [normalize_text(blank) for blank in _blanks(answer.strip())]
+        correct = sum(1 for index, options in enumerate(key) if index < len(answers) and answers[index] in options)
+        score = round(correct * 100 / len(key))
+    elif problem_type == CHOICE:
+        score = 100 if normalize_choice(answer) == key else 0
+    else:
+        score = 100 if normalize_bool(answer) == key else 0
+    return ('accepted' if score == 100 else 'wrong_answer'), score
+
+
+def _answer_keys(problems):
+    """[(id, 类型, 标准答案, 更新时间)] -> {题目 ID: (类型, 规范化后的标准答案)}"""
+    keys = {}
+    with _lock:
+        for problem_id, problem_type, answer_key, updated_at in problems:
+            cached = _keys.get(problem_id)
+            if cached is None or cached[0] != updated_at:
+                cached = (updated_at, parse_key(problem_type, answer_key))
+                _keys[problem_id] = cached
+            keys[problem_id] = (problem_type, cached[1])
+    return keys
+
+
+def grade_problem(problem, answer):
+    """评一道已加载的客观题，返回 (状态, 百分制得分)"""
+    key = _answer_keys([(problem.id, problem.problem_type, problem.answer_key, problem.updated_at)])[problem.id]
+    return grade(problem.problem_type, key[1], answer)
+
+
+def grade_answers(user_id, answers):
+    """
+    批量评分并保存
+
+    answers 为 {题目 ID: 答案文本}，非客观题或不存在的题目被忽略。
+    返回 {题目 ID: Submission}，提交记录已写入评分结果。
+    """
+    from judge.engine import JudgeResult, save_results
+
+    problems = Problem.objects.filter(
+        id__in=list(answers), problem_type__in=OBJECTIVE_TYPES
+    ).values_list('id', 'problem_type', 'answer_key', 'updated_at')
+    keys = _answer_keys(problems)
+
+    graded = {}
+    for problem_id, (problem_type, key) in sorted(keys.items()):
+        answer = answers[problem_id] or ''
+        status, score = grade(problem_type, key, answer)
+        graded[problem_id] = Submission(
+            user_id=user_id, problem_id=problem_id, code=answer, language='', status=status, score=score,
+            error_message=MISSING_KEY_MESSAGE if status == 'system_error' else None,
+        )
+    submissions = list(graded.values())
+    with transaction.atomic():
+        Submission.objects.bulk_create(submissions)
+        if submissions and submissions[0].pk is None:
+            _load_ids(user_id, submissions)
+        save_results([JudgeResult(submission, submission.status, score=submission.score,
+                                  error_message=submission.error_message)
+                      for submission in submissions])
+    return graded
+
+
+def _load_ids(user_id, submissions):
+    """
+    MySQL 的 bulk_create 不返回自增主键，按 (题目, 提交时间) 查回刚插入的记录
+
+    提交时间精确到微秒，同一用户在同一题目上的两条提交不会相同。
+    """
+    rows = Submission.objects.filter(
+        user_id=user_id,
+        problem_id__in=[submission.problem_id for submission in submissions],
+        created_at__in=[submission.created_at for submission in submissions],
+    ).values_list('problem_id', 'created_at', 'id')
+    ids = {(problem_id, created_at): submission_id for problem_id, created_at, submission_id in rows}
+    for submission in submissions:
+        submission.pk = ids[(submission.problem_id, submission.created_at)]
@@ -0,0 +1,309 @@
+# _*_ coding:utf-8 _*_
+"""
+多进程评测进程池
+
+父进程作为监督者：按 CPU 核数 fork 评测进程并把每个进程绑定到一个核上，
+被评测程序继承该绑定，避免多个程序争抢同一个核导致执行时间失真。
+子进程异常退出时，监督者把它认领的任务放回队列并在同一个核上重新启动。
+收到 SIGTERM/SIGINT 时通知所有子进程平滑排空后退出。
+
+一个进程池就是一个评测节点：启动时在 own_models_judge_node 中注册，监督时更新节点心跳。
+子进程不直接查询队列，而是通过管道报告空闲并发数，监督者用一个事务为整个节点认领一批任务
+（批大小为各子进程空闲并发数之和，满载时即核数）再分发下去，
+队列的数据库压力与节点数而不是评测进程总数成正比。
+节点之间不共享状态：编译缓存、测试数据、评测程序和标准答案缓存都在各节点本地，
+新增节点只需要在新机器上运行 run_judge_workers。
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from multiprocessing.connection import wait
+
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
+from judge.conf import judge_setting
+from judge.cores import node_cpus
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(name, cpu, concurrency, node, dispatcher):
+    """子进程入口"""
+    # 父进程的信号处理不适用于子进程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+    from judge.worker import JudgeWorker
+    worker = JudgeWorker(name=name, concurrency=concurrency, cpu=cpu, node=node, dispatcher=dispatcher)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+class WorkerPool(object):
+    """
+    评测进程池（一个评测节点）
+
+    name_prefix 为节点名称，默认为主机名，同一台机器上运行多个进程池时必须不同。
+    """
+
+    def __init__(self, processes=None, concurrency=1, pin_cpus=True, exit_when_empty=False, name_prefix=None):
+        # 子进程绑定核之后只能看到自己的核，先在父进程中记下本节点的全部核
+        cpus = node_cpus()
+        self.cpu_count = len(cpus)
+        self.processes = processes or len(cpus)
+        self.concurrency = concurrency
+        self.exit_when_empty = exit_when_empty
+        self.name_prefix = name_prefix or socket.gethostname()
+        # 进程数超过核数时按顺序循环绑定
+        self.cpus = [cpus[i % len(cpus)] if pin_cpus else None for i in range(self.processes)]
+        # slot -> (进程, 评测进程名称, 管道)
+        self.children = {}
+        # slot -> 子进程最近报告的空闲并发数
+        self.demand = {}
+        self.draining = False
+        self.poll_interval = judge_setting('JUDGE_POLL_INTERVAL')
+        # 尚未写入节点记录的认领批次和任务数
+        self._batches = 0
+        self._claimed = 0
+        self._context = multiprocessing.get_context('fork')
+        # 通知重新评测统计线程退出
+        self._stopped = threading.Event()
+
+    def _start(self, slot):
+        cpu = self.cpus[slot]
+        name = f"{self.name_prefix}:{os.getpid()}:{slot}"
+        # fork 前关闭数据库连接，避免父子进程共用同一个连接
+        connections.close_all()
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(name, cpu, self.concurrency, self.name_prefix, child_conn),
+            name=f"judge-worker-{slot}",
+        )
+        process.start()
+        child_conn.close()
+        self.children[slot] = (process, name, conn)
+        logger.info(f"Started judge worker {name} (pid {process.pid}) on cpu {cpu}")
+
+    # 节点注册与心跳
+
+    def _register(self):
+        from own_models.judge_models import JudgeNode
+
+        now = timezone.now()
+        JudgeNode.objects.update_or_create(name=self.name_prefix, defaults={
+            'hostname': socket.gethostname(), 'pid': os.getpid(), 'cpu_count': self.cpu_count,
+            'processes': self.processes, 'concurrency': self.concurrency, 'status': 'running',
+            'claim_batches': 0, 'tasks_claimed': 0, 'started_at': now, 'last_heartbeat': now,
+        })
+
+    def _node_heartbeat(self, status='running'):
+        from own_models.judge_models import JudgeNode
+
+        batches, claimed = self._batches, self._claimed
+        try:
+            JudgeNode.objects.filter(name=self.name_prefix).update(
+                status=status, last_heartbeat=timezone.now(),
+                claim_batches=F('claim_batches') + batches, tasks_claimed=F('tasks_claimed') + claimed,
+            )
+            self._batches -= batches
+            self._claimed -= claimed
+        except Exception:
+            logger.exception(f"Judge node {self.name_prefix} failed to write heartbeat")
+
+    # 任务分发
+
+    def _receive(self, slot):
+        """读取子进程报告的空闲并发数"""
+        process, name, conn = self.children[slot]
+        try:
+            self.demand[slot] = conn.recv()
+        except EOFError:
+            # 子进程正在退出
+            self._reap(slot)
+
+    def _dispatch(self):
+        """为有空闲并发的子进程批量认领一批任务并分发，返回认领到的任务数"""
+        from judge.task_queue import claim_batch, release_tasks
+
+        waiting = [(slot, free) for slot, free in self.demand.items() if free > 0]
+        if not waiting:
+            return 0
+        # 交错排列，任务少于空闲并发数时每个子进程先各分到一个
+        slots = []
+        for round_ in range(max(free for slot, free in waiting)):
+            slots.extend(self.children[slot][1] for slot, free in waiting if free > round_)
+        tasks = claim_batch(slots)
+        if not tasks:
+            return 0
+        self._batches += 1
+        self._claimed += len(tasks)
+        assigned = {}
+        for task in tasks:
+            assigned.setdefault(task.worker, []).append(task)
+        for slot, free in waiting:
+            process, name, conn = self.children[slot]
+            if name not in assigned:
+                continue
+            try:
+                conn.send([task.id for task in assigned[name]])
+                self.demand[slot] = 0
+            except OSError:
+                # 子进程已经退出，任务放回队列
+                release_tasks(assigned[name])
+        return len(tasks)
+
+    def _idle(self):
+        """所有子进程都报告了全部并发空闲"""
+        return all(self.demand.get(slot) == self.concurrency for slot in self.children)
+
+    def _finish(self):
+        """--once：队列已空且子进程都空闲，通知子进程退出"""
+        self.draining = True
+        for process, name, conn in self.children.values():
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+
+    def _handle_signal(self, signum, frame):
+        self.drain()
+
+    def drain(self):
+        """通知所有子进程不再认领新任务，评测完当前任务后退出"""
+        if self.draining:
+            return
+        self.draining = True
+        logger.info("Draining judge workers")
+        for process, name, conn in self.children.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    def _reap(self, slot):
+        """处理退出的子进程，重新入队它没评测完的任务，异常退出时重启"""
+        from judge.task_queue import requeue_worker_tasks
+
+        process, name, conn = self.children.pop(slot)
+        self.demand.pop(slot, None)
+        conn.close()
+        process.join()
+        # 正常退出时也可能有刚分发、还没收到的任务
+        requeued, failed = requeue_worker_tasks([name])
+        if process.exitcode != 0:
+            logger.warning(f"Judge worker {name} exited with {process.exitcode}, "
+                           f"requeued {requeued} task(s), gave up on {failed}")
+            if not self.draining:
+                self._start(slot)
+        connections.close_all()
+
+    def _supervise(self):
+        """更新节点心跳，回收失联进程和超时的任务、为没有任务的提交补建任务，推进批量重新评测（入队），清理过期的试运行"""
+        from judge.rejudge import advance_rejudge_jobs
+        from judge.task_queue import reap_stuck_submissions
+        from judge.trial_run import purge_trial_runs
+
+        self._node_heartbeat()
+        try:
+            counts = reap_stuck_submissions()
+            if any(counts.values()):
+                logger.warning(f"Reaped stuck submissions: requeued {counts['requeued']} task(s), "
+                               f"gave up on {counts['failed']}, re-enqueued {counts['orphans']} orphan(s)")
+        except Exception:
+            logger.exception("Failed to reap stuck judge tasks")
+        try:
+            count = advance_rejudge_jobs()
+            if count:
+                logger.info(f"Enqueued {count} rejudge task(s)")
+        except Exception:
+            logger.exception("Failed to advance rejudge jobs")
+        try:
+            purge_trial_runs()
+        except Exception:
+            logger.exception("Failed to purge expired trial runs")
+        finally:
+            connections.close_all()
+
+    def _finalize_rejudges(self):
+        """单独的线程：分批完成重新评测的统计更新，耗时的更新不阻塞监督循环的认领和分发"""
+        from judge.rejudge import finalize_step
+
+        interval = judge_setting('JUDGE_HEARTBEAT_INTERVAL')
+        while True:
+            try:
+                while not self._stopped.is_set() and finalize_step():
+                    pass
+            except Exception:
+                logger.exception("Failed to finalize rejudge jobs")
+            finally:
+                connections.close_all()
+            if self._stopped.wait(interval):
+                return
+
+    def run(self):
+        from judge.isolation import check_sandbox_access
+        from judge.task_queue import enqueue_orphan_submissions
+
+        for warning in check_sandbox_access():
+            logger.warning(warning)
+        # 启动时不等待宽限期：本节点上一次运行留下的提交都可以补建任务
+        count = enqueue_orphan_submissions()
+        if count:
+            logger.warning(f"Re-enqueued {count} submission(s) without a judge task")
+        self._register()
+        self._supervise()
+
+        previous_handlers = {
+            signum: signal.signal(signum, self._handle_signal) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            for slot in range(self.processes):
+                self._start(slot)
+            finalizer = threading.Thread(target=self._finalize_rejudges, name='rejudge-finalizer', daemon=True)
+            finalizer.start()
+            interval = judge_setting('JUDGE_HEARTBEAT_INTERVAL')
+            next_check = time.monotonic() + interval
+            # 上次认领到任务时立即继续认领，队列为空时每 poll_interval 秒查询一次
+            next_claim = time.monotonic()
+            drain_reported = False
+            while self.children:
+                deadline = next_check
+                if not self.draining and any(self.demand.values()):
+                    deadline = min(deadline, next_claim)
+                objects = {}
+                for slot, (process, name, conn) in self.children.items():
+                    objects[process.sentinel] = (self._reap, slot, process)
+                    objects[conn] = (self._receive, slot, process)
+                for ready in wait(list(objects), timeout=max(0, deadline - time.monotonic())):
+                    handler, slot, process = objects[ready]
+                    # 同一轮中子进程可能已经被回收或重启
+                    if slot in self.children and self.children[slot][0] is process:
+                        handler(slot)
+                if self.draining and not drain_reported:
+                    self._node_heartbeat('draining')
+                    drain_reported = True
+                now = time.monotonic()
+                if not self.draining and any(self.demand.values()) and now >= next_claim:
+                    try:
+                        claimed = self._dispatch()
+                    except Exception:
+                        logger.exception(f"Judge node {self.name_prefix} failed to claim tasks")
+                        connections.close_all()
+                        claimed = 0
+                    next_claim = now if claimed else now + self.poll_interval
+                    if not claimed and self.exit_when_empty and self._idle():
+                        self._finish()
+                if not self.draining and now >= next_check:
+                    self._supervise()
+                    next_check = time.monotonic() + interval
+        finally:
+            self._stopped.set()
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            self._node_heartbeat('stopped')
+            connections.close_all()
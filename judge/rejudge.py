@@ -0,0 +1,198 @@
+# _*_ coding:utf-8 _*_
+"""
+批量重新评测
+
+修改测试数据或评测限制后，需要重新评测一道题目或一份试卷的全部提交。
+一次性入队会让队列被数千个任务占满，这里按 RejudgeJob 分批入队：
+
+- 任务使用最低优先级（JudgeTask.PRIORITY_REJUDGE），新的比赛和练习提交总是先被评测；
+- 每次推进按 rate_per_minute 和距上次入队的时间计算可入队的数量，
+  并且队列中属于重新评测的任务不超过 JUDGE_REJUDGE_MAX_QUEUED；
+- 按提交 ID 递增入队，进度保存在 RejudgeJob.last_submission_id，评测进程重启后从断点继续；
+- 重新评测的结果不逐条更新题目计数和学生统计，全部评测完成后按题目、按学生各统一更新一次，
+  学生较多时分批在各自的短事务中更新（finalize_step）。
+
+推进由评测进程池的监督循环定期调用 advance_rejudge_jobs()，统计更新由进程池的单独线程调用 finalize_step()；
+也可以用 rejudge --wait 命令在前台推进。
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from judge.conf import judge_setting
+from own_models.judge_models import JudgeTask, RejudgeJob
+from own_models.organize_competitions_models import PaperAssignment
+from own_models.problem_models import Problem
+from own_models.ranking_system_models import RankingSystem
+from own_models.student_practice import StudentStatistics, Submission
+
+logger = logging.getLogger(__name__)
+
+# 已经有评测任务的提交会按新的测试数据评测，不需要再入队
+_ACTIVE_TASK_STATUSES = ('queued', 'running')
+
+
+def job_submissions(job):
+    """重新评测范围内的提交"""
+    if job.problem_id is not None:
+        return Submission.objects.filter(problem_id=job.problem_id)
+    assigned = PaperAssignment.objects.filter(paper_id=job.paper_id).values('user_id')
+    return Submission.objects.filter(problem__papers=job.paper_id, user_id__in=assigned)
+
+
+def create_rejudge_job(problem=None, paper=None, created_by=None, rate_per_minute=None):
+    """创建重新评测，problem 和 paper 二选一，返回 RejudgeJob"""
+    if (problem is None) == (paper is None):
+        raise ValueError("Exactly one of problem and paper is required")
+    job = RejudgeJob(
+        problem=problem,
+        paper_id=paper.id if paper is not None else None,
+        created_by=created_by,
+        rate_per_minute=rate_per_minute or judge_setting('JUDGE_REJUDGE_RATE_PER_MINUTE'),
+    )
+    job.total = job_submissions(job).count()
+    job.save()
+    return job
+
+
+def cancel_rejudge_job(job_id):
+    """停止继续入队，已经入队的任务照常评测，评测完后仍会更新统计"""
+    return RejudgeJob.objects.filter(id=job_id, status='running').update(status='cancelled')
+
+
+def _budget(job, now):
+    """本次最多可以入队的提交数"""
+    since = job.last_advanced_at or job.created_at
+    allowed = int(job.rate_per_minute * (now - since).total_seconds() / 60)
+    # 长时间没有推进（例如评测进程都停了）后不一次性补齐，最多入队一分钟的量
+    allowed = min(allowed, job.rate_per_minute)
+    outstanding = JudgeTask.objects.filter(priority=JudgeTask.PRIORITY_REJUDGE, status='queued').count()
+    return max(0, min(allowed, judge_setting('JUDGE_REJUDGE_MAX_QUEUED') - outstanding))
+
+
+def _enqueue_batch(job, now):
+    """按进度入队下一批提交，返回入队数量"""
+    budget = _budget(job, now)
+    if budget <= 0:
+        return 0
+    batch = list(job_submissions(job).filter(id__gt=job.last_submission_id).order_by('id').values_list(
+        'id', 'judge_task__status'
+    )[:budget])
+    if not batch:
+        return 0
+    submission_ids = [submission_id for submission_id, task_status in batch
+                      if task_status not in _ACTIVE_TASK_STATUSES]
+    # 与 task_queue 的公平排队一致：新任务排在当前队首之后
+    head = JudgeTask.objects.filter(status='queued', priority=JudgeTask.PRIORITY_REJUDGE).aggregate(
+        head=Min('virtual_time'))['head'] or 0
+    JudgeTask.objects.bulk_create([
+        JudgeTask(submission_id=submission_id, priority=JudgeTask.PRIORITY_REJUDGE, virtual_time=head + 1,
+                  rejudge_job=job)
+        for submission_id in submission_ids
+    ], ignore_conflicts=True)
+    Submission.objects.filter(id__in=submission_ids).update(status='pending', updated_at=now)
+
+    job.last_submission_id = batch[-1][0]
+    job.enqueued += len(batch)
+    job.last_advanced_at = now
+    job.save(update_fields=['last_submission_id', 'enqueued', 'last_advanced_at'])
+    return len(submission_ids)
+
+
+def _update_accepted_counts(job):
+    """用一条 UPDATE 按提交记录重新计算范围内题目的通过数"""
+    if job.problem_id is not None:
+        problem_ids = [job.problem_id]
+    else:
+        # MySQL 的 UPDATE 不能在 WHERE 子查询中读取被更新的表，先查出题目 ID
+        problem_ids = list(Problem.objects.filter(papers=job.paper_id).values_list('id', flat=True))
+    accepted = Submission.objects.filter(problem_id=OuterRef('pk'), status='accepted').values(
+        'problem_id').annotate(count=Count('id')).values('count')
+    Problem.objects.filter(id__in=problem_ids).update(accepted_count=Coalesce(Subquery(accepted), 0))
+
+
+def finalize_step():
+    """
+    为一个评测已全部完成的重新评测更新一批学生的统计，返回是否做了工作
+
+    每次调用是一个短事务：第一批先更新题目通过数，之后按用户 ID 递增每次处理 JUDGE_REJUDGE_FINALIZE_CHUNK 个学生的
+    统计、试卷正确率和排名指标，进度保存在 RejudgeJob.finalized_user_id；全部处理完后结束并重新计算排名。
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = RejudgeJob.objects.select_for_update().filter(
+            judged_at__isnull=False, finished_at__isnull=True
+        ).order_by('id').first()
+        if job is None:
+            return False
+        if job.finalized_user_id == 0:
+            _update_accepted_counts(job)
+        user_ids = list(job_submissions(job).filter(user_id__gt=job.finalized_user_id).order_by(
+            'user_id').values_list('user_id', flat=True).distinct()[:judge_setting('JUDGE_REJUDGE_FINALIZE_CHUNK')])
+        if user_ids:
+            for user_id in user_ids:
+                stats, created = StudentStatistics.objects.get_or_create(user_id=user_id)
+                stats.update_statistics()
+            problem_ids = set(job_submissions(job).filter(user_id__in=user_ids).values_list(
+                'problem_id', flat=True).distinct())
+            # 没有完成时间的已完成试卷分不清哪些是答卷时的提交，保留原来的正确率
+            for assignment in PaperAssignment.objects.filter(
+                Q(is_completed=False) | Q(completed_at__isnull=False),
+                user_id__in=user_ids, paper__problems__in=problem_ids,
+            ).select_related('paper').distinct():
+                assignment.update_completion_rate()
+            for ranking in RankingSystem.objects.filter(user_id__in=user_ids).select_related('user'):
+                ranking.update_metrics()
+            job.finalized_user_id = user_ids[-1]
+            job.save(update_fields=['finalized_user_id'])
+            return True
+
+        job.finished_at = now
+        if job.status == 'running':
+            job.status = 'finished'
+        job.save(update_fields=['status', 'finished_at'])
+    # 排名需要改写所有用户的名次，不放在事务中长时间持有锁
+    if job.finalized_user_id:
+        RankingSystem.update_all_rankings()
+    logger.info(f"Rejudge job {job.id} finished: {job.enqueued} submission(s)")
+    return True
+
+
+def finalize_rejudge_jobs():
+    """完成所有评测已结束的重新评测的统计更新，返回处理的批数"""
+    steps = 0
+    while finalize_step():
+        steps += 1
+    return steps
+
+
+def advance_rejudge_jobs():
+    """
+    推进所有未完成的重新评测，返回本次入队的任务数
+
+    入队完毕且本任务的评测任务全部完成时记下 judged_at，统计更新由 finalize_step 分批完成
+    （评测进程池在单独的线程中执行，不阻塞监督循环）。多个监督进程同时调用时，
+    同一个 RejudgeJob 同一时刻只由一个进程推进。
+    """
+    enqueued = 0
+    job_ids = list(RejudgeJob.objects.filter(judged_at__isnull=True, finished_at__isnull=True).order_by(
+        'id').values_list('id', flat=True))
+    for job_id in job_ids:
+        now = timezone.now()
+        with transaction.atomic():
+            job = RejudgeJob.objects.select_for_update().filter(
+                id=job_id, judged_at__isnull=True, finished_at__isnull=True
+            ).first()
+            if job is None:
+                continue
+            if job.status == 'running':
+                enqueued += _enqueue_batch(job, now)
+                if job_submissions(job).filter(id__gt=job.last_submission_id).exists():
+                    continue
+            if not JudgeTask.objects.filter(rejudge_job=job).exists():
+                job.judged_at = now
+                job.save(update_fields=['judged_at'])
+    return enqueued
@@ -0,0 +1,231 @@
+# _*_ coding:utf-8 _*_
+"""
+受限子进程执行
+
+被评测程序由 judge/launcher.py 这个独立的小进程 fork 并在 exec 之前设置 rlimit
+（CPU 时间、地址空间、输出文件大小、进程数）、切换到无特权的 uid（见 judge.isolation），
+启动器负责墙钟超时、程序结束后杀掉整个进程组，以及资源使用统计（CPU 时间、墙钟时间、峰值内存）。
+Django 进程本身从不 fork 被评测程序。本模块不依赖 Django，便于单独测试。
+
+preforked=True 时使用常驻的启动器进程（每个评测进程按需启动，运行结束后放回空闲列表复用），
+用当前解释器运行的 Python 程序直接在启动器 fork 出的子进程中执行，不再启动新的解释器。
+"""
+import json
+import os
+import select
+import signal
+import stat
+import subprocess
+import sys
+import threading
+
+LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'launcher.py')
+
+# 启动器本身的启动和回收时间余量（毫秒）
+LAUNCHER_GRACE_MS = 5000
+
+
+class SandboxError(Exception):
+    """启动器异常退出，属于评测系统错误而不是程序错误"""
+
+
+class RunResult(object):
+    """一次子进程运行的结果"""
+
+    def __init__(self, exit_code=0, term_signal=0, time_ms=0, memory_kb=0, timed_out=False,
+                 output_exceeded=False, wall_time_ms=0):
+        self.exit_code = exit_code
+        self.term_signal = term_signal
+        # CPU 时间（用户态 + 内核态）和墙钟时间
+        self.time_ms = time_ms
+        self.wall_time_ms = wall_time_ms
+        self.memory_kb = memory_kb
+        self.timed_out = timed_out
+        self.output_exceeded = output_exceeded
+
+    @property
+    def cpu_exceeded(self):
+        """CPU 时间超过 RLIMIT_CPU 时内核发送 SIGXCPU"""
+        return self.term_signal == signal.SIGXCPU
+
+    @property
+    def ok(self):
+        return not self.timed_out and self.term_signal == 0 and self.exit_code == 0
+
+    def __repr__(self):
+        return (f"RunResult(exit_code={self.exit_code}, term_signal={self.term_signal}, "
+                f"time_ms={self.time_ms}, wall_time_ms={self.wall_time_ms}, memory_kb={self.memory_kb}, "
+                f"timed_out={self.timed_out}, output_exceeded={self.output_exceeded})")
+
+
+def private_directory(path, mode=0o700):
+    """创建目录并设置权限，评测节点本地的测试数据、缓存等目录不允许被评测程序读取"""
+    os.makedirs(path, mode=mode, exist_ok=True)
+    if stat.S_IMODE(os.stat(path).st_mode) != mode:
+        os.chmod(path, mode)
+    return path
+
+
+def open_output(path):
+    """
+    打开被评测程序写出的文件（标准输出、标准错误）读取，返回二进制文件对象
+
+    这些文件在被评测程序的 uid 可以写入的目录中，残留的后台进程可能把它们换成符号链接；
+    评测进程不跟随符号链接，不是普通文件时抛出 OSError。
+    """
+    fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+    f = os.fdopen(fd, 'rb')
+    if not stat.S_ISREG(os.fstat(fd).st_mode):
+        f.close()
+        raise OSError(f'{path} is not a regular file')
+    return f
+
+
+def default_env():
+    return {'PATH': os.environ.get('PATH', '/usr/bin:/bin'), 'LANG': 'C.UTF-8'}
+
+
+# 可以在预热的解释器中运行的 Python 命令行选项
+PREFORK_PYTHON_OPTIONS = ('-S',)
+
+
+class LauncherServer(object):
+    """常驻的启动器进程，一次处理一个运行请求"""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-S', '-I', LAUNCHER, '--serve'],
+            cwd='/', stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def run(self, config, timeout):
+        try:
+            self.process.stdin.write(json.dumps(config).encode('utf-8') + b'\n')
+            self.process.stdin.flush()
+        except OSError as e:
+            raise SandboxError(f'Launcher is not running: {e}')
+        readable, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not readable:
+            raise SandboxError('Launcher did not finish in time')
+        line = self.process.stdout.readline()
+        if not line:
+            raise SandboxError(f'Launcher exited with {self.process.wait()}')
+        return json.loads(line)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+_idle_servers = []
+_servers_pid = None
+_servers_lock = threading.Lock()
+
+
+def _acquire_server():
+    global _idle_servers, _servers_pid
+    with _servers_lock:
+        # fork 出的子进程不能使用父进程的启动器
+        if _servers_pid != os.getpid():
+            _idle_servers, _servers_pid = [], os.getpid()
+        if _idle_servers:
+            return _idle_servers.pop()
+    return LauncherServer()
+
+
+def _release_server(server):
+    with _servers_lock:
+        if _servers_pid == os.getpid():
+            _idle_servers.append(server)
+            return
+    server.close()
+
+
+def close_servers():
+    """关闭当前进程的所有空闲启动器"""
+    with _servers_lock:
+        servers = _idle_servers[:] if _servers_pid == os.getpid() else []
+        del _idle_servers[:]
+    for server in servers:
+        server.close()
+
+
+def _python_script(argv):
+    """argv 是用当前解释器运行脚本时返回 {'script', 'args'}，否则返回 None"""
+    if not argv or argv[0] != sys.executable:
+        return None
+    for index, arg in enumerate(argv[1:], 1):
+        if arg not in PREFORK_PYTHON_OPTIONS:
+            if arg.startswith('-'):
+                return None
+            return {'script': arg, 'args': list(argv[index + 1:])}
+    return None
+
+
+def run_process(argv, cwd, stdin_path=None, stdout_path=None, stderr_path=None,
+                time_limit_ms=1000, wall_limit_ms=None, memory_limit_kb=0, address_space_kb=None,
+                output_limit_bytes=0, limit_address_space=True, env=None, cpu=None, preforked=False, user=None):
+    """
+    在受限子进程中运行命令
+
+    参数:
+    - argv: 命令及参数
+    - cwd: 工作目录
+    - stdin_path / stdout_path / stderr_path: 标准输入输出重定向的文件，None 表示 /dev/null
+    - time_limit_ms: CPU 时间限制（毫秒）
+    - wall_limit_ms: 墙钟时间限制（毫秒），默认为 CPU 时间限制的 3 倍
+    - memory_limit_kb: 地址空间限制（KB），0 表示不限制
+    - address_space_kb: 实际设置的地址空间上限（KB），默认等于 memory_limit_kb；
+      设得更大时由调用者比较峰值内存和 memory_limit_kb 判定超内存
+    - output_limit_bytes: 单个输出文件大小上限，0 表示不限制
+    - cpu: 把程序绑定到指定的核上，None 表示继承当前进程的绑定
+    - preforked: 使用常驻启动器，Python 程序在预热的解释器中运行
+    - user: 运行程序的身份（带 uid、gid、nproc 属性，见 judge.isolation.SandboxUser），None 表示不切换身份
+
+    返回 RunResult，启动器本身出错时抛出 SandboxError
+    """
+    if wall_limit_ms is None:
+        wall_limit_ms = time_limit_ms * 3
+    config = {
+        'argv': list(argv),
+        'cwd': os.path.abspath(cwd),
+        'stdin': os.path.abspath(stdin_path) if stdin_path else None,
+        'stdout': os.path.abspath(stdout_path) if stdout_path else None,
+        'stderr': os.path.abspath(stderr_path) if stderr_path else None,
+        'time_limit_ms': time_limit_ms,
+        'wall_limit_ms': wall_limit_ms,
+        'memory_limit_kb': memory_limit_kb,
+        'address_space_kb': address_space_kb,
+        'output_limit_bytes': output_limit_bytes,
+        'limit_address_space': limit_address_space,
+        'env': env if env is not None else default_env(),
+        'cpu': cpu,
+    }
+    if user is not None:
+        config.update(uid=user.uid, gid=user.gid, nproc=user.nproc)
+    timeout = (wall_limit_ms + LAUNCHER_GRACE_MS) / 1000.0
+    if preforked:
+        config['python'] = _python_script(argv)
+        server = _acquire_server()
+        try:
+            result = server.run(config, timeout)
+        except BaseException:
+            server.close()
+            raise
+        _release_server(server)
+        return RunResult(**result)
+
+    try:
+        completed = subprocess.run(
+            [sys.executable, '-S', '-I', LAUNCHER, json.dumps(config)],
+            cwd=config['cwd'], stdin=subprocess.DEVNULL, capture_output=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise SandboxError('Launcher did not finish in time')
+    if completed.returncode != 0:
+        raise SandboxError(completed.stderr.decode('utf-8', errors='replace')[-1000:])
+    return RunResult(**json.loads(completed.stdout))
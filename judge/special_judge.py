@@ -0,0 +1,204 @@
+# _*_ coding:utf-8 _*_
+"""
+特殊评测程序（special judge）
+
+答案不唯一的题目由题目自带的评测程序判定，调用方式与 testlib 一致：
+
+    checker <输入文件> <程序输出> <标准答案>
+
+退出码 0 表示通过，1（WA）或 2（PE）表示答案错误，其他退出码、被信号杀死或超时属于评测系统错误；
+评测程序输出的第一行作为评测信息。
+
+评测程序在每个评测节点上只编译一次：以 hash(代码, 语言, 编译器版本, 编译命令) 为键，
+编译产物保存在 JUDGE_CHECKER_DIR/<键> 中，先在临时目录编译再原子重命名，多个评测进程共用。
+每个测试用例在受限子进程中运行一次评测程序，使用独立的时间和内存限制（调用方式决定了一个测试用例一次调用）；
+Python 评测程序通过常驻启动器在预热的解释器中运行，省去解释器启动，编译型评测程序每个测试用例启动一个进程。
+
+评测程序是出题人的代码，以 JUDGE_SANDBOX_CHECKER_UID 而不是评测进程（root）的身份运行（见 judge.isolation）。
+每次评测为它准备一个只有该 uid 能访问的目录（CheckerSession），放入评测程序的副本；每个测试用例把输入、
+程序输出和标准答案放进这个目录后再运行，评测程序无法访问测试数据目录、提交的工作目录和项目文件。
+程序输出由被评测程序控制，评测进程以 O_NOFOLLOW 打开后复制，不会跟随它换成的符号链接。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from judge.checker import CheckResult
+from judge.compile_cache import compiler_version, normalize_source
+from judge.conf import judge_setting
+from judge.isolation import checker_user
+from judge.languages import get_language
+from judge.sandbox import open_output, private_directory, run_process
+
+# 评测程序信息最多保留的字符数
+MAX_MESSAGE_LENGTH = 1024
+
+# 表示答案错误的退出码
+WRONG_ANSWER_EXIT_CODES = (1, 2)
+
+_checkers = {}
+_lock = threading.Lock()
+
+
+class CheckerError(Exception):
+    """评测程序编译失败或运行异常，属于评测系统错误"""
+
+
+def _read_message(path):
+    """评测程序的输出，不跟随它换成的符号链接"""
+    try:
+        with open_output(path) as f:
+            return f.read(MAX_MESSAGE_LENGTH).decode('utf-8', errors='replace').strip()
+    except OSError:
+        return ''
+
+
+def _copy_output(source, target):
+    """复制程序输出；被换成符号链接或其他类型的文件时视为空输出"""
+    with open(target, 'wb') as out:
+        try:
+            f = open_output(source)
+        except OSError:
+            return
+        with f:
+            shutil.copyfileobj(f, out)
+
+
+def _link(source, target):
+    """测试数据文件（只读）硬链接到评测程序的目录，不在同一文件系统时复制"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class SpecialChecker(object):
+    """已在本节点编译好的评测程序"""
+
+    def __init__(self, runner, directory):
+        self.runner = runner
+        self.directory = directory
+
+    def open(self, work_root):
+        """为一次评测准备运行评测程序的目录，返回 CheckerSession，用完后调用 close"""
+        return CheckerSession(self, work_root)
+
+
+class CheckerSession(object):
+    """一次评测中运行评测程序的目录和身份，同一提交的各个测试用例共用"""
+
+    def __init__(self, checker, work_root):
+        self.runner = checker.runner
+        self.user = checker_user()
+        self.directory = tempfile.mkdtemp(prefix='checker_', dir=work_root)
+        try:
+            shutil.copytree(checker.directory, self.directory, dirs_exist_ok=True)
+            if self.user is not None:
+                self.user.prepare(self.directory)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def check(self, input_path, output_path, answer_path, name='case', cpu=None):
+        """运行评测程序判定一个测试用例，返回 CheckResult"""
+        paths = [os.path.join(self.directory, f'{name}.{suffix}') for suffix in ('in', 'out', 'ans', 'checker.txt')]
+        local_input, local_output, local_answer, message_path = paths
+        try:
+            for path in paths:
+                if os.path.lexists(path):
+                    os.unlink(path)
+            _link(input_path, local_input)
+            _copy_output(output_path, local_output)
+            _link(answer_path, local_answer)
+            time_limit = judge_setting('JUDGE_CHECKER_TIME_LIMIT_MS')
+            memory_limit = judge_setting('JUDGE_CHECKER_MEMORY_LIMIT_MB')
+            result = run_process(
+                self.runner.run_command(memory_limit) + [local_input, local_output, local_answer],
+                cwd=self.directory, stdout_path=message_path, stderr_path=message_path,
+                time_limit_ms=time_limit,
+                wall_limit_ms=time_limit * judge_setting('JUDGE_WALL_TIME_FACTOR') + judge_setting('JUDGE_WALL_TIME_EXTRA_MS'),
+                memory_limit_kb=memory_limit * 1024,
+                output_limit_bytes=judge_setting('JUDGE_OUTPUT_LIMIT_BYTES'),
+                limit_address_space=self.runner.limit_address_space,
+                cpu=cpu,
+                preforked=judge_setting('JUDGE_PREFORKED_LAUNCHER'),
+                user=self.user,
+            )
+            # 评测程序可以改动自己的目录，同样不跟随符号链接
+            message = _read_message(message_path)
+        finally:
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        if result.timed_out or result.cpu_exceeded:
+            raise CheckerError('Checker timed out')
+        if result.term_signal:
+            raise CheckerError(f'Checker was killed by signal {result.term_signal}: {message}')
+        if result.exit_code == 0:
+            return CheckResult(True, message.split('\n', 1)[0] or None)
+        if result.exit_code in WRONG_ANSWER_EXIT_CODES:
+            return CheckResult(False, message.split('\n', 1)[0] or 'Rejected by checker')
+        raise CheckerError(f'Checker exited with {result.exit_code}: {message}')
+
+
+def checker_key(problem):
+    """评测程序在本节点的缓存键"""
+    runner = get_language(problem.checker_language)
+    version = compiler_version(runner.version) if runner.version else ''
+    digest = hashlib.sha256()
+    for part in (normalize_source(problem.checker_code), runner.key, version, '\0'.join(runner.compile or [])):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _build(runner, directory, code):
+    """在临时目录中编译评测程序，成功后重命名为 directory"""
+    from judge.engine import compile_source
+
+    root = private_directory(os.path.dirname(directory))
+    staging = tempfile.mkdtemp(prefix='.tmp_', dir=root)
+    try:
+        with open(os.path.join(staging, runner.source), 'w', encoding='utf-8') as f:
+            f.write(code)
+        compiled, message = compile_source(runner.key, staging, code)
+        if not compiled:
+            raise CheckerError(f'Checker compilation failed\n{message}')
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # 其他评测进程已经编译好了同一个评测程序
+            if not os.path.isdir(directory):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def get_checker(problem):
+    """题目的评测程序，本节点没有编译过时先编译；编译失败抛出 CheckerError"""
+    if not problem.checker_code.strip():
+        raise CheckerError('Problem has no checker program')
+    try:
+        runner = get_language(problem.checker_language)
+    except KeyError:
+        raise CheckerError(f'Unsupported checker language: {problem.checker_language}')
+    key = checker_key(problem)
+    with _lock:
+        checker = _checkers.get(key)
+    if checker is not None and os.path.isdir(checker.directory):
+        return checker
+
+    directory = os.path.join(judge_setting('JUDGE_CHECKER_DIR'), key)
+    if not os.path.isdir(directory):
+        _build(runner, directory, problem.checker_code)
+    checker = SpecialChecker(runner, directory)
+    with _lock:
+        _checkers[key] = checker
+    return checker
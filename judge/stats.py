@@ -0,0 +1,233 @@
+# _*_ coding:utf-8 _*_
+"""
+评测统计
+
+根据 Submission.judge_time 统计各语言的评测吞吐量，根据评测队列和 Submission.queue_wait
+统计各优先级的队列长度和等待时间，根据提交记录的各阶段耗时统计延迟分布，根据心跳表统计各评测节点和评测进程的状态，供 judge_stats 命令和监控接口使用。
+"""
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from own_models.judge_models import JudgeNode, JudgeTask, JudgeWorkerHeartbeat
+from own_models.student_practice import Submission
+from judge.conf import judge_setting
+from judge.languages import registered_languages
+
+# 尚未评测完成的状态
+UNFINISHED_STATUSES = ('pending', 'judging')
+
+
+def language_throughput(minutes=60):
+    """
+    最近 minutes 分钟内各语言的评测情况
+
+    返回 [{'language', 'name', 'judged', 'per_minute', 'avg_judge_ms', 'max_judge_ms', 'per_core_second'}]，
+    per_core_second 为每占用一秒评测时间完成的提交数，反映该语言的评测开销。
+    """
+    since = timezone.now() - timedelta(minutes=minutes)
+    rows = Submission.objects.filter(updated_at__gte=since).exclude(status__in=UNFINISHED_STATUSES).values(
+        'language'
+    ).annotate(
+        judged=Count('id'), total_ms=Sum('judge_time'), avg_ms=Avg('judge_time'), max_ms=Max('judge_time'),
+    )
+    by_language = {row['language']: row for row in rows}
+    stats = []
+    for runner in registered_languages():
+        row = by_language.get(runner.key)
+        judged = row['judged'] if row else 0
+        total_ms = (row['total_ms'] or 0) if row else 0
+        stats.append({
+            'language': runner.key,
+            'name': runner.name,
+            'judged': judged,
+            'per_minute': judged / minutes,
+            'avg_judge_ms': int(row['avg_ms'] or 0) if row else 0,
+            'max_judge_ms': (row['max_ms'] or 0) if row else 0,
+            'per_core_second': judged * 1000 / total_ms if total_ms else 0,
+        })
+    return stats
+
+
+def _percentile(values, percent):
+    """已排序列表的百分位数（最近秩法）"""
+    if not values:
+        return 0
+    index = max(0, min(len(values) - 1, -(-len(values) * percent // 100) - 1))
+    return values[index]
+
+
+# 评测各阶段：(键, 名称)
+STAGES = (
+    ('queue', '排队'),
+    ('core_wait', '等待核'),
+    ('compile', '编译'),
+    ('run', '运行'),
+    ('check', '比对'),
+    ('persist', '写回'),
+    ('latency', '出结果'),
+)
+
+
+def stage_stats(submissions):
+    """
+    一组已评测提交的各阶段耗时
+
+    submissions 为 Submission 查询集，只统计经过评测队列的提交。返回与 STAGES 对应的
+    [{'stage', 'name', 'count', 'avg_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}]：
+    等待核为评测进程开始评测前等待被借用的核的时间；运行和比对为各测试用例之和；
+    写回为评测结束到结果写入数据库的时间，包括等待批量写回；
+    出结果为从提交到结果写入的总耗时。
+    """
+    samples = {stage: [] for stage, name in STAGES}
+    for created_at, updated_at, queue_wait, core_wait, judge_time, compile_time, run_time, check_time in \
+            submissions.filter(judge_priority__isnull=False).exclude(status__in=UNFINISHED_STATUSES).values_list(
+                'created_at', 'updated_at', 'queue_wait', 'core_wait', 'judge_time', 'compile_time', 'run_time',
+                'check_time'
+            ):
+        latency = max(0, int((updated_at - created_at).total_seconds() * 1000))
+        samples['queue'].append(queue_wait)
+        samples['core_wait'].append(core_wait)
+        samples['compile'].append(compile_time)
+        samples['run'].append(run_time)
+        samples['check'].append(check_time)
+        samples['persist'].append(max(0, latency - queue_wait - core_wait - judge_time))
+        samples['latency'].append(latency)
+    stats = []
+    for stage, name in STAGES:
+        values = sorted(samples[stage])
+        stats.append({
+            'stage': stage,
+            'name': name,
+            'count': len(values),
+            'avg_ms': int(sum(values) / len(values)) if values else 0,
+            'p50_ms': _percentile(values, 50),
+            'p95_ms': _percentile(values, 95),
+            'p99_ms': _percentile(values, 99),
+            'max_ms': values[-1] if values else 0,
+        })
+    return stats
+
+
+def queue_stats(minutes=60):
+    """
+    各优先级的队列情况
+
+    返回 [{'priority', 'name', 'queued', 'running', 'retried', 'oldest_wait_s', 'oldest_running_s',
+           'judged', 'wait_p50_ms', 'wait_p95_ms', 'latency_p95_ms'}]，
+    前几项为当前队列状态（retried 为被回收后重新入队过的任务数，oldest_* 为最久排队和最久评测中的任务已等待的秒数），
+    后几项为最近 minutes 分钟内完成评测的提交的排队时间和从排队到出结果的总耗时。
+    """
+    now = timezone.now()
+    current = {
+        (row['priority'], row['status']): row
+        for row in JudgeTask.objects.values('priority', 'status').annotate(
+            count=Count('id'), retried=Count('id', filter=Q(attempts__gt=0, status='queued') | Q(attempts__gt=1)),
+            oldest=Min('created_at'), oldest_claim=Min('claimed_at'),
+        )
+    }
+    since = now - timedelta(minutes=minutes)
+    judged = {}
+    for priority, wait, judge_time in Submission.objects.filter(
+        updated_at__gte=since, judge_priority__isnull=False
+    ).exclude(status__in=UNFINISHED_STATUSES).values_list('judge_priority', 'queue_wait', 'judge_time'):
+        judged.setdefault(priority, []).append((wait, wait + judge_time))
+
+    stats = []
+    for priority, name in JudgeTask.PRIORITY_CHOICES:
+        queued = current.get((priority, 'queued'))
+        running = current.get((priority, 'running'))
+        samples = judged.get(priority, [])
+        waits = sorted(wait for wait, latency in samples)
+        latencies = sorted(latency for wait, latency in samples)
+        stats.append({
+            'priority': priority,
+            'name': name,
+            'queued': queued['count'] if queued else 0,
+            'running': running['count'] if running else 0,
+            'retried': sum(row['retried'] for row in (queued, running) if row),
+            'oldest_wait_s': int((now - queued['oldest']).total_seconds()) if queued else 0,
+            'oldest_running_s': int((now - running['oldest_claim']).total_seconds()) if running else 0,
+            'judged': len(samples),
+            'wait_p50_ms': _percentile(waits, 50),
+            'wait_p95_ms': _percentile(waits, 95),
+            'latency_p95_ms': _percentile(latencies, 95),
+        })
+    return stats
+
+
+def worker_stats():
+    """
+    各评测进程的状态
+
+    返回 [{'name', 'node', 'hostname', 'status', 'cpu', 'tasks_done', 'running', 'heartbeat_age_s', 'alive',
+           'expected_cache_hits', 'expected_cache_misses', 'expected_cache_hit_rate'}]，
+    alive 表示心跳在 JUDGE_HEARTBEAT_TIMEOUT 秒以内；已停止的进程只保留最近一天的记录。
+    """
+    now = timezone.now()
+    timeout = judge_setting('JUDGE_HEARTBEAT_TIMEOUT')
+    running = dict(JudgeTask.objects.filter(status='running').values('worker').annotate(
+        count=Count('id')
+    ).values_list('worker', 'count'))
+    workers = JudgeWorkerHeartbeat.objects.exclude(
+        status='stopped', last_heartbeat__lt=now - timedelta(days=1)
+    ).order_by('hostname', 'name')
+    stats = []
+    for worker in workers:
+        age = int((now - worker.last_heartbeat).total_seconds())
+        lookups = worker.expected_cache_hits + worker.expected_cache_misses
+        stats.append({
+            'name': worker.name,
+            'node': worker.node,
+            'hostname': worker.hostname,
+            'status': worker.status,
+            'cpu': worker.cpu,
+            'tasks_done': worker.tasks_done,
+            'running': running.get(worker.name, 0),
+            'heartbeat_age_s': age,
+            'alive': worker.status != 'stopped' and age <= timeout,
+            'expected_cache_hits': worker.expected_cache_hits,
+            'expected_cache_misses': worker.expected_cache_misses,
+            'expected_cache_hit_rate': worker.expected_cache_hits / lookups if lookups else 0,
+        })
+    return stats
+
+
+def node_stats():
+    """
+    各评测节点的状态
+
+    返回 [{'name', 'hostname', 'status', 'cpu_count', 'processes', 'workers', 'running', 'claim_batches',
+           'tasks_claimed', 'batch_size', 'heartbeat_age_s', 'alive'}]，
+    workers 为心跳未过期的评测进程数，batch_size 为平均每次认领的任务数；已停止的节点只保留最近一天的记录。
+    """
+    now = timezone.now()
+    timeout = judge_setting('JUDGE_HEARTBEAT_TIMEOUT')
+    workers = {}
+    running = {}
+    for worker in worker_stats():
+        if worker['alive']:
+            workers[worker['node']] = workers.get(worker['node'], 0) + 1
+        running[worker['node']] = running.get(worker['node'], 0) + worker['running']
+    nodes = JudgeNode.objects.exclude(
+        status='stopped', last_heartbeat__lt=now - timedelta(days=1)
+    ).order_by('name')
+    stats = []
+    for node in nodes:
+        age = int((now - node.last_heartbeat).total_seconds())
+        stats.append({
+            'name': node.name,
+            'hostname': node.hostname,
+            'status': node.status,
+            'cpu_count': node.cpu_count,
+            'processes': node.processes,
+            'workers': workers.get(node.name, 0),
+            'running': running.get(node.name, 0),
+            'claim_batches': node.claim_batches,
+            'tasks_claimed': node.tasks_claimed,
+            'batch_size': node.tasks_claimed / node.claim_batches if node.claim_batches else 0,
+            'heartbeat_age_s': age,
+            'alive': node.status != 'stopped' and age <= timeout,
+        })
+    return stats
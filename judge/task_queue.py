@@ -0,0 +1,260 @@
+# _*_ coding:utf-8 _*_
+"""
+基于数据库的评测队列
+
+队列就是 own_models_judge_task 表，只依赖现有的 MySQL/SQLite 数据库。
+Web 进程只负责入队，评测节点用 SELECT ... FOR UPDATE SKIP LOCKED 原子地批量认领任务；
+数据库不支持 SKIP LOCKED 时（如 SQLite）退化为带条件的 UPDATE 抢占。
+JudgeTask.attempts 是开始评测的次数：进程池认领后还没交给评测进程的任务被放回队列时不计入，
+评测进程收到任务时（start_tasks）才加一。
+
+队列中除了提交还有试运行（JudgeTask.trial_run，见 judge.trial_run），它们不对应 Submission。
+
+调度：优先级高的任务总是先被认领（试运行 > 比赛 > 练习 > 重新评测）；同一优先级内按用户公平排队，
+入队时为任务分配虚拟时间 = max(队首虚拟时间, 该用户排队中任务的最大虚拟时间) + 1，
+按虚拟时间认领相当于每轮为每个用户各评测一个任务的轮转（quantum 为 1 的 deficit round robin），
+连续大量提交的用户只会推迟自己的任务，不会让其他用户等待。
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from own_models.judge_models import JudgeTask, JudgeWorkerHeartbeat
+from own_models.organize_competitions_models import PaperAssignment
+from own_models.student_practice import Submission
+from judge.conf import judge_setting
+
+logger = logging.getLogger(__name__)
+
+
+def is_contest_submission(submission):
+    """
+    提交时提交者有包含该题目、尚未完成的试卷
+
+    按提交时间而不是试卷当前的状态判断：试卷完成后重新评测，答卷时的提交仍按比赛提交评测（运行全部测试用例）。
+    """
+    return PaperAssignment.objects.filter(
+        user_id=submission.user_id, paper__problems=submission.problem_id,
+    ).filter(Q(is_completed=False) | Q(completed_at__gte=submission.created_at)).exists()
+
+
+def _virtual_time(user_id, priority):
+    queued = JudgeTask.objects.filter(status='queued', priority=priority)
+    head = queued.aggregate(head=Min('virtual_time'))['head'] or 0
+    # 试运行任务单独使用一个优先级
+    owner = 'trial_run__user_id' if priority == JudgeTask.PRIORITY_TRIAL else 'submission__user_id'
+    last = queued.filter(**{owner: user_id}).aggregate(last=Max('virtual_time'))['last'] or 0
+    return max(head, last) + 1
+
+
+def enqueue_submission(submission, priority=None):
+    """
+    为提交记录创建评测任务，需要在创建提交的同一事务中调用
+
+    priority 为 JudgeTask.PRIORITY_*，默认根据提交判断是比赛还是练习
+    """
+    if priority is None:
+        priority = JudgeTask.PRIORITY_CONTEST if is_contest_submission(submission) else JudgeTask.PRIORITY_PRACTICE
+    task, created = JudgeTask.objects.get_or_create(submission=submission, defaults={
+        'priority': priority,
+        'virtual_time': _virtual_time(submission.user_id, priority),
+    })
+    return task
+
+
+def enqueue_trial_run(trial_run):
+    """为试运行创建最高优先级的评测任务，需要在创建试运行的同一事务中调用"""
+    return JudgeTask.objects.create(
+        trial_run=trial_run, priority=JudgeTask.PRIORITY_TRIAL,
+        virtual_time=_virtual_time(trial_run.user_id, JudgeTask.PRIORITY_TRIAL),
+    )
+
+
+def _candidates(limit):
+    queryset = JudgeTask.objects.filter(status='queued').order_by('priority', 'virtual_time', 'id')
+    if connection.features.has_select_for_update_skip_locked:
+        queryset = queryset.select_for_update(skip_locked=True)
+    return list(queryset.values_list('id', 'submission_id')[:limit])
+
+
+def claim_tasks(worker_name, limit=1):
+    """认领最多 limit 个排队中的任务并立即开始评测，返回认领到的 JudgeTask 列表"""
+    return claim_batch([worker_name] * limit, start=True)
+
+
+def claim_batch(slots, start=False):
+    """
+    一次认领最多 len(slots) 个排队中的任务，第 i 个任务记在评测进程 slots[i] 名下
+
+    评测进程池用它为整个节点批量认领任务，数据库往返次数与节点数而不是评测进程数有关。
+    认领的同时把对应提交的状态改为 judging。start 为 True 时（认领者自己马上评测）同时计入评测次数，
+    否则由评测进程收到任务时调用 start_tasks 计入。返回认领到的 JudgeTask 列表。
+    """
+    if not slots:
+        return []
+    now = timezone.now()
+    attempts = F('attempts') + 1 if start else F('attempts')
+    with transaction.atomic():
+        candidates = _candidates(len(slots))
+        if not candidates:
+            return []
+        assigned = {}
+        for (task_id, submission_id), worker_name in zip(candidates, slots):
+            assigned.setdefault(worker_name, []).append(task_id)
+        claimed = []
+        if connection.features.has_select_for_update_skip_locked:
+            # 行已经被当前事务锁住，其他节点会跳过它们
+            for worker_name, task_ids in assigned.items():
+                JudgeTask.objects.filter(id__in=task_ids).update(
+                    status='running', worker=worker_name, claimed_at=now, attempts=attempts
+                )
+                claimed.extend(task_ids)
+        else:
+            # 没有行锁时逐个做条件更新，只保留抢占成功的任务
+            for worker_name, task_ids in assigned.items():
+                for task_id in task_ids:
+                    updated = JudgeTask.objects.filter(id=task_id, status='queued').update(
+                        status='running', worker=worker_name, claimed_at=now, attempts=attempts
+                    )
+                    if updated:
+                        claimed.append(task_id)
+        submission_ids = [submission_id for task_id, submission_id in candidates
+                          if task_id in claimed and submission_id is not None]
+        Submission.objects.filter(id__in=submission_ids).update(status='judging', updated_at=now)
+    return list(JudgeTask.objects.filter(id__in=claimed).order_by('id'))
+
+
+def start_tasks(worker_name, task_ids):
+    """
+    评测进程开始评测进程池分配给它的任务：评测次数加一，返回仍记在它名下的 JudgeTask 列表
+
+    进程池分配后被回收的任务已经交给了别人，不在返回之列。
+    """
+    tasks = JudgeTask.objects.filter(id__in=task_ids, status='running', worker=worker_name)
+    tasks.update(attempts=F('attempts') + 1)
+    return list(tasks.order_by('id'))
+
+
+def queue_length():
+    """排队中的任务数"""
+    return JudgeTask.objects.filter(status='queued').count()
+
+
+def _still_claimed(tasks):
+    """认领后没有被其他进程回收或重新认领的任务"""
+    condition = Q()
+    for task in tasks:
+        condition |= Q(id=task.id, status='running', worker=task.worker, claimed_at=task.claimed_at)
+    return JudgeTask.objects.select_for_update().filter(condition)
+
+
+def release_tasks(tasks):
+    """
+    把认领后未完成的任务放回队列，返回 (重新入队数, 放弃数)
+
+    评测次数已达 JUDGE_MAX_ATTEMPTS 的任务不再重试，提交判为系统错误并按正常评测结果写回，
+    避免同一个提交反复让评测进程崩溃或超时而无限占用评测资源。认领后还没开始评测的任务不计次数，总是重新入队。
+    """
+    from judge.engine import JudgeResult, save_results
+    from judge.trial_run import fail_trial_runs
+
+    max_attempts = judge_setting('JUDGE_MAX_ATTEMPTS')
+    retry = [task for task in tasks if task.attempts < max_attempts]
+    exhausted = [task for task in tasks if task.attempts >= max_attempts and task.submission_id is not None]
+    exhausted_trials = [task for task in tasks if task.attempts >= max_attempts and task.trial_run_id is not None]
+    requeued = failed = 0
+    if retry:
+        with transaction.atomic():
+            claimed = list(_still_claimed(retry).values_list('id', 'submission_id'))
+            requeued = JudgeTask.objects.filter(id__in=[task_id for task_id, submission_id in claimed]).update(
+                status='queued', worker='', claimed_at=None
+            )
+            Submission.objects.filter(id__in=[submission_id for task_id, submission_id in claimed
+                                              if submission_id is not None]).update(
+                status='pending', updated_at=timezone.now()
+            )
+    if exhausted:
+        submissions = Submission.objects.in_bulk([task.submission_id for task in exhausted])
+        failed = len(save_results([
+            JudgeResult(submissions[task.submission_id], 'system_error', task=task,
+                        error_message=f'Judging failed {task.attempts} times, giving up')
+            for task in exhausted if task.submission_id in submissions
+        ]))
+        if failed:
+            logger.error(f"Gave up on {failed} submission(s) after {max_attempts} judge attempts")
+    if exhausted_trials:
+        failed += fail_trial_runs(exhausted_trials, f'Running failed {max_attempts} times, giving up')
+    return requeued, failed
+
+
+def requeue_worker_tasks(worker_names):
+    """把指定评测进程认领但未完成的任务放回队列，返回 (重新入队数, 放弃数)"""
+    return release_tasks(list(JudgeTask.objects.filter(status='running', worker__in=list(worker_names))))
+
+
+def requeue_stale_tasks(heartbeat_timeout, task_timeout=None):
+    """
+    回收卡住的任务：心跳超过 heartbeat_timeout 秒未更新的评测进程所认领的任务，
+    以及认领超过 task_timeout 秒仍未完成的任务（评测进程还活着，但这个任务出了问题）
+
+    返回 (重新入队数, 放弃数)
+    """
+    now = timezone.now()
+    deadline = now - timedelta(seconds=heartbeat_timeout)
+    stale_workers = set(JudgeWorkerHeartbeat.objects.filter(
+        last_heartbeat__lt=deadline
+    ).exclude(status='stopped').values_list('name', flat=True))
+    # 认领后从未写过心跳的进程（例如刚启动就崩溃）
+    alive_workers = set(JudgeWorkerHeartbeat.objects.filter(
+        last_heartbeat__gte=deadline
+    ).values_list('name', flat=True))
+    orphaned_workers = set(JudgeTask.objects.filter(
+        status='running', claimed_at__lt=deadline
+    ).exclude(worker__in=alive_workers).values_list('worker', flat=True))
+    stale_workers |= orphaned_workers
+    if stale_workers:
+        JudgeWorkerHeartbeat.objects.filter(name__in=stale_workers).update(status='stopped')
+
+    stuck = JudgeTask.objects.filter(status='running', worker__in=stale_workers)
+    if task_timeout:
+        stuck = stuck | JudgeTask.objects.filter(status='running', claimed_at__lt=now - timedelta(seconds=task_timeout))
+    tasks = list(stuck)
+    if not tasks:
+        return 0, 0
+    return release_tasks(tasks)
+
+
+def enqueue_orphan_submissions(grace_seconds=0):
+    """
+    为处于 pending/judging 但没有评测任务的提交补建任务，返回补建数量
+
+    只处理 grace_seconds 秒内没有更新过的提交
+    """
+    orphans = Submission.objects.filter(
+        status__in=['pending', 'judging'], judge_task__isnull=True,
+        updated_at__lt=timezone.now() - timedelta(seconds=grace_seconds),
+    ).values_list('id', flat=True)
+    count = 0
+    for submission in Submission.objects.filter(id__in=list(orphans)):
+        with transaction.atomic():
+            if JudgeTask.objects.filter(submission=submission).exists():
+                continue
+            enqueue_submission(submission)
+            Submission.objects.filter(id=submission.id).update(status='pending')
+            count += 1
+    return count
+
+
+def reap_stuck_submissions():
+    """
+    回收卡住的提交：重新入队失联或超时的任务、为没有任务的提交补建任务
+
+    评测进程池定期调用，也可以用 reap_judge_tasks 命令手动执行。返回 {'requeued', 'failed', 'orphans'}
+    """
+    requeued, failed = requeue_stale_tasks(judge_setting('JUDGE_HEARTBEAT_TIMEOUT'), judge_setting('JUDGE_TASK_TIMEOUT'))
+    # 留出心跳超时的时间，不去碰刚刚由其他进程改为 pending 的提交
+    orphans = enqueue_orphan_submissions(grace_seconds=judge_setting('JUDGE_HEARTBEAT_TIMEOUT'))
+    return {'requeued': requeued, 'failed': failed, 'orphans': orphans}
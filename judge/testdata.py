@@ -0,0 +1,115 @@
+# _*_ coding:utf-8 _*_
+"""
+评测节点本地的测试数据存储
+
+测试数据按 SHA-256 保存为本地文件（<目录>/ab/abcdef...），只在本地缺失时从数据库读取一次。
+每个进程还缓存 题目 -> 测试用例清单，清单按 Problem.test_data_version 失效，
+同一题目的重复评测除了读取提交本身以外不再访问数据库。
+被评测程序的标准输入直接指向本地文件，内容不经过 Python 进程。
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from judge.sandbox import private_directory
+from own_models.student_practice import TestCase, TestData
+
+logger = logging.getLogger(__name__)
+
+
+class TestCaseFiles(object):
+    """评测用的单个测试用例：TestCase 主键、本地文件路径、子任务和分值"""
+
+    def __init__(self, test_case_id, input_path, output_path, input_hash='', output_hash='', subtask=0, score=0):
+        self.test_case_id = test_case_id
+        self.input_path = input_path
+        self.output_path = output_path
+        self.input_hash = input_hash
+        self.output_hash = output_hash
+        self.subtask = subtask
+        self.score = score
+
+
+class TestDataStore(object):
+    """本地内容寻址存储 + 测试用例清单缓存"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def path(self, sha256):
+        return os.path.join(self.directory, TestData.relative_path(sha256))
+
+    def _write(self, sha256, content):
+        """原子写入一个文件，写入前校验哈希"""
+        if hashlib.sha256(content).hexdigest() != sha256:
+            raise ValueError(f"Test data {sha256} is corrupted")
+        path = self.path(sha256)
+        # 标准答案不能被评测程序读取，输入文件由启动器打开后作为标准输入传给程序
+        private_directory(self.directory)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix='.tmp_', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.chmod(staging, 0o444)
+            os.replace(staging, path)
+        except BaseException:
+            if os.path.exists(staging):
+                os.unlink(staging)
+            raise
+
+    def ensure(self, hashes):
+        """确保这些哈希对应的文件在本地存在，缺失的一次性从数据库读取"""
+        missing = [sha256 for sha256 in set(hashes) if not os.path.exists(self.path(sha256))]
+        if not missing:
+            return 0
+        for sha256, content in TestData.objects.filter(sha256__in=missing).values_list('sha256', 'content'):
+            self._write(sha256, bytes(content))
+        not_found = [sha256 for sha256 in missing if not os.path.exists(self.path(sha256))]
+        if not_found:
+            raise LookupError(f"Test data not found: {', '.join(not_found)}")
+        return len(missing)
+
+    def test_cases(self, problem):
+        """
+        题目的测试用例列表 [TestCaseFiles]
+
+        清单按 (题目, 测试数据版本) 缓存在进程内，版本未变时不查询数据库。
+        """
+        key = problem.id
+        with self._lock:
+            cached = self._manifests.get(key)
+        if cached is not None and cached[0] == problem.test_data_version:
+            cases = cached[1]
+            # 本地文件可能被清理过
+            if all(os.path.exists(case.input_path) and os.path.exists(case.output_path) for case in cases):
+                return cases
+
+        rows = list(TestCase.objects.filter(problem_id=problem.id).order_by('id').values_list(
+            'id', 'input_hash', 'output_hash', 'subtask', 'score'
+        ))
+        self.ensure([h for row in rows for h in row[1:3]])
+        cases = [
+            TestCaseFiles(case_id, self.path(input_hash), self.path(output_hash), input_hash, output_hash,
+                          subtask, score)
+            for case_id, input_hash, output_hash, subtask, score in rows
+        ]
+        with self._lock:
+            self._manifests[key] = (problem.test_data_version, cases)
+        return cases
+
+
+_default_store = None
+
+
+def get_test_data_store():
+    global _default_store
+    from judge.conf import judge_setting
+
+    if _default_store is None:
+        _default_store = TestDataStore(judge_setting('JUDGE_TESTDATA_DIR'))
+    return _default_store
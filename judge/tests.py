@@ -0,0 +1,965 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from judge import benchmark, checker, engine, events, isolation, languages, objective, task_queue
+from judge.checker import check_output
+from judge.compile_cache import CompileCache
+from judge.engine import (JudgeResult, _case_groups, _run_cases, _score, clip_message, compile_source,
+                          evaluate_submission, run_test, save_results)
+from judge.cores import acquire_core
+from judge.pool import WorkerPool
+from judge.rejudge import advance_rejudge_jobs, create_rejudge_job, finalize_step
+from judge.sandbox import run_process
+from judge.special_judge import CheckerError, get_checker
+from judge.trial_run import finish_trial_runs
+from judge.verdict_cache import verdict_key
+from judge.worker import JudgeWorker
+from own_models.custom_user_models import CustomUser
+from own_models.judge_models import JudgeTask, JudgeWorkerHeartbeat, RejudgeJob, TrialRun
+from own_models.organize_competitions_models import Competition, Paper, PaperAssignment
+from own_models.problem_models import Problem
+from own_models.ranking_system_models import RankingSystem
+from own_models.student_practice import StudentStatistics, Submission, TestCaseResult
+
+
+class SandboxTestCase(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def write_source(self, name, code):
+        with open(os.path.join(self.work_dir, name), 'w') as f:
+            f.write(code)
+
+    def test_run_process_collects_output(self):
+        output_path = os.path.join(self.work_dir, 'out.txt')
+        result = run_process(['echo', 'hello'], cwd=self.work_dir, stdout_path=output_path)
+        self.assertTrue(result.ok)
+        with open(output_path) as f:
+            self.assertEqual(f.read(), 'hello\n')
+
+    def test_output_paths_do_not_follow_symlinks(self):
+        target = os.path.join(self.work_dir, 'target.txt')
+        with open(target, 'w') as f:
+            f.write('keep\n')
+        output_path = os.path.join(self.work_dir, 'out.txt')
+        os.symlink(target, output_path)
+        result = run_process(['echo', 'hello'], cwd=self.work_dir, stdout_path=output_path)
+        self.assertFalse(result.ok)
+        with open(target) as f:
+            self.assertEqual(f.read(), 'keep\n')
+        self.assertFalse(check_output(output_path, target).accepted)
+
+    def test_wall_time_limit_kills_process(self):
+        result = run_process(['sleep', '5'], cwd=self.work_dir, time_limit_ms=100, wall_limit_ms=300)
+        self.assertTrue(result.timed_out)
+        self.assertFalse(result.ok)
+
+    def test_cpu_and_wall_time(self):
+        self.write_source('main.py', 'import time\ntime.sleep(0.3)\nend = time.process_time() + 0.2\n'
+                                     'while time.process_time() < end:\n    pass\n')
+        for preforked in (False, True):
+            result = run_process([sys.executable, '-S', 'main.py'], cwd=self.work_dir, time_limit_ms=2000,
+                                 preforked=preforked)
+            self.assertTrue(result.ok)
+            self.assertGreaterEqual(result.time_ms, 200)
+            self.assertLess(result.time_ms, 450)
+            self.assertGreaterEqual(result.wall_time_ms, 500)
+
+    def test_output_limit(self):
+        self.write_source('main.py', 'while True:\n    print("x" * 1000)\n')
+        result = run_process(['python3', 'main.py'], cwd=self.work_dir,
+                             stdout_path=os.path.join(self.work_dir, 'out.txt'),
+                             time_limit_ms=2000, output_limit_bytes=64 * 1024)
+        self.assertTrue(result.output_exceeded)
+
+    def test_preforked_python_runner(self):
+        self.write_source('main.py', 'import sys\nprint(input(), sys.argv[1:])\nsys.exit(3)\n')
+        self.write_source('case.in', 'hello\n')
+        output_path = os.path.join(self.work_dir, 'out.txt')
+        result = run_process([sys.executable, '-S', 'main.py', 'x'], cwd=self.work_dir,
+                             stdin_path=os.path.join(self.work_dir, 'case.in'), stdout_path=output_path,
+                             preforked=True)
+        self.assertEqual(result.exit_code, 3)
+        with open(output_path) as f:
+            self.assertEqual(f.read(), "hello ['x']\n")
+
+    def run_python(self, input_data, expected_output, time_limit=1000, memory_limit=256):
+        self.write_source('case.in', input_data)
+        self.write_source('case.out', expected_output)
+        return run_test('python', self.work_dir, os.path.join(self.work_dir, 'case.in'),
+                        os.path.join(self.work_dir, 'case.out'), time_limit, memory_limit)[0]
+
+    def test_python_verdicts(self):
+        self.write_source('main.py', 'a, b = map(int, input().split())\nprint(a + b)\n')
+        self.assertEqual(self.run_python('1 2\n', '3\n'), 'accepted')
+        self.assertEqual(self.run_python('1 2\n', '4\n'), 'wrong_answer')
+
+        self.write_source('main.py', 'while True:\n    pass\n')
+        self.assertEqual(self.run_python('', '', time_limit=500), 'time_limit_exceeded')
+
+        self.write_source('main.py', 'raise ValueError()\n')
+        self.assertEqual(self.run_python('', ''), 'runtime_error')
+
+        self.write_source('main.py', 'x = bytearray(512 * 1024 * 1024)\n')
+        self.assertEqual(self.run_python('', '', memory_limit=64), 'memory_limit_exceeded')
+
+    @override_settings(JUDGE_OUTPUT_LIMIT_BYTES=64 * 1024, JUDGE_CASE_MESSAGE_LIMIT_BYTES=200)
+    def test_output_limit_and_message_caps(self):
+        self.write_source('main.py', 'import sys\nwhile True:\n    sys.stderr.write("e" * 1000)\n')
+        self.assertEqual(self.run_python('', ''), 'output_limit_exceeded')
+
+        self.write_source('main.py', 'print("x" * 10000)\nraise ValueError("the last line")\n')
+        self.write_source('case.in', '')
+        status, time_ms, memory_kb, message = run_test(
+            'python', self.work_dir, os.path.join(self.work_dir, 'case.in'), os.path.join(self.work_dir, 'case.in'),
+            1000, 256)
+        self.assertEqual(status, 'runtime_error')
+        self.assertLessEqual(len(message.encode('utf-8')), 200)
+        self.assertTrue(message.endswith('ValueError: the last line'))
+        self.assertEqual(clip_message('答案' * 100, 20), '答案答案答...')
+
+    def test_benchmark_programs(self):
+        for kind, name in benchmark.KINDS:
+            code, expected = benchmark.PROGRAMS['python'][kind]
+            self.write_source('main.py', code)
+            self.write_source('case.in', '3\n1 2 3\n')
+            self.write_source('case.out', '6\n')
+            timings = []
+            status = run_test('python', self.work_dir, os.path.join(self.work_dir, 'case.in'),
+                              os.path.join(self.work_dir, 'case.out'), 500, 64, timings=timings)[0]
+            self.assertEqual(status, expected, kind)
+            self.assertEqual(len(timings), 1)
+        for language, programs in benchmark.PROGRAMS.items():
+            self.assertEqual(set(programs), {kind for kind, name in benchmark.KINDS}, language)
+
+    def test_background_processes_are_killed(self):
+        # 程序退出时留在进程组中的后台进程
+        self.write_source('main.py', 'import os, time\nif os.fork() == 0:\n    time.sleep(1)\n'
+                                     '    open("escaped", "w").close()\n')
+        result = run_process([sys.executable, '-S', 'main.py'], cwd=self.work_dir, time_limit_ms=2000)
+        self.assertTrue(result.ok)
+        time.sleep(1.5)
+        self.assertFalse(os.path.exists(os.path.join(self.work_dir, 'escaped')))
+
+    def test_sandbox_user(self):
+        if os.geteuid() != 0:
+            self.skipTest('switching users requires root')
+        lock_dir = os.path.join(self.work_dir, 'locks')
+        work_dir = tempfile.mkdtemp(dir=self.work_dir)
+        os.chmod(self.work_dir, 0o711)
+        settings_path = os.path.abspath(__file__)
+        python = sys.executable if isolation.readable_by_others(sys.executable) else '/usr/bin/python3'
+        if not isolation.readable_by_others(python):
+            self.skipTest('no Python interpreter can be run by other users')
+        code = ('import os, sys, time\n'
+                'print(os.getuid(), os.getgid())\n'
+                'try:\n    open(sys.argv[1]).read()\n    print("readable")\nexcept PermissionError:\n    print("denied")\n'
+                'children = []\n'
+                'try:\n    for i in range(20):\n        pid = os.fork()\n        if pid == 0:\n'
+                '            time.sleep(5)\n            os._exit(0)\n        children.append(pid)\n'
+                'except BlockingIOError:\n    pass\n'
+                'print(len(children))\n'
+                'for pid in children:\n    os.kill(pid, 9)\n    os.waitpid(pid, 0)\n'
+                'if os.fork() == 0:\n    os.setsid()\n    open("daemon.pid", "w").write(str(os.getpid()))\n'
+                '    time.sleep(30)\n'
+                'time.sleep(0.2)\n')
+        with open(os.path.join(work_dir, 'main.py'), 'w') as f:
+            f.write(code)
+        with override_settings(JUDGE_SANDBOX_LOCK_DIR=lock_dir, JUDGE_SANDBOX_NPROC=8):
+            user = isolation.acquire_sandbox_user()
+            try:
+                user.prepare(work_dir)
+                output_path = os.path.join(work_dir, 'out.txt')
+                result = run_process([python, '-S', 'main.py', settings_path], cwd=work_dir,
+                                     stdout_path=output_path, time_limit_ms=2000, user=user)
+                self.assertTrue(result.ok)
+                with open(output_path) as f:
+                    lines = f.read().split()
+                self.assertEqual(lines[:3], [str(user.uid), str(user.gid),
+                                             'readable' if isolation.readable_by_others(settings_path) else 'denied'])
+                # 进程数上限包括程序自己
+                self.assertLess(int(lines[3]), 8)
+                with open(os.path.join(work_dir, 'daemon.pid')) as f:
+                    daemon = int(f.read())
+                self.assertTrue(self.alive(daemon))
+            finally:
+                user.release()
+            self.assertFalse(self.alive(daemon))
+
+    @staticmethod
+    def alive(pid):
+        """进程存在且不是僵尸进程"""
+        for _ in range(50):
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    state = f.read().rsplit(')', 1)[1].split()[0]
+            except FileNotFoundError:
+                return False
+            if state != 'Z':
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_c_memory_limit(self):
+        if not shutil.which('gcc'):
+            self.skipTest('gcc is not installed')
+        # 逐块分配并写入，峰值内存超过限制时判为超内存而不是分配失败后的运行错误
+        source = ('#include <stdlib.h>\n#include <string.h>\nint main(void) {\n'
+                  '    for (;;) { char *p = malloc(1 << 20); memset(p, 1, 1 << 20); }\n}\n')
+        self.write_source('main.c', source)
+        self.assertEqual(compile_source('c', self.work_dir, source), (True, ''))
+        self.write_source('case.in', '')
+        status, time_ms, memory_kb, message = run_test(
+            'c', self.work_dir, os.path.join(self.work_dir, 'case.in'), os.path.join(self.work_dir, 'case.in'),
+            1000, 32)
+        self.assertEqual(status, 'memory_limit_exceeded')
+        self.assertGreaterEqual(memory_kb, 32 * 1024)
+
+    def test_compile_error(self):
+        if not shutil.which('gcc'):
+            self.skipTest('gcc is not installed')
+        source = 'int main() { return }\n'
+        self.write_source('main.c', source)
+        compiled, message = compile_source('c', self.work_dir, source)
+        self.assertFalse(compiled)
+        self.assertIn('error', message)
+
+
+class CompileCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_whitespace_changes_share_key(self):
+        cache = CompileCache(self.cache_dir, 1024)
+        key = cache.make_key('int main() {}\n', 'c', 'gcc 12', ['gcc'])
+        self.assertEqual(key, cache.make_key('int main() {}   \r\n\n\n', 'c', 'gcc 12', ['gcc']))
+        self.assertNotEqual(key, cache.make_key('int main() {}\n', 'c', 'gcc 13', ['gcc']))
+        self.assertNotEqual(key, cache.make_key('int main() {}\n', 'c', 'gcc 12', ['gcc', '-O2']))
+
+    def test_store_restore_and_evict(self):
+        cache = CompileCache(self.cache_dir, 100, scan_interval=1)
+        with open(os.path.join(self.work_dir, 'main'), 'wb') as f:
+            f.write(b'x' * 60)
+        cache.store('aa' + '0' * 62, self.work_dir, ['main'], True, '')
+        cache.store('bb' + '0' * 62, self.work_dir, ['main'], False, 'error: expected')
+
+        restore_dir = tempfile.mkdtemp(dir=self.work_dir)
+        self.assertEqual(cache.restore('bb' + '0' * 62, restore_dir), (False, 'error: expected'))
+        self.assertIsNone(cache.restore('cc' + '0' * 62, restore_dir))
+
+        # 第三个条目写入后超过上限，最久未使用的条目被淘汰
+        os.utime(os.path.join(self.cache_dir, 'aa', 'aa' + '0' * 62), (0, 0))
+        cache.store('dd' + '0' * 62, self.work_dir, ['main'], True, '')
+        self.assertIsNone(cache.restore('aa' + '0' * 62, restore_dir))
+        self.assertEqual(cache.restore('dd' + '0' * 62, restore_dir), (True, ''))
+        self.assertTrue(os.path.exists(os.path.join(restore_dir, 'main')))
+
+
+class CheckerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def check(self, output, expected, mode, **kwargs):
+        paths = []
+        for name, content in (('output.txt', output), ('expected.txt', expected)):
+            paths.append(os.path.join(self.work_dir, name))
+            with open(paths[-1], 'wb') as f:
+                f.write(content)
+        return check_output(paths[0], paths[1], mode, **kwargs)
+
+    def test_modes(self):
+        self.assertTrue(self.check(b'1 2\n', b'1 2\n', 'exact'))
+        self.assertFalse(self.check(b'1 2 \n', b'1 2\n', 'exact'))
+        self.assertTrue(self.check(b'1 2 \r\n3\n\n\n', b'1 2\n3', 'trailing_whitespace'))
+        self.assertFalse(self.check(b'1  2\n', b'1 2\n', 'trailing_whitespace'))
+        self.assertFalse(self.check(b'1\n\n2\n', b'1\n2\n', 'trailing_whitespace'))
+        self.assertTrue(self.check(b'1  2\n\n3', b'1 2 3\n', 'tokens'))
+        self.assertTrue(self.check(b'0.3333334 1e3\n', b'0.333333 1000\n', 'float', epsilon=1e-6))
+        self.assertFalse(self.check(b'0.3334\n', b'0.3333\n', 'float', epsilon=1e-6))
+
+    def test_diff_excerpt(self):
+        result = self.check(b'1\n2\n4\n', b'1\n2\n3\n', 'trailing_whitespace')
+        self.assertEqual(result.message, "Line 3: expected '3', got '4'")
+        result = self.check(b'1 2', b'1 2 3', 'tokens')
+        self.assertEqual(result.message, "Token 3 (line 1): expected '3', got <EOF>")
+
+    def test_chunk_boundaries(self):
+        with mock.patch.object(checker, 'CHUNK_SIZE', 3):
+            self.assertTrue(self.check(b'12345  \n678\n', b'12345\n678   \n\n', 'trailing_whitespace'))
+            self.assertTrue(self.check(b'12345 67\n', b'12345\n67', 'tokens'))
+            result = self.check(b'aaaa\nbbbbbXbb\n', b'aaaa\nbbbbbbbb\n', 'exact')
+        self.assertEqual(result.message, "Line 2: expected 'bbbbbbbb', got 'bbbbbXbb'")
+
+    def test_cached_expected_output(self):
+        cache = checker.ExpectedOutputCache(1024 * 1024)
+        cases = ((b'1\n2\n4\n', b'1 \n2\n3\n\n', 'trailing_whitespace'), (b'1 2\n5', b'1\n2  3\n', 'tokens'),
+                 (b'0.3333334 1e3\n', b'0.333333 1000\n', 'float'))
+        with mock.patch.object(checker, '_expected_cache', cache), mock.patch.object(checker, 'CHUNK_SIZE', 3):
+            for output, expected, mode in cases:
+                uncached = self.check(output, expected, mode)
+                for _ in range(2):
+                    cached = self.check(output, expected, mode, expected_hash=mode)
+                    self.assertEqual((bool(cached), cached.message), (bool(uncached), uncached.message))
+        self.assertEqual(cache.stats()['misses'], 3)
+        self.assertEqual(cache.stats()['hits'], 3)
+
+    def test_oversized_expected_output_is_streamed(self):
+        cache = checker.ExpectedOutputCache(8)
+        with mock.patch.object(checker, '_expected_cache', cache), \
+                mock.patch.object(checker, '_normalize', side_effect=AssertionError('normalized')):
+            self.assertTrue(self.check(b'1 2 3 4 5 6\n', b'1 2 3 4 5 6', 'tokens', expected_hash='big'))
+            result = self.check(b'1\n2\n3\n4\n6\n', b'1\n2\n3\n4\n5\n', 'trailing_whitespace', expected_hash='big')
+        self.assertEqual(result.message, "Line 5: expected '5', got '6'")
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+class SpecialJudgeTestCase(SimpleTestCase):
+    # 输出任意两个和为 n 的非负整数即可
+    CHECKER = (
+        'import sys\n'
+        'n = int(open(sys.argv[1]).read())\n'
+        'a, b = map(int, open(sys.argv[2]).read().split())\n'
+        'if a < 0 or b < 0 or a + b != n:\n'
+        '    print(f"{a} + {b} != {n}")\n'
+        '    sys.exit(1)\n'
+    )
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.checker_dir = tempfile.mkdtemp()
+        self.override = override_settings(JUDGE_CHECKER_DIR=self.checker_dir)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        shutil.rmtree(self.checker_dir, ignore_errors=True)
+
+    def judge(self, code, checker_code):
+        for name, content in (('main.py', code), ('case.in', '10\n'), ('case.out', '0 10\n')):
+            with open(os.path.join(self.work_dir, name), 'w') as f:
+                f.write(content)
+        problem = SimpleNamespace(checker_code=checker_code, checker_language='python')
+        # 与评测工作目录的上级目录一样，评测程序的身份只能进入不能列出
+        os.chmod(self.work_dir, 0o711)
+        checker = get_checker(problem).open(self.work_dir)
+        try:
+            return run_test('python', self.work_dir, os.path.join(self.work_dir, 'case.in'),
+                            os.path.join(self.work_dir, 'case.out'), 1000, 256, 'special', checker=checker)
+        finally:
+            checker.close()
+
+    def test_checker_verdicts(self):
+        self.assertEqual(self.judge('print(3, 7)\n', self.CHECKER)[0], 'accepted')
+        status, time_ms, memory_kb, message = self.judge('print(3, 8)\n', self.CHECKER)
+        self.assertEqual(status, 'wrong_answer')
+        self.assertIn('3 + 8 != 10', message)
+        # 每个节点只编译（准备）一次
+        self.assertEqual(len(os.listdir(self.checker_dir)), 1)
+        with self.assertRaises(CheckerError):
+            self.judge('print(3, 7)\n', 'import sys\nsys.exit(5)\n')
+
+    def test_checker_runs_as_sandbox_user(self):
+        # 评测程序不以 root 运行，程序输出被换成符号链接时不会读到链接指向的文件
+        checker_code = (
+            'import os, sys\n'
+            'print(os.getuid(), repr(open(sys.argv[2]).read()), os.access("/root", os.R_OK))\n'
+            'sys.exit(1)\n'
+        )
+        secret = os.path.join(self.work_dir, 'secret.txt')
+        with open(secret, 'w') as f:
+            f.write('password')
+        output = os.path.join(self.work_dir, 'case.out.txt')
+        os.symlink(secret, output)
+        answer = os.path.join(self.work_dir, 'case.ans')
+        with open(answer, 'w') as f:
+            f.write('10\n')
+        problem = SimpleNamespace(checker_code=checker_code, checker_language='python')
+        with override_settings(JUDGE_SANDBOX_UID_BASE=60000, JUDGE_SANDBOX_UID_COUNT=64,
+                               JUDGE_SANDBOX_CHECKER_UID=None):
+            checker = get_checker(problem).open(tempfile.gettempdir())
+            try:
+                check = checker.check(answer, output, answer)
+            finally:
+                checker.close()
+        self.assertEqual(check.message, "60064 '' False")
+        self.assertFalse(os.path.exists(checker.directory))
+
+
+class SubtaskTestCase(SimpleTestCase):
+    def run_cases(self, cases, verdicts, run_all=True):
+        ran = []
+
+        def run_case(case, cpu, index):
+            ran.append(index)
+            return verdicts[index], 0, 0, None
+
+        with mock.patch('judge.engine.borrow_idle_cores', return_value=[]):
+            outcomes = _run_cases(run_case, cases, _case_groups(cases, run_all))
+        return ran, outcomes
+
+    def test_failed_subtask_is_skipped(self):
+        cases = [SimpleNamespace(subtask=subtask, score=score)
+                 for subtask, score in ((1, 10), (1, 10), (1, 10), (2, 35), (2, 35))]
+        verdicts = ['accepted', 'wrong_answer', 'accepted', 'accepted', 'accepted']
+        ran, outcomes = self.run_cases(cases, verdicts)
+        self.assertEqual(ran, [0, 1, 3, 4])
+        self.assertIsNone(outcomes[2])
+        self.assertEqual(_score(cases, outcomes), 70)
+
+    def test_cases_without_subtasks(self):
+        cases = [SimpleNamespace(subtask=0, score=0) for _ in range(4)]
+        verdicts = ['accepted', 'wrong_answer', 'accepted', 'accepted']
+        ran, outcomes = self.run_cases(cases, verdicts)
+        self.assertEqual(_score(cases, outcomes), 75)
+        ran, outcomes = self.run_cases(cases, verdicts, run_all=False)
+        self.assertEqual(ran, [0, 1])
+        self.assertEqual(_score(cases, outcomes), 25)
+
+
+class ObjectiveGradingTestCase(SimpleTestCase):
+    def grade(self, problem_type, key, answer):
+        return objective.grade(problem_type, objective.parse_key(problem_type, key), answer)
+
+    def test_choice_and_true_false(self):
+        self.assertEqual(self.grade(objective.CHOICE, 'ACD', 'd, c，a'), ('accepted', 100))
+        self.assertEqual(self.grade(objective.CHOICE, 'ACD', 'AC'), ('wrong_answer', 0))
+        self.assertEqual(self.grade(objective.TRUE_FALSE, '对', 'True'), ('accepted', 100))
+        self.assertEqual(self.grade(objective.TRUE_FALSE, '对', '不知道'), ('wrong_answer', 0))
+
+    def test_fill_blank_partial_credit(self):
+        key = 'O(n)|O(N)\n递归'
+        self.assertEqual(self.grade(objective.FILL_BLANK, key, 'Ｏ(n)\r\n 递归 '), ('accepted', 100))
+        self.assertEqual(self.grade(objective.FILL_BLANK, key, 'O(n log n)\n递归'), ('wrong_answer', 50))
+        self.assertEqual(self.grade(objective.FILL_BLANK, key, 'o(n)'), ('wrong_answer', 50))
+
+    def test_missing_key_is_system_error(self):
+        for problem_type, key in ((objective.CHOICE, ''), (objective.TRUE_FALSE, '不知道'),
+                                  (objective.FILL_BLANK, ''), (objective.FILL_BLANK, 'O(n)\n\n递归')):
+            self.assertEqual(self.grade(problem_type, key, 'A'), ('system_error', 0))
+
+
+class NodeDispatchTestCase(SimpleTestCase):
+    def test_batch_sized_to_free_slots(self):
+        pool = WorkerPool(processes=3, concurrency=2, pin_cpus=False, name_prefix='node')
+        pipes = {}
+        for slot in range(3):
+            pipes[slot] = multiprocessing.Pipe()
+            pool.children[slot] = (None, f'node:1:{slot}', pipes[slot][0])
+        pool.demand = {0: 2, 1: 0, 2: 1}
+
+        def claim_batch(slots):
+            # 队列里只有两个任务
+            return [SimpleNamespace(id=index + 1, worker=name) for index, name in enumerate(slots[:2])]
+
+        with mock.patch.object(task_queue, 'claim_batch', side_effect=claim_batch) as claim:
+            self.assertEqual(pool._dispatch(), 2)
+        # 一次认领全部空闲并发，交错排列使每个子进程先各分到一个
+        claim.assert_called_once_with(['node:1:0', 'node:1:2', 'node:1:0'])
+        self.assertEqual(pipes[0][1].recv(), [1])
+        self.assertEqual(pipes[2][1].recv(), [2])
+        self.assertFalse(pipes[1][1].poll())
+        self.assertEqual(pool.demand, {0: 0, 1: 0, 2: 0})
+        self.assertEqual((pool._batches, pool._claimed), (1, 2))
+
+
+class WorkerCoreTestCase(SimpleTestCase):
+    def test_waits_for_borrowed_core_outside_lock(self):
+        with override_settings(JUDGE_CPU_LOCK_DIR=tempfile.mkdtemp()):
+            worker = JudgeWorker(name='w', cpu=0)
+            executor = mock.Mock()
+            # 核正被其他提交借用
+            borrowed = acquire_core(0)
+            starter = threading.Thread(target=worker._start, args=(executor, [SimpleNamespace(id=1)]))
+            starter.start()
+            time.sleep(0.2)
+            # 等待核时评测线程仍然可以结束任务、收集结果
+            self.assertTrue(worker._lock.acquire(timeout=1))
+            worker._lock.release()
+            self.assertFalse(executor.submit.called)
+            borrowed.release()
+            starter.join(5)
+            worker._core.release()
+        task, core_wait = executor.submit.call_args[0][1:]
+        self.assertEqual(task.id, 1)
+        self.assertGreaterEqual(core_wait, 150)
+
+    def test_core_failure_releases_task(self):
+        worker = JudgeWorker(name='w', cpu=0)
+        executor = mock.Mock()
+        task = SimpleNamespace(id=1)
+        with mock.patch('judge.worker.acquire_core', side_effect=OSError('no lock dir')), \
+                mock.patch('judge.worker.release_tasks') as release:
+            worker._start(executor, [task])
+        self.assertFalse(executor.submit.called)
+        release.assert_called_once_with([task])
+        self.assertEqual(worker._in_flight, 0)
+        self.assertTrue(worker._idle.is_set())
+
+
+@override_settings(JUDGE_CASE_PARALLELISM=4)
+class ParallelCasesTestCase(SimpleTestCase):
+    def run_cases(self, durations, verdicts, run_all):
+        """在借来的 3 个核和自己的核上运行，返回 (结果, 运行过的测试用例, 使用过的核, 最大并行数, 借用的核)"""
+        leases = [mock.Mock(cpu=cpu) for cpu in (1, 2, 3)]
+        ran, cpus = set(), set()
+        running = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def run_case(case, cpu, index):
+            with lock:
+                ran.add(index)
+                cpus.add(cpu)
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(durations[index])
+            with lock:
+                running['now'] -= 1
+            return verdicts[index], index, 0, None
+
+        cases = [SimpleNamespace(subtask=0, score=0) for _ in durations]
+        with mock.patch('judge.engine.borrow_idle_cores', return_value=leases):
+            outcomes = _run_cases(run_case, cases, _case_groups(cases, run_all))
+        return outcomes, ran, cpus, running['max'], leases
+
+    def test_results_in_case_order(self):
+        # 后面的测试用例先结束
+        durations = [0.3, 0.25, 0.2, 0.15, 0.1, 0.05]
+        outcomes, ran, cpus, parallel, leases = self.run_cases(durations, ['accepted'] * 6, run_all=True)
+        self.assertEqual([outcome[1] for outcome in outcomes], list(range(6)))
+        self.assertEqual(cpus, {None, 1, 2, 3})
+        self.assertEqual(parallel, 4)
+        for lease in leases:
+            lease.release.assert_called_once_with()
+
+    def test_failure_cancels_remaining_cases(self):
+        durations = [0.2, 0.05] + [0.2] * 6
+        verdicts = ['accepted', 'wrong_answer'] + ['accepted'] * 6
+        outcomes, ran, cpus, parallel, leases = self.run_cases(durations, verdicts, run_all=False)
+        # 失败时已经在运行的测试用例照常结束，之后的不再开始；失败之后的结果与逐个运行一致地丢弃
+        self.assertEqual(ran, {0, 1, 2, 3})
+        self.assertEqual([outcome and outcome[0] for outcome in outcomes], ['accepted', 'wrong_answer'] + [None] * 6)
+
+
+class LanguageRegistryTestCase(SimpleTestCase):
+    def test_settings_override(self):
+        go = {'name': 'Go', 'source': 'main.go', 'run': ['./main'], 'compile': ['go', 'build', '-o', 'main', 'main.go']}
+        with override_settings(JUDGE_LANGUAGES={'java': {'time_factor': 3.0}, 'go': go}), \
+                mock.patch.dict(languages._registry), mock.patch.object(languages, '_settings_loaded', False):
+            java = languages.get_language('java')
+            self.assertEqual(java.time_factor, 3.0)
+            self.assertEqual(java.source, 'Main.java')
+            self.assertEqual(java.time_limit(1000), 3000)
+            self.assertIn(('go', 'Go'), languages.language_choices())
+        self.assertNotIn('go', languages._registry)
+
+
+class JudgeDatabaseTestCase(TestCase):
+    """使用数据库的测试：一道编程题和提交、入队的辅助方法"""
+
+    def setUp(self):
+        self.user = self.create_user('student')
+        self.problem = Problem.objects.create(title='A+B', description='', problem_type=4, created_by=self.user)
+
+    def create_user(self, username):
+        return CustomUser.objects.create(username=username, password='x', usercode=username, role=1)
+
+    def submit(self, code='print(1)', user=None, problem=None, **fields):
+        submission = Submission.objects.create(user=user or self.user, problem=problem or self.problem, code=code,
+                                               language='python', **fields)
+        task_queue.enqueue_submission(submission)
+        return submission
+
+    def status(self, submission):
+        return Submission.objects.get(id=submission.id).status
+
+    def login(self, user=None):
+        session = self.client.session
+        session['user_id'] = (user or self.user).id
+        session['user_role'] = 1
+        session.save()
+
+
+class TaskQueueTestCase(JudgeDatabaseTestCase):
+    def test_claim_batch_without_skip_locked(self):
+        first, second = self.submit(), self.submit()
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', False):
+            # 其他节点在本节点选出候选任务之后抢先认领了第一个
+            candidates = task_queue._candidates(2)
+            self.assertEqual(len(task_queue.claim_tasks('other')), 1)
+            with mock.patch.object(task_queue, '_candidates', return_value=candidates):
+                claimed = task_queue.claim_batch(['node:0', 'node:1'])
+        self.assertEqual([(task.submission_id, task.worker, task.attempts) for task in claimed],
+                         [(second.id, 'node:1', 0)])
+        self.assertEqual(JudgeTask.objects.get(submission=first).worker, 'other')
+        self.assertEqual(self.status(second), 'judging')
+        task, = task_queue.start_tasks('node:1', [claimed[0].id])
+        self.assertEqual(task.attempts, 1)
+
+    @override_settings(JUDGE_MAX_ATTEMPTS=2)
+    def test_release_gives_up_after_max_attempts(self):
+        submission = self.submit()
+        self.assertEqual(task_queue.release_tasks(task_queue.claim_tasks('w')), (1, 0))
+        self.assertEqual(self.status(submission), 'pending')
+        # 认领后还没开始评测的任务不计次数
+        self.assertEqual(task_queue.release_tasks(task_queue.claim_batch(['w'])), (1, 0))
+        task, = task_queue.claim_tasks('w')
+        self.assertEqual(task.attempts, 2)
+        self.assertEqual(task_queue.release_tasks([task]), (0, 1))
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, 'system_error')
+        self.assertIn('2 times', submission.error_message)
+        self.assertFalse(JudgeTask.objects.exists())
+        self.assertEqual(Problem.objects.get(id=self.problem.id).submission_count, 1)
+
+    def claim_order(self, count):
+        return [task.submission_id for task in sorted(task_queue.claim_tasks('w', count),
+                                                      key=lambda task: (task.priority, task.virtual_time, task.id))]
+
+    def test_contest_before_earlier_practice(self):
+        practice = [self.submit(), self.submit()]
+        competition = Competition.objects.create(name='Exam', creator=self.user)
+        paper = Paper.objects.create(competition=competition, name='Paper')
+        paper.problems.set([self.problem])
+        PaperAssignment.objects.create(paper=paper, user=self.user)
+        contest = self.submit()
+        self.assertEqual(JudgeTask.objects.get(submission=contest).priority, JudgeTask.PRIORITY_CONTEST)
+        self.assertEqual(self.claim_order(1), [contest.id])
+        self.assertEqual(self.claim_order(2), [submission.id for submission in practice])
+
+    def test_rejudge_waits_behind_practice(self):
+        rejudge = Submission.objects.create(user=self.user, problem=self.problem, code='', language='python')
+        task_queue.enqueue_submission(rejudge, priority=JudgeTask.PRIORITY_REJUDGE)
+        practice = self.submit(user=self.create_user('other'))
+        self.assertEqual(self.claim_order(1), [practice.id])
+        self.assertEqual(self.claim_order(1), [rejudge.id])
+
+    def test_flooding_user_does_not_block_others(self):
+        flood = [self.submit(code=f'print({index})') for index in range(5)]
+        single = self.submit(user=self.create_user('other'))
+        # 每轮每个用户各一个任务：后来的用户排在下一轮，而不是连续提交的 5 个任务之后
+        self.assertEqual(self.claim_order(1), [flood[0].id])
+        self.assertEqual(self.claim_order(2), [flood[1].id, single.id])
+        self.assertEqual(self.claim_order(5), [submission.id for submission in flood[2:]])
+
+    def test_reap_stuck_submissions(self):
+        dead, slow = self.submit(), self.submit()
+        long_ago = timezone.now() - timedelta(hours=1)
+        JudgeWorkerHeartbeat.objects.create(name='dead', hostname='h', pid=1, last_heartbeat=long_ago)
+        JudgeWorkerHeartbeat.objects.create(name='live', hostname='h', pid=2, last_heartbeat=timezone.now())
+        task_queue.claim_tasks('dead')
+        task_queue.claim_tasks('live')
+        JudgeTask.objects.filter(submission=slow).update(claimed_at=long_ago)
+        orphan = Submission.objects.create(user=self.user, problem=self.problem, code='', language='python')
+        Submission.objects.filter(id=orphan.id).update(updated_at=long_ago)
+
+        self.assertEqual(task_queue.reap_stuck_submissions(), {'requeued': 2, 'failed': 0, 'orphans': 1})
+        self.assertEqual(JudgeTask.objects.filter(status='queued').count(), 3)
+        self.assertEqual([self.status(submission) for submission in (dead, slow, orphan)], ['pending'] * 3)
+        self.assertEqual(JudgeWorkerHeartbeat.objects.get(name='dead').status, 'stopped')
+
+
+class SaveResultsTestCase(JudgeDatabaseTestCase):
+    def test_counters_and_statistics(self):
+        other = self.create_user('other')
+        second = Problem.objects.create(title='B', description='', problem_type=4, difficulty=2, created_by=self.user)
+        case = self.problem.test_cases.create(input_data='1\n', expected_output='1\n')
+        submissions = [self.submit(), self.submit(), self.submit(problem=second), self.submit(user=other)]
+        tasks = {task.submission_id: task for task in task_queue.claim_tasks('w', 4)}
+        statuses = ['wrong_answer', 'accepted', 'accepted', 'accepted']
+        results = [JudgeResult(submission, status, task=tasks[submission.id],
+                               results=[TestCaseResult(submission=submission, test_case=case, status='passed')])
+                   for submission, status in zip(submissions, statuses)]
+        # 被回收并重新认领的任务的结果不写回
+        JudgeTask.objects.filter(id=tasks[submissions[3].id].id).update(worker='other', claimed_at=timezone.now())
+
+        saved = save_results(results)
+        self.assertEqual(len(saved), 3)
+        self.assertEqual(list(JudgeTask.objects.values_list('submission_id', flat=True)), [submissions[3].id])
+        self.assertEqual([self.status(submission) for submission in submissions],
+                         statuses[:3] + ['judging'])
+        self.assertEqual(TestCaseResult.objects.count(), 3)
+        self.problem.refresh_from_db()
+        self.assertEqual((self.problem.submission_count, self.problem.accepted_count), (2, 1))
+        self.assertEqual(Problem.objects.get(id=second.id).accepted_count, 1)
+        stats = StudentStatistics.objects.get(user=self.user)
+        self.assertEqual((stats.total_submissions, stats.accepted_submissions), (3, 2))
+        self.assertEqual((stats.total_problems_attempted, stats.total_problems_solved), (2, 2))
+        self.assertEqual((stats.easy_problems_solved, stats.medium_problems_solved), (1, 1))
+        self.assertFalse(StudentStatistics.objects.filter(user=other).exists())
+
+    def test_verdict_cache_hit(self):
+        case = self.problem.test_cases.create(input_data='1\n', expected_output='1\n')
+        source, duplicate = self.submit(), self.submit()
+        # 添加测试用例递增了测试数据版本，按数据库中的题目计算评测键
+        duplicate = Submission.objects.select_related('problem').get(id=duplicate.id)
+        time_limit, memory_limit = engine._limits(duplicate.problem, languages.get_language('python'))
+        key = verdict_key(duplicate, False, time_limit, memory_limit)
+        Submission.objects.filter(id=source.id).update(status='wrong_answer', judge_key=key, score=50)
+        TestCaseResult.objects.create(submission=source, test_case=case, status='failed', error_message='diff')
+
+        with mock.patch.object(engine, 'compile_source', side_effect=AssertionError('compiled')):
+            result = evaluate_submission(duplicate.id)
+        self.assertEqual((result.status, result.score, result.judge_key), ('wrong_answer', 50, key))
+        self.assertEqual([(case_result.submission, case_result.test_case_id, case_result.error_message)
+                          for case_result in result.results], [(duplicate, case.id, 'diff')])
+
+        # 重新评测不复用旧结果
+        with mock.patch.object(engine, 'acquire_sandbox_user', return_value=None), \
+                mock.patch.object(engine, '_test_data', return_value=[]):
+            result = evaluate_submission(duplicate.id, task=SimpleNamespace(rejudge_job_id=1))
+        self.assertEqual(result.status, 'system_error')
+
+
+class RejudgeFinalizeTestCase(JudgeDatabaseTestCase):
+    @override_settings(JUDGE_REJUDGE_FINALIZE_CHUNK=2)
+    def test_finalize_in_chunks(self):
+        users = [self.user, self.create_user('b'), self.create_user('c')]
+        for user in users:
+            RankingSystem.objects.create(user=user)
+        submissions = [Submission.objects.create(user=user, problem=self.problem, code='', language='python',
+                                                 status='accepted') for user in users]
+        Problem.objects.filter(id=self.problem.id).update(submission_count=3, accepted_count=3)
+        job = create_rejudge_job(problem=self.problem)
+        RejudgeJob.objects.filter(id=job.id).update(last_advanced_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(advance_rejudge_jobs(), 3)
+        tasks = task_queue.claim_tasks('w', 3)
+        save_results([JudgeResult(Submission.objects.get(id=task.submission_id),
+                                  'accepted' if task.submission_id == submissions[0].id else 'wrong_answer', task=task)
+                      for task in tasks])
+        # 重新评测的结果不逐条更新计数
+        self.assertEqual(Problem.objects.get(id=self.problem.id).accepted_count, 3)
+        self.assertFalse(finalize_step())
+        advance_rejudge_jobs()
+
+        self.assertTrue(finalize_step())
+        job.refresh_from_db()
+        self.assertEqual((job.finalized_user_id, job.finished_at), (users[1].id, None))
+        self.problem.refresh_from_db()
+        self.assertEqual((self.problem.submission_count, self.problem.accepted_count), (3, 1))
+        self.assertFalse(StudentStatistics.objects.filter(user=users[2]).exists())
+        self.assertTrue(finalize_step())
+        self.assertTrue(finalize_step())
+        self.assertFalse(finalize_step())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'finished')
+        self.assertEqual([StudentStatistics.objects.get(user=user).accepted_submissions for user in users], [1, 0, 0])
+        self.assertEqual(RankingSystem.objects.get(user=self.user).rank_position, 1)
+
+    def test_completed_paper_keeps_contest_policy(self):
+        competition = Competition.objects.create(name='Exam', creator=self.user)
+        paper = Paper.objects.create(competition=competition, name='Paper')
+        paper.problems.set([self.problem])
+        assignment = PaperAssignment.objects.create(paper=paper, user=self.user)
+        answer = Submission.objects.create(user=self.user, problem=self.problem, code='', language='python',
+                                           status='wrong_answer', score=80)
+        PaperAssignment.objects.filter(id=assignment.id).update(
+            is_completed=True, completed_at=timezone.now(), completion_rate=80)
+        practice = Submission.objects.create(user=self.user, problem=self.problem, code='', language='python',
+                                             status='wrong_answer', score=100)
+        # 答卷时的提交在试卷完成后仍运行全部测试用例，之后的练习不是
+        self.assertTrue(engine._runs_all_cases(Submission.objects.select_related('problem').get(id=answer.id)))
+        self.assertFalse(engine._runs_all_cases(Submission.objects.select_related('problem').get(id=practice.id)))
+
+        job = create_rejudge_job(paper=paper)
+        RejudgeJob.objects.filter(id=job.id).update(last_advanced_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(advance_rejudge_jobs(), 2)
+        tasks = {task.submission_id: task for task in task_queue.claim_tasks('w', 2)}
+        save_results([JudgeResult(answer, 'wrong_answer', score=90, task=tasks[answer.id]),
+                      JudgeResult(practice, 'accepted', score=100, task=tasks[practice.id])])
+        advance_rejudge_jobs()
+        while finalize_step():
+            pass
+        # 完成后的练习提交不计入试卷正确率
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.completion_rate, 90)
+
+
+@override_settings(JUDGE_TRIAL_RUN_INTERVAL_SECONDS=0)
+class TrialRunViewTestCase(JudgeDatabaseTestCase):
+    def run_code(self, **data):
+        return self.client.post(reverse('student_practice:run_code', args=[self.problem.id]),
+                                {'code': 'print(1)', 'language': 'python', **data})
+
+    def result(self, trial_id):
+        return self.client.get(reverse('student_practice:run_result', args=[self.problem.id, trial_id]))
+
+    def test_run_and_take_result_once(self):
+        self.login()
+        response = self.run_code(input='5')
+        self.assertEqual(response.status_code, 202)
+        trial_id = response.json()['trial_id']
+        task = JudgeTask.objects.get(trial_run_id=trial_id)
+        self.assertEqual(task.priority, JudgeTask.PRIORITY_TRIAL)
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(self.result(trial_id).json(), {'success': True, 'finished': False})
+
+        task, = task_queue.claim_tasks('w')
+        finish_trial_runs([task], [{'status': 'finished', 'stdout': '5\n'}])
+        body = self.result(trial_id).json()
+        self.assertEqual((body['finished'], body['stdout']), (True, '5\n'))
+        # 结果只返回一次，不保存代码和输出
+        self.assertFalse(TrialRun.objects.exists())
+        self.assertEqual(self.result(trial_id).status_code, 404)
+
+    def test_result_of_other_user(self):
+        self.login()
+        trial_id = self.run_code().json()['trial_id']
+        self.login(self.create_user('other'))
+        self.assertEqual(self.result(trial_id).status_code, 404)
+
+    def test_rate_limits(self):
+        self.login()
+        self.assertEqual(self.run_code().status_code, 202)
+        # 上一次试运行还没完成
+        self.assertEqual(self.run_code().status_code, 429)
+        TrialRun.objects.update(status='finished')
+        self.assertEqual(self.run_code().status_code, 202)
+        TrialRun.objects.update(status='finished')
+        with override_settings(JUDGE_TRIAL_RUN_INTERVAL_SECONDS=60):
+            self.assertEqual(self.run_code().status_code, 429)
+        with override_settings(JUDGE_TRIAL_RUN_MAX_QUEUED=2):
+            self.login(self.create_user('other'))
+            self.assertEqual(self.run_code().status_code, 429)
+
+
+class VerdictHubTestCase(SimpleTestCase):
+    def setUp(self):
+        # 不启动轮询数据库的线程
+        patcher = mock.patch.object(events.threading, 'Thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.hub = events.VerdictHub()
+
+    def event(self, user_id, status, submission_id=1):
+        return {'id': submission_id, 'user_id': user_id, 'problem_id': 1, 'status': status}
+
+    def drain(self, subscription):
+        received = []
+        while True:
+            event = subscription.get(timeout=0)
+            if event is None:
+                return received
+            received.append(event['status'])
+
+    def test_fan_out_to_user_subscriptions(self):
+        first, second, other = self.hub.subscribe(1), self.hub.subscribe(1), self.hub.subscribe(2)
+        for status in ('judging', 'judging', 'accepted'):
+            self.hub.publish(self.event(1, status))
+        self.assertEqual(self.drain(first), ['judging', 'accepted'])
+        self.assertEqual(self.drain(second), ['judging', 'accepted'])
+        self.assertEqual(self.drain(other), [])
+
+        first.close()
+        self.hub.publish(self.event(1, 'pending', submission_id=2))
+        self.assertEqual((self.drain(first), self.drain(second)), ([], ['pending']))
+        second.close()
+        other.close()
+        self.assertEqual(self.hub._subscriptions, {})
+
+
+@override_settings(JUDGE_EVENTS_STREAM_SECONDS=0.2, JUDGE_EVENTS_KEEPALIVE_SECONDS=0.05)
+class SubmissionEventsViewTestCase(JudgeDatabaseTestCase):
+    def stream(self, **headers):
+        response = self.client.get(reverse('student_practice:submission_events', args=[self.problem.id]), **headers)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_resume_after_reconnect(self):
+        self.login()
+        pending = self.submit()
+        finished = Submission.objects.create(user=self.user, problem=self.problem, code='', language='python',
+                                             status='accepted')
+        other = self.submit(user=self.create_user('other'))
+        content = self.stream()
+        self.assertIn(f'"id": {pending.id}', content)
+        self.assertNotIn(f'"id": {finished.id}', content)
+        self.assertNotIn(f'"id": {other.id}', content)
+        # 断开期间完成的提交在重连时补推
+        since = int((timezone.now() - timedelta(minutes=1)).timestamp() * 1000)
+        self.assertIn(f'"id": {finished.id}', self.stream(HTTP_LAST_EVENT_ID=str(since)))
+
+    def test_invalid_last_event_id(self):
+        self.login()
+        finished = Submission.objects.create(user=self.user, problem=self.problem, code='', language='python',
+                                             status='accepted')
+        for value in ('abc', '99999999999999999999', '-99999999999999999999'):
+            self.assertNotIn(f'"id": {finished.id}', self.stream(HTTP_LAST_EVENT_ID=value))
+
+    def test_requires_student(self):
+        session = self.client.session
+        session['user_id'] = self.user.id
+        session['user_role'] = 2
+        session.save()
+        response = self.client.get(reverse('student_practice:submission_events', args=[self.problem.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class JudgeMetricsViewTestCase(JudgeDatabaseTestCase):
+    def test_minutes_parameter(self):
+        CustomUser.objects.filter(id=self.user.id).update(role=3)
+        self.login()
+        url = reverse('log_management:judge_metrics')
+        self.assertEqual(self.client.get(url, {'minutes': 'abc'}).status_code, 400)
+        with mock.patch('views.log_management_views.queue_stats', return_value=[]) as queue_stats:
+            self.assertEqual(self.client.get(url, {'minutes': '10000000'}).status_code, 200)
+            self.assertEqual(self.client.get(url, {'minutes': '-5'}).status_code, 200)
+        self.assertEqual([call.args for call in queue_stats.call_args_list], [(24 * 60,), (1,)])
+
+
+class ObjectivePaperTestCase(JudgeDatabaseTestCase):
+    def test_completion_rate_uses_best_scores(self):
+        questions = [Problem.objects.create(title=f'Q{index}', description='', problem_type=objective.CHOICE,
+                                            answer_key='A', created_by=self.user) for index in range(2)]
+        competition = Competition.objects.create(name='Exam', creator=self.user)
+        paper = Paper.objects.create(competition=competition, name='Paper')
+        paper.problems.set(questions)
+        assignment = PaperAssignment.objects.create(paper=paper, user=self.user)
+
+        graded = objective.grade_answers(self.user.id, {questions[0].id: 'a', questions[1].id: 'B'})
+        self.assertEqual([graded[question.id].status for question in questions], ['accepted', 'wrong_answer'])
+        self.assertTrue(all(submission.pk for submission in graded.values()))
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.completion_rate, 50)
+        # 再答错不会降低已经得到的分数
+        objective.grade_answers(self.user.id, {questions[0].id: 'B', questions[1].id: 'A'})
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.completion_rate, 100)
+        self.assertEqual(Problem.objects.get(id=questions[0].id).submission_count, 2)
+        self.assertEqual(StudentStatistics.objects.get(user=self.user).total_problems_solved, 2)
+
+    def test_missing_answer_key(self):
+        question = Problem(title='Q', description='', problem_type=objective.CHOICE, created_by=self.user)
+        with self.assertRaises(ValidationError) as raised:
+            question.full_clean()
+        self.assertIn('answer_key', raised.exception.message_dict)
+        question.save()
+        submission = objective.grade_answers(self.user.id, {question.id: 'A'})[question.id]
+        self.assertEqual((submission.status, submission.score), ('system_error', 0))
+        self.assertEqual(submission.error_message, objective.MISSING_KEY_MESSAGE)
@@ -0,0 +1,215 @@
+# _*_ coding:utf-8 _*_
+"""
+试运行
+
+学生在正式提交前用题目样例或自定义输入运行代码。Web 进程只创建一条 TrialRun 和一个最高优先级的评测任务
+（JudgeTask.PRIORITY_TRIAL）并立即返回，评测进程认领后运行代码、把结果写回 TrialRun，页面轮询取得结果。
+试运行不创建 Submission，因此不影响提交计数、学生统计和排名；页面取走结果时删除 TrialRun（连同残留的评测任务），
+不保存学生的代码和输出，没有被取走的在 JUDGE_TRIAL_RUN_EXPIRE_SECONDS 秒后由评测节点删除。
+Web 服务器上不需要安装编译器。
+
+为了不拖慢正式评测：
+- 时间、内存和输出使用比正式评测更小的上限（JUDGE_TRIAL_RUN_*）
+- 同一用户同一时刻只有一个未完成的试运行，全站排队中的试运行数有上限，这些限制查询数据库，对所有 Web 进程同时生效；
+  两次试运行之间的最短间隔由视图按会话检查（取走结果后记录已经删除）
+编译仍然使用编译缓存，随后正式提交同一份代码时不需要再次编译。
+"""
+import logging
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from own_models.custom_user_models import CustomUser
+from own_models.judge_models import JudgeTask, TrialRun
+from judge.checker import check_output
+from judge.conf import judge_setting
+from judge.engine import _limits, _owned_tasks, _read_text, compile_source, run_failure
+from judge.isolation import acquire_sandbox_user
+from judge.languages import get_language
+from judge.sandbox import open_output, private_directory, run_process
+from judge.task_queue import enqueue_trial_run
+
+logger = logging.getLogger(__name__)
+
+
+class TrialRunBusy(Exception):
+    """试运行过于频繁或排队中的试运行已满"""
+
+
+def _clip(path, limit):
+    """读取输出文件的开头，返回 (文本, 是否被截断)"""
+    try:
+        with open_output(path) as f:
+            data = f.read(limit + 1)
+    except OSError:
+        return '', False
+    return data[:limit].decode('utf-8', errors='replace'), len(data) > limit
+
+
+def _trial_limits(problem, runner):
+    """试运行的时间限制(ms)和内存限制(MB)，不超过题目限制和试运行上限"""
+    time_limit, memory_limit = _limits(problem, runner)
+    return (min(time_limit, runner.time_limit(judge_setting('JUDGE_TRIAL_RUN_TIME_LIMIT_MS'))),
+            min(memory_limit, judge_setting('JUDGE_TRIAL_RUN_MEMORY_LIMIT_MB')))
+
+
+def _failed(status, message):
+    return {'status': status, 'compile_output': message, 'stdout': '', 'stderr': '',
+            'execution_time': 0, 'memory_used': 0, 'truncated': False}
+
+
+def create_trial_run(problem, language, code, user_id, custom_input=None):
+    """
+    创建试运行并放入评测队列，返回 TrialRun
+
+    custom_input 为 None 时使用题目样例并与样例输出比对，否则以 custom_input 为标准输入且不比对。
+    language 不受支持时抛出 KeyError，上一次试运行未完成或排队中的试运行已满时抛出 TrialRunBusy。
+    """
+    get_language(language)
+    input_limit = judge_setting('JUDGE_TRIAL_RUN_INPUT_BYTES')
+    if custom_input is not None:
+        custom_input = custom_input.encode('utf-8')[:input_limit].decode('utf-8', errors='ignore')
+    with transaction.atomic():
+        # 锁住用户行，同一用户的并发请求依次检查
+        list(CustomUser.objects.select_for_update().filter(id=user_id).values_list('id', flat=True))
+        if TrialRun.objects.filter(user_id=user_id, status='pending').exists():
+            raise TrialRunBusy('Your previous code run has not finished yet')
+        queued = JudgeTask.objects.filter(priority=JudgeTask.PRIORITY_TRIAL, status='queued').count()
+        if queued >= judge_setting('JUDGE_TRIAL_RUN_MAX_QUEUED'):
+            raise TrialRunBusy('Too many code runs in progress, please try again later')
+        trial = TrialRun.objects.create(user_id=user_id, problem=problem, language=language, code=code,
+                                        custom_input=custom_input)
+        enqueue_trial_run(trial)
+    return trial
+
+
+def run_trial(trial):
+    """
+    在评测进程中运行一次试运行，返回结果 dict
+
+    status 为 compile_error 或 judge.engine.run_test 的状态（自定义输入正常结束时为 finished），
+    以及 stdout、stderr、compile_output、execution_time(ms)、memory_used(KB)、truncated。
+    """
+    problem = trial.problem
+    try:
+        runner = get_language(trial.language)
+    except KeyError:
+        return _failed('system_error', f'Unsupported language: {trial.language}')
+    work_dir = None
+    user = None
+    try:
+        work_root = private_directory(judge_setting('JUDGE_WORK_DIR'), 0o711)
+        work_dir = tempfile.mkdtemp(prefix=f'trial{trial.id}_', dir=work_root)
+        user = acquire_sandbox_user()
+        if user is not None:
+            user.prepare(work_dir)
+        with open(os.path.join(work_dir, runner.source), 'w', encoding='utf-8') as f:
+            f.write(trial.code)
+        compiled, message = compile_source(trial.language, work_dir, trial.code, user=user)
+        if not compiled:
+            return _failed('compile_error', message)
+
+        stdin = problem.sample_input if trial.custom_input is None else trial.custom_input
+        input_path = os.path.join(work_dir, 'trial.in')
+        with open(input_path, 'wb') as f:
+            f.write((stdin or '').replace('\r\n', '\n').encode('utf-8')[:judge_setting('JUDGE_TRIAL_RUN_INPUT_BYTES')])
+        output_path = os.path.join(work_dir, 'trial.out')
+        error_path = os.path.join(work_dir, 'trial.err')
+
+        # 在评测进程绑定的核上运行
+        time_limit, memory_limit = _trial_limits(problem, runner)
+        result = run_process(
+            runner.run_command(memory_limit), cwd=work_dir,
+            stdin_path=input_path, stdout_path=output_path, stderr_path=error_path,
+            time_limit_ms=time_limit,
+            wall_limit_ms=time_limit * judge_setting('JUDGE_WALL_TIME_FACTOR') + judge_setting('JUDGE_WALL_TIME_EXTRA_MS'),
+            memory_limit_kb=memory_limit * 1024,
+            address_space_kb=memory_limit * 1024 * judge_setting('JUDGE_ADDRESS_SPACE_FACTOR'),
+            output_limit_bytes=judge_setting('JUDGE_TRIAL_RUN_OUTPUT_BYTES'),
+            limit_address_space=runner.limit_address_space,
+            preforked=judge_setting('JUDGE_PREFORKED_LAUNCHER'),
+            user=user,
+        )
+
+        failure = run_failure(result, error_path, time_limit, memory_limit)
+        if failure is not None:
+            status = failure[0]
+        elif trial.custom_input is not None or problem.checker_mode == 'special':
+            # 特殊评测程序只在正式评测中运行
+            status = 'finished'
+        else:
+            expected_path = os.path.join(work_dir, 'trial.ans')
+            with open(expected_path, 'wb') as f:
+                f.write((problem.sample_output or '').replace('\r\n', '\n').encode('utf-8'))
+            check = check_output(output_path, expected_path, problem.checker_mode, problem.float_epsilon)
+            status = 'accepted' if check else 'wrong_answer'
+
+        output_limit = judge_setting('JUDGE_TRIAL_RUN_DISPLAY_BYTES')
+        stdout, truncated = _clip(output_path, output_limit)
+        return {
+            'status': status,
+            'compile_output': message,
+            'stdout': stdout,
+            'stderr': _read_text(error_path, output_limit),
+            'execution_time': result.time_ms,
+            'memory_used': result.memory_kb,
+            'truncated': truncated or result.output_exceeded,
+        }
+    finally:
+        if user is not None:
+            user.release()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def finish_trial_runs(tasks, results):
+    """写回试运行结果并删除任务；已被回收并重新认领的任务不写回。返回写回的数量"""
+    now = timezone.now()
+    with transaction.atomic():
+        owned = _owned_tasks(tasks)
+        saved = [(task, result) for task, result in zip(tasks, results) if task.id in owned]
+        for task, result in saved:
+            TrialRun.objects.filter(id=task.trial_run_id).update(status='finished', result=result, finished_at=now)
+        JudgeTask.objects.filter(id__in=owned).delete()
+    return len(saved)
+
+
+def fail_trial_runs(tasks, message):
+    """多次运行失败的试运行以系统错误结束，返回写回的数量"""
+    return finish_trial_runs(tasks, [_failed('system_error', message) for task in tasks])
+
+
+def judge_trial_run(task):
+    """评测进程认领到试运行任务后调用：运行并立即写回，页面正在等待结果"""
+    trial = TrialRun.objects.select_related('problem').get(id=task.trial_run_id)
+    if not finish_trial_runs([task], [run_trial(trial)]):
+        logger.warning(f"Judge task {task.id} was reclaimed, dropping result of trial run {trial.id}")
+
+
+def take_result(trial_id, problem_id, user_id):
+    """
+    取走试运行结果
+
+    返回 None（不存在或已过期）、{'finished': False}，或完成时的结果 dict（含 finished: True）；
+    完成的试运行在返回结果时删除，结果只能取走一次。
+    """
+    trial = TrialRun.objects.filter(id=trial_id, problem_id=problem_id, user_id=user_id).values(
+        'status', 'result').first()
+    if trial is None:
+        return None
+    if trial['status'] != 'finished':
+        return {'finished': False}
+    # 评测任务随 TrialRun 级联删除
+    TrialRun.objects.filter(id=trial_id).delete()
+    return {'finished': True, **trial['result']}
+
+
+def purge_trial_runs():
+    """删除过期、没有被取走的试运行（连同还在排队的任务），返回删除数量"""
+    deadline = timezone.now() - timedelta(seconds=judge_setting('JUDGE_TRIAL_RUN_EXPIRE_SECONDS'))
+    count, deleted = TrialRun.objects.filter(created_at__lt=deadline).delete()
+    return deleted.get(TrialRun._meta.label, 0)
@@ -0,0 +1,57 @@
+# _*_ coding:utf-8 _*_
+"""
+重复提交的评测结果复用
+
+评测键 = hash(题目, 测试数据版本, 该语言下的评测限制, 比对方式（含特殊评测程序）, 语言, 代码)，评测完成后保存在 Submission.judge_key 上。
+同一题目再次提交完全相同的代码时，直接复制最近一次相同评测键的提交的结果和测试用例结果。
+测试用例变化时 Problem.test_data_version 递增，评测键随之改变，旧结果自然失效。
+"""
+import hashlib
+
+from own_models.student_practice import Submission, TestCaseResult
+
+# 与机器状态有关的结果不复用
+UNCACHEABLE_STATUSES = ('pending', 'judging', 'system_error')
+
+
+def verdict_key(submission, run_all, time_limit, memory_limit):
+    """
+    提交的评测键
+
+    run_all 表示是否运行全部测试用例，影响测试用例结果集合；time_limit / memory_limit 为该语言下实际使用的限制
+    """
+    problem = submission.problem
+    digest = hashlib.sha256()
+    parts = [problem.id, problem.test_data_version, time_limit, memory_limit,
+             problem.checker_mode, problem.float_epsilon, run_all, submission.language, submission.code]
+    if problem.checker_mode == 'special':
+        parts += [problem.checker_language, problem.checker_code]
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def find_cached_verdict(submission, key):
+    """
+    查找相同评测键的已完成提交
+
+    命中时返回 (原提交, [复制出的未保存 TestCaseResult])，否则返回 None
+    """
+    source = Submission.objects.filter(judge_key=key).exclude(id=submission.id).exclude(
+        status__in=UNCACHEABLE_STATUSES
+    ).order_by('-id').first()
+    if source is None:
+        return None
+    results = [
+        TestCaseResult(
+            submission=submission,
+            test_case_id=result.test_case_id,
+            status=result.status,
+            execution_time=result.execution_time,
+            memory_used=result.memory_used,
+            error_message=result.error_message,
+        )
+        for result in TestCaseResult.objects.filter(submission=source).order_by('test_case_id')
+    ]
+    return source, results
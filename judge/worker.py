@@ -0,0 +1,263 @@
+# _*_ coding:utf-8 _*_
+"""
+评测进程
+
+循环从数据库队列认领任务并评测，与 Web 进程完全分离。
+评测吞吐量取决于评测进程的数量，而不是 Web 服务器的线程数。
+在评测进程池中运行时不直接查询队列，而是通过管道向进程池申请任务，由进程池为整个节点批量认领。
+每个进程在后台线程中定期写心跳，心跳过期的进程认领的任务会被重新入队；
+评测或写回出错的任务立即放回队列，同一任务最多评测 JUDGE_MAX_ATTEMPTS 次。
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import wait
+
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from own_models.judge_models import JudgeWorkerHeartbeat
+from judge.checker import get_expected_cache
+from judge.conf import judge_setting
+from judge.cores import acquire_core
+from judge.engine import evaluate_submission, save_results
+from judge.task_queue import claim_tasks, release_tasks, start_tasks
+from judge.trial_run import judge_trial_run
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_name():
+    """主机名 + 进程号，用于在任务上记录认领者"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JudgeWorker(object):
+    """
+    单个评测进程的主循环
+
+    concurrency 为本进程同时评测的任务数上限。
+    绑定了核的进程在有任务评测时持有该核的锁，其他提交并行运行测试用例时不会借用这个核。
+    调用 stop() 后不再认领新任务，已认领的任务评测完成后退出（平滑排空）。
+    评测线程只负责评测，结果由主循环收集后批量写回，同时完成的多条提交共用一个事务。
+
+    dispatcher 为进程池的管道（multiprocessing Connection）时，空闲并发数变化后把它发给进程池，
+    进程池回复分配给本进程的任务 ID 列表，回复 None 表示队列已空、应当退出；
+    dispatcher 为 None 时自己从队列认领。
+    """
+
+    def __init__(self, name=None, poll_interval=None, concurrency=1, cpu=None, node='', dispatcher=None):
+        self.name = name or default_worker_name()
+        self.poll_interval = poll_interval or judge_setting('JUDGE_POLL_INTERVAL')
+        self.concurrency = max(1, concurrency)
+        self.cpu = cpu
+        self.node = node
+        self.dispatcher = dispatcher
+        # 最近一次告诉进程池的空闲并发数，收到分配的任务后清零
+        self._announced = 0
+        # 评测线程写入一个字节唤醒等待管道的主循环
+        self._wakeup = os.pipe() if dispatcher is not None else None
+        self.stopping = False
+        self._in_flight = 0
+        self._tasks_done = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._core = None
+        self._pending = []
+        self._result_ready = threading.Event()
+
+    def stop(self):
+        """请求停止，当前任务评测完成后退出"""
+        self.stopping = True
+
+    # 心跳
+
+    def _write_heartbeat(self, status='running'):
+        with self._lock:
+            tasks_done, self._tasks_done = self._tasks_done, 0
+        expected_cache = get_expected_cache()
+        cache_stats = expected_cache.stats() if expected_cache is not None else {'hits': 0, 'misses': 0}
+        updated = JudgeWorkerHeartbeat.objects.filter(name=self.name).update(
+            status=status, last_heartbeat=timezone.now(), tasks_done=F('tasks_done') + tasks_done,
+            expected_cache_hits=cache_stats['hits'], expected_cache_misses=cache_stats['misses'],
+        )
+        if not updated:
+            JudgeWorkerHeartbeat.objects.create(
+                name=self.name, node=self.node, hostname=socket.gethostname(), pid=os.getpid(), cpu=self.cpu,
+                concurrency=self.concurrency, status=status, tasks_done=tasks_done,
+                expected_cache_hits=cache_stats['hits'], expected_cache_misses=cache_stats['misses'],
+                last_heartbeat=timezone.now(),
+            )
+
+    def _heartbeat_loop(self, stop_event):
+        interval = judge_setting('JUDGE_HEARTBEAT_INTERVAL')
+        while not stop_event.wait(interval):
+            try:
+                self._write_heartbeat('draining' if self.stopping else 'running')
+            except Exception:
+                logger.exception(f"Worker {self.name} failed to write heartbeat")
+            finally:
+                close_old_connections()
+        connection.close()
+
+    # 评测
+
+    def _judge(self, task, core_wait=0):
+        try:
+            if task.trial_run_id is not None:
+                # 页面正在等待试运行的结果，运行完立即写回，不与提交结果一起批量写回
+                judge_trial_run(task)
+            else:
+                result = evaluate_submission(task.submission_id, task=task)
+                result.stage_times['core_wait'] = core_wait
+                with self._lock:
+                    self._pending.append(result)
+                self._result_ready.set()
+        except Exception:
+            logger.exception(f"Worker {self.name} failed to judge task {task.id}")
+            self._release([task])
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._in_flight -= 1
+                self._tasks_done += 1
+                if self._in_flight == 0:
+                    self._idle.set()
+                    if self._core is not None:
+                        self._core.release()
+                        self._core = None
+            if self._wakeup is not None:
+                os.write(self._wakeup[1], b'.')
+
+    def _flush(self):
+        """批量写回已评测完成的结果"""
+        self._result_ready.clear()
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            save_results(pending)
+        except Exception:
+            logger.exception(f"Worker {self.name} failed to save {len(pending)} judge result(s)")
+            self._release([result.task for result in pending if result.task is not None])
+        finally:
+            close_old_connections()
+
+    def _release(self, tasks):
+        """评测或写回失败的任务立即放回队列（次数有限），失败时留给超时回收"""
+        try:
+            release_tasks(tasks)
+        except Exception:
+            logger.exception(f"Worker {self.name} failed to release {len(tasks)} judge task(s)")
+
+    def _start(self, executor, tasks):
+        """把已认领的任务提交到线程池"""
+        for task in tasks:
+            with self._lock:
+                need_core = self._in_flight == 0 and self.cpu is not None
+                self._in_flight += 1
+                self._idle.clear()
+            core_wait = 0
+            if need_core:
+                # 核可能正被其他提交借用，等它运行完当前的测试用例；不持有 self._lock，
+                # 评测线程可以照常结束任务、收集结果。等待时间记入提交的 core_wait
+                waited = time.monotonic()
+                try:
+                    core = acquire_core(self.cpu)
+                except Exception:
+                    # 锁文件无法打开等：任务没有开始评测，撤销计数并放回队列，否则排空时会一直等待
+                    logger.exception(f"Worker {self.name} failed to acquire core {self.cpu}")
+                    with self._lock:
+                        self._in_flight -= 1
+                        if self._in_flight == 0:
+                            self._idle.set()
+                    self._release([task])
+                    continue
+                core_wait = int((time.monotonic() - waited) * 1000)
+                with self._lock:
+                    self._core = core
+            executor.submit(self._judge, task, core_wait)
+
+    def _claim(self, executor):
+        """按空闲并发数认领任务并提交到线程池，返回认领数量"""
+        with self._lock:
+            free = self.concurrency - self._in_flight
+        if free <= 0:
+            return 0
+        close_old_connections()
+        tasks = claim_tasks(self.name, limit=free)
+        self._start(executor, tasks)
+        return len(tasks)
+
+    def _receive(self, executor):
+        """
+        进程池模式：告诉进程池空闲并发数，等待分配的任务或评测结果
+
+        最多等待 poll_interval 秒；收到 None（队列已空）时返回 False。
+        """
+        with self._lock:
+            free = self.concurrency - self._in_flight
+        if free > 0 and free != self._announced:
+            self.dispatcher.send(free)
+            self._announced = free
+        ready = wait([self.dispatcher, self._wakeup[0]], timeout=self.poll_interval)
+        if self._wakeup[0] in ready:
+            os.read(self._wakeup[0], 4096)
+        if self.dispatcher not in ready:
+            return True
+        try:
+            task_ids = self.dispatcher.recv()
+        except EOFError:
+            # 进程池已经退出
+            return False
+        self._announced = 0
+        if task_ids is None:
+            return False
+        close_old_connections()
+        self._start(executor, start_tasks(self.name, task_ids))
+        return True
+
+    def run_once(self):
+        """认领并评测一批任务（最多 concurrency 个），队列为空时返回 False"""
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='judge') as executor:
+            claimed = bool(self._claim(executor))
+        self._flush()
+        return claimed
+
+    def run(self, exit_when_empty=False):
+        logger.info(f"Judge worker {self.name} started")
+        self._write_heartbeat()
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(heartbeat_stop,), daemon=True)
+        heartbeat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='judge') as executor:
+                while not self.stopping:
+                    self._flush()
+                    if self.dispatcher is not None:
+                        if not self._receive(executor):
+                            break
+                        continue
+                    if self._claim(executor):
+                        continue
+                    with self._lock:
+                        busy = self._in_flight > 0
+                    if exit_when_empty and not busy:
+                        break
+                    # 有评测结果时立即醒来写回
+                    self._result_ready.wait(self.poll_interval)
+                # 平滑排空：等待已认领的任务评测完成
+                self._idle.wait()
+            self._flush()
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+            self._write_heartbeat('stopped')
+            close_old_connections()
+        logger.info(f"Judge worker {self.name} stopped")
@@ -1,4 +1,11 @@
+from django import forms
 from django.contrib import admin
+from judge.languages import language_choices
+from judge.rejudge import create_rejudge_job
+from judge.task_queue import release_tasks
+from own_models.judge_models import JudgeNode, JudgeTask, JudgeWorkerHeartbeat, RejudgeJob
+from own_models.organize_competitions_models import Paper
+from own_models.problem_models import Problem
 from own_models.ranking_system_models import RankingSystem
 from own_models.learning_feedback_models import LearningFeedback, KnowledgePointPerformance
 
@@ -26,3 +33,82 @@ class KnowledgePointPerformanceAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'user__email', 'knowledge_point')
     readonly_fields = ('last_updated',)
 
+
+
+@admin.action(description='重新评测所选题目的全部提交')
+def rejudge_problems(modeladmin, request, queryset):
+    for problem in queryset:
+        job = create_rejudge_job(problem=problem, created_by=request.user)
+        modeladmin.message_user(request, f"已创建重新评测 {job.id}：{problem.title}，共 {job.total} 条提交")
+
+
+@admin.action(description='重新评测所选试卷的全部提交')
+def rejudge_papers(modeladmin, request, queryset):
+    for paper in queryset:
+        job = create_rejudge_job(paper=paper, created_by=request.user)
+        modeladmin.message_user(request, f"已创建重新评测 {job.id}：{paper.name}，共 {job.total} 条提交")
+
+
+@admin.register(Problem)
+class ProblemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'difficulty', 'submission_count', 'accepted_count', 'test_data_version')
+    search_fields = ('title',)
+    actions = [rejudge_problems]
+
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        # 模型字段不设 choices，下拉列表在打开页面时取自评测语言注册表
+        if db_field.name == 'checker_language':
+            kwargs['widget'] = forms.Select(choices=language_choices())
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
+
+
+@admin.register(Paper)
+class PaperAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'competition', 'created_at')
+    search_fields = ('name',)
+    actions = [rejudge_papers]
+
+
+@admin.action(description='停止继续入队')
+def cancel_rejudge_jobs(modeladmin, request, queryset):
+    queryset.filter(status='running').update(status='cancelled')
+
+
+@admin.register(RejudgeJob)
+class RejudgeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'problem', 'paper_id', 'status', 'enqueued', 'total', 'rate_per_minute',
+                    'created_by', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('total', 'enqueued', 'last_submission_id', 'last_advanced_at', 'judged_at', 'finalized_user_id',
+                       'created_at', 'finished_at')
+    actions = [cancel_rejudge_jobs]
+
+
+@admin.action(description='放回队列（计入重试次数）')
+def release_judge_tasks(modeladmin, request, queryset):
+    requeued, failed = release_tasks(list(queryset.filter(status='running')))
+    modeladmin.message_user(request, f'重新入队 {requeued} 个任务，放弃 {failed} 个')
+
+
+@admin.register(JudgeTask)
+class JudgeTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'submission', 'trial_run', 'status', 'priority', 'worker', 'attempts', 'created_at',
+                    'claimed_at')
+    list_filter = ('status', 'priority')
+    readonly_fields = ('submission', 'trial_run', 'worker', 'attempts', 'virtual_time', 'rejudge_job', 'created_at',
+                       'claimed_at')
+    actions = [release_judge_tasks]
+
+
+@admin.register(JudgeWorkerHeartbeat)
+class JudgeWorkerHeartbeatAdmin(admin.ModelAdmin):
+    list_display = ('name', 'node', 'hostname', 'pid', 'cpu', 'status', 'tasks_done', 'expected_cache_hits',
+                    'expected_cache_misses', 'started_at', 'last_heartbeat')
+    list_filter = ('status', 'node', 'hostname')
+
+
+@admin.register(JudgeNode)
+class JudgeNodeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'hostname', 'cpu_count', 'processes', 'concurrency', 'status', 'claim_batches',
+                    'tasks_claimed', 'started_at', 'last_heartbeat')
+    list_filter = ('status',)
@@ -0,0 +1,217 @@
+# _*_ coding:utf-8 _*_
+from __future__ import unicode_literals
+from django.db import models
+from .custom_user_models import CustomUser
+from .problem_models import Problem
+from .student_practice import Submission
+
+class TrialRun(models.Model):
+    """
+    试运行
+    学生用样例或自定义输入运行代码，不创建提交记录；以最高优先级的评测任务交给评测进程运行，
+    结果写回这里，页面取走结果后删除，没有被取走的记录过期后由评测节点清理
+    """
+    class Meta:
+        db_table = "own_models_trial_run"
+        verbose_name = "试运行"
+        verbose_name_plural = "试运行"
+    
+    STATUS_CHOICES = (
+        ('pending', '运行中'),
+        ('finished', '已完成'),
+    )
+    
+    # 运行内容
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="trial_runs", verbose_name="用户")
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name="trial_runs", verbose_name="题目")
+    language = models.CharField("编程语言", max_length=20)
+    code = models.TextField("代码")
+    # 为 NULL 时使用题目样例并与样例输出比对
+    custom_input = models.TextField("自定义输入", null=True, blank=True)
+    
+    # 结果，见 judge.trial_run.run_trial
+    status = models.CharField("状态", max_length=10, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField("运行结果", default=dict, blank=True)
+    
+    # 元数据
+    created_at = models.DateTimeField("创建时间", auto_now_add=True, db_index=True)
+    finished_at = models.DateTimeField("完成时间", null=True, blank=True)
+    
+    def __str__(self):
+        return f"试运行 {self.id} - 题目 {self.problem_id} - {self.get_status_display()}"
+
+
+class JudgeTask(models.Model):
+    """
+    评测队列
+    每条待评测的提交或试运行对应一个任务，评测进程从这里认领任务，评测完成后删除
+    认领顺序：先按优先级（试运行 > 比赛 > 练习 > 重新评测），同一优先级内按虚拟时间在用户之间轮转
+    """
+    class Meta:
+        db_table = "own_models_judge_task"
+        verbose_name = "评测任务"
+        verbose_name_plural = "评测任务"
+        indexes = [
+            models.Index(fields=['status', 'id'], name='judge_task_status_idx'),
+            models.Index(fields=['status', 'priority', 'virtual_time', 'id'], name='judge_task_schedule_idx'),
+        ]
+    
+    STATUS_CHOICES = (
+        ('queued', '排队中'),
+        ('running', '评测中'),
+    )
+    
+    PRIORITY_TRIAL = 0
+    PRIORITY_CONTEST = 1
+    PRIORITY_PRACTICE = 2
+    PRIORITY_REJUDGE = 3
+    PRIORITY_CHOICES = (
+        (PRIORITY_TRIAL, '试运行'),
+        (PRIORITY_CONTEST, '比赛'),
+        (PRIORITY_PRACTICE, '练习'),
+        (PRIORITY_REJUDGE, '重新评测'),
+    )
+    
+    # 关联信息：提交记录和试运行二者有且只有一个
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name="judge_task", verbose_name="提交记录")
+    trial_run = models.OneToOneField(TrialRun, on_delete=models.CASCADE, null=True, blank=True,
+                                     related_name="judge_task", verbose_name="试运行")
+    
+    # 队列状态
+    status = models.CharField("状态", max_length=10, choices=STATUS_CHOICES, default='queued')
+    worker = models.CharField("评测进程", max_length=100, blank=True, default='')
+    # 开始评测的次数，认领后还没交给评测进程就被放回队列的不计入
+    attempts = models.IntegerField("评测次数", default=0)
+    
+    # 调度
+    priority = models.PositiveSmallIntegerField("优先级", choices=PRIORITY_CHOICES, default=PRIORITY_PRACTICE)
+    # 同一优先级内的公平排队：同一用户的任务虚拟时间依次递增，其他用户的任务插在它们之间
+    virtual_time = models.BigIntegerField("虚拟时间", default=0)
+    # 批量重新评测产生的任务，题目计数和学生统计在整个重新评测结束时统一更新
+    rejudge_job = models.ForeignKey('RejudgeJob', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name="tasks", verbose_name="重新评测")
+    
+    # 元数据
+    created_at = models.DateTimeField("入队时间", auto_now_add=True)
+    claimed_at = models.DateTimeField("认领时间", null=True, blank=True)
+    
+    def __str__(self):
+        target = f"提交 {self.submission_id}" if self.submission_id else f"试运行 {self.trial_run_id}"
+        return f"评测任务 {self.id} - {target} - {self.get_status_display()}"
+
+
+class JudgeWorkerHeartbeat(models.Model):
+    """
+    评测进程心跳
+    每个评测进程定期更新 last_heartbeat，心跳过期的进程认领的任务会被重新入队
+    """
+    class Meta:
+        db_table = "own_models_judge_worker_heartbeat"
+        verbose_name = "评测进程心跳"
+        verbose_name_plural = "评测进程心跳"
+    
+    STATUS_CHOICES = (
+        ('running', '运行中'),
+        ('draining', '停止中'),
+        ('stopped', '已停止'),
+    )
+    
+    # 进程信息
+    name = models.CharField("评测进程", max_length=100, unique=True)
+    node = models.CharField("评测节点", max_length=100, blank=True, default='', db_index=True)
+    hostname = models.CharField("主机名", max_length=100)
+    pid = models.IntegerField("进程号")
+    cpu = models.IntegerField("绑定CPU", null=True, blank=True)
+    concurrency = models.IntegerField("并发数", default=1)
+    
+    # 运行状态
+    status = models.CharField("状态", max_length=10, choices=STATUS_CHOICES, default='running')
+    tasks_done = models.IntegerField("已评测数", default=0)
+    # 进程启动以来规范化标准答案缓存的命中和未命中次数，见 judge.checker.ExpectedOutputCache
+    expected_cache_hits = models.BigIntegerField("答案缓存命中", default=0)
+    expected_cache_misses = models.BigIntegerField("答案缓存未命中", default=0)
+    started_at = models.DateTimeField("启动时间", auto_now_add=True)
+    last_heartbeat = models.DateTimeField("最后心跳", db_index=True)
+    
+    def __str__(self):
+        return f"{self.name} - {self.get_status_display()}"
+
+
+class JudgeNode(models.Model):
+    """
+    评测节点
+    每台运行评测进程池的机器启动时注册一条记录，由进程池的监督者定期更新心跳；
+    节点之间不共享任何状态，只通过评测队列协作，增加评测能力只需要在新机器上启动进程池
+    """
+    class Meta:
+        db_table = "own_models_judge_node"
+        verbose_name = "评测节点"
+        verbose_name_plural = "评测节点"
+    
+    STATUS_CHOICES = (
+        ('running', '运行中'),
+        ('draining', '停止中'),
+        ('stopped', '已停止'),
+    )
+    
+    # 节点信息
+    name = models.CharField("节点名称", max_length=100, unique=True)
+    hostname = models.CharField("主机名", max_length=100)
+    pid = models.IntegerField("监督进程号")
+    cpu_count = models.IntegerField("CPU核数")
+    processes = models.IntegerField("评测进程数")
+    concurrency = models.IntegerField("每进程并发数", default=1)
+    
+    # 运行状态
+    status = models.CharField("状态", max_length=10, choices=STATUS_CHOICES, default='running')
+    # 本次启动以来批量认领的次数和认领到的任务数
+    claim_batches = models.BigIntegerField("认领批次", default=0)
+    tasks_claimed = models.BigIntegerField("认领任务数", default=0)
+    started_at = models.DateTimeField("启动时间")
+    last_heartbeat = models.DateTimeField("最后心跳", db_index=True)
+    
+    def __str__(self):
+        return f"{self.name} - {self.get_status_display()}"
+
+
+class RejudgeJob(models.Model):
+    """
+    批量重新评测
+    按提交 ID 顺序分批把一道题目或一份试卷的提交放入低优先级队列，入队速度受限，
+    进度（最后入队的提交 ID）保存在这里，中断后可以继续
+    """
+    class Meta:
+        db_table = "own_models_rejudge_job"
+        verbose_name = "重新评测"
+        verbose_name_plural = "重新评测"
+    
+    STATUS_CHOICES = (
+        ('running', '进行中'),
+        ('finished', '已完成'),
+        ('cancelled', '已取消'),
+    )
+    
+    # 范围：一道题目的所有提交，或一份试卷中所有题目被分配学生的提交
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, null=True, blank=True, related_name="rejudge_jobs", verbose_name="题目")
+    paper_id = models.IntegerField("试卷ID", null=True, blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="rejudge_jobs", verbose_name="创建者")
+    
+    # 进度
+    status = models.CharField("状态", max_length=10, choices=STATUS_CHOICES, default='running')
+    rate_per_minute = models.IntegerField("每分钟入队数", default=600)
+    total = models.IntegerField("提交总数", default=0)
+    enqueued = models.IntegerField("已入队数", default=0)
+    last_submission_id = models.IntegerField("最后入队的提交ID", default=0)
+    last_advanced_at = models.DateTimeField("最后入队时间", null=True, blank=True)
+    # 评测全部完成的时间；之后按用户 ID 分批更新统计，finalized_user_id 为已更新到的用户 ID
+    judged_at = models.DateTimeField("评测完成时间", null=True, blank=True)
+    finalized_user_id = models.IntegerField("已更新统计的用户ID", default=0)
+    
+    # 元数据
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    finished_at = models.DateTimeField("完成时间", null=True, blank=True)
+    
+    def __str__(self):
+        scope = f"题目 {self.problem_id}" if self.problem_id else f"试卷 {self.paper_id}"
+        return f"重新评测 {self.id} - {scope} - {self.enqueued}/{self.total} - {self.get_status_display()}"
@@ -0,0 +1,110 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from judge.benchmark import BenchmarkError, run_benchmark
+
+
+class Command(BaseCommand):
+    help = ('评测基准测试：生成各语言的通过/答案错误/超时/超内存/运行错误/编译错误提交并用评测进程池评测，'
+            '报告吞吐量、各阶段耗时和 CPU 效率（需要独占评测队列，结束后删除生成的数据）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--languages', nargs='+', default=None, help='只测试这些语言，默认为全部可用语言')
+        parser.add_argument('--per-kind', type=int, default=3, help='每种语言每类提交的数量，默认 3')
+        parser.add_argument('--cases', type=int, default=5, help='测试用例数，默认 5')
+        parser.add_argument('--case-size', type=int, default=1000, help='每个测试用例的整数个数，默认 1000')
+        parser.add_argument('--time-limit', type=int, default=1000, help='题目时间限制(ms)，默认 1000')
+        parser.add_argument('--memory-limit', type=int, default=128, help='题目内存限制(MB)，默认 128')
+        parser.add_argument('--processes', type=int, default=None, help='评测进程数，默认为可用 CPU 核数')
+        parser.add_argument('--concurrency', type=int, default=1, help='每个评测进程同时评测的任务数，默认 1')
+        parser.add_argument('--no-pin', action='store_true', help='不把评测进程绑定到固定 CPU 核')
+        parser.add_argument('--seed', type=int, default=1, help='测试数据的随机种子，默认 1')
+        parser.add_argument('--same-code', action='store_true',
+                            help='同一语言同一类型的提交使用相同代码（测量编译缓存和评测结果复用命中时的性能）')
+        parser.add_argument('--keep', action='store_true', help='保留生成的用户、题目和提交')
+        parser.add_argument('--save', metavar='PATH', help='把结果保存为 JSON 文件')
+        parser.add_argument('--compare', metavar='PATH', help='与之前保存的结果比较')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"无法读取 {options['compare']}：{e}")
+        try:
+            report = run_benchmark(
+                languages=options['languages'], per_kind=options['per_kind'], cases=options['cases'],
+                case_size=options['case_size'], processes=options['processes'], concurrency=options['concurrency'],
+                pin_cpus=not options['no_pin'], seed=options['seed'], time_limit=options['time_limit'],
+                memory_limit=options['memory_limit'], same_code=options['same_code'], keep=options['keep'],
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        self.report(report, baseline)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"结果已保存到 {options['save']}")
+
+    def change(self, current, previous, lower_is_better=True):
+        """与基线相比的变化，变好显示为绿色，变差显示为红色"""
+        if previous is None:
+            return ''
+        if not previous:
+            return f'{"":>9}'
+        ratio = (current - previous) / previous
+        text = f'{ratio:>+9.1%}'
+        if abs(ratio) < 0.05:
+            return text
+        better = ratio < 0 if lower_is_better else ratio > 0
+        return self.style.SUCCESS(text) if better else self.style.ERROR(text)
+
+    def report(self, report, baseline):
+        base = baseline or {}
+        self.stdout.write(self.style.SUCCESS(
+            f"评测 {report['submissions']} 条提交（{report['processes']} 个评测进程，每进程并发 {report['concurrency']}）"
+        ))
+        for key, label, lower_is_better in (
+            ('wall_s', '总耗时s', True),
+            ('per_second', '每秒评测数', False),
+            ('cpu_s', 'CPU 时间s', True),
+            ('cpu_utilization', 'CPU 利用率', False),
+            ('program_cpu_share', '被评测程序 CPU 占比', False),
+            ('cpu_ms_per_submission', '每条提交 CPU ms', True),
+        ):
+            self.stdout.write(f"{label:<20}{report[key]:>12}"
+                              f"{self.change(report[key], base.get(key), lower_is_better) if baseline else ''}")
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('各阶段耗时(ms)'))
+        self.stdout.write(f"{'阶段':<8}{'平均':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'最大':>8}"
+                          f"{'p50变化':>10}{'p95变化':>10}" if baseline else
+                          f"{'阶段':<8}{'平均':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'最大':>8}")
+        previous = {row['stage']: row for row in base.get('stages', [])}
+        for row in report['stages']:
+            line = (f"{row['name']:<8}{row['avg_ms']:>8}{row['p50_ms']:>8}{row['p95_ms']:>8}"
+                    f"{row['p99_ms']:>8}{row['max_ms']:>8}")
+            if baseline:
+                old = previous.get(row['stage'], {})
+                line += self.change(row['p50_ms'], old.get('p50_ms')) + self.change(row['p95_ms'], old.get('p95_ms'))
+            self.stdout.write(line)
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('各语言'))
+        self.stdout.write(f"{'语言':<12}{'评测数':>8}{'平均评测ms':>12}{'平均编译ms':>12}{'结果不符':>10}")
+        for row in report['languages']:
+            line = (f"{row['language']:<12}{row['judged']:>8}{row['avg_judge_ms']:>12}"
+                    f"{row['avg_compile_ms']:>12}{row['unexpected']:>10}")
+            self.stdout.write(line if not row['unexpected'] else self.style.WARNING(line))
+        for language, reason in report['skipped'].items():
+            self.stdout.write(self.style.WARNING(f"{language:<12}跳过：{reason}"))
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('各类提交的评测结果'))
+        for row in report['kinds']:
+            statuses = ', '.join(f'{status} {count}' for status, count in sorted(row['statuses'].items()))
+            line = f"{row['name']:<10}{row['judged']:>6}  {statuses}"
+            self.stdout.write(line if not row['unexpected'] else self.style.WARNING(f"{line}（{row['unexpected']} 条不符）"))
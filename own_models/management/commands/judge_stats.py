@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from judge.stats import language_throughput, node_stats, queue_stats, stage_stats, worker_stats
+from own_models.student_practice import Submission
+
+
+class Command(BaseCommand):
+    help = '显示评测统计：各优先级的队列长度与等待时间、各阶段耗时、各评测节点和评测进程的心跳、各语言的评测吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60, help='统计最近多少分钟，默认 60')
+
+    def handle(self, *args, **options):
+        minutes = options['minutes']
+        self.stdout.write(self.style.SUCCESS(f'评测队列（等待时间统计最近 {minutes} 分钟）'))
+        self.stdout.write(f"{'优先级':<10}{'排队':>6}{'评测中':>8}{'重试':>6}{'最久等待s':>10}{'最久评测s':>10}{'已评测':>8}"
+                          f"{'等待p50ms':>11}{'等待p95ms':>11}{'出结果p95ms':>13}")
+        for row in queue_stats(minutes):
+            self.stdout.write(
+                f"{row['name']:<10}{row['queued']:>6}{row['running']:>8}{row['retried']:>6}"
+                f"{row['oldest_wait_s']:>10}{row['oldest_running_s']:>10}{row['judged']:>8}"
+                f"{row['wait_p50_ms']:>11}{row['wait_p95_ms']:>11}{row['latency_p95_ms']:>13}"
+            )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'最近 {minutes} 分钟各阶段耗时'))
+        recent = Submission.objects.filter(updated_at__gte=timezone.now() - timedelta(minutes=minutes))
+        self.stdout.write(f"{'阶段':<8}{'样本':>8}{'平均ms':>10}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}{'最大ms':>10}")
+        for row in stage_stats(recent):
+            self.stdout.write(
+                f"{row['name']:<8}{row['count']:>8}{row['avg_ms']:>10}{row['p50_ms']:>10}"
+                f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}"
+            )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('评测节点'))
+        self.stdout.write(f"{'评测节点':<24}{'状态':>10}{'核数':>6}{'进程':>6}{'存活':>6}{'评测中':>8}{'认领批次':>10}"
+                          f"{'认领任务':>10}{'平均批大小':>12}{'心跳s':>8}")
+        for row in node_stats():
+            line = (f"{row['name']:<24}{row['status']:>10}{row['cpu_count']:>6}{row['processes']:>6}{row['workers']:>6}"
+                    f"{row['running']:>8}{row['claim_batches']:>10}{row['tasks_claimed']:>10}{row['batch_size']:>12.1f}"
+                    f"{row['heartbeat_age_s']:>8}")
+            self.stdout.write(line if row['alive'] or row['status'] == 'stopped' else self.style.WARNING(line))
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('评测进程'))
+        self.stdout.write(f"{'评测进程':<36}{'状态':>10}{'CPU':>6}{'评测中':>8}{'已评测':>8}{'心跳s':>8}{'答案缓存命中率':>16}")
+        for row in worker_stats():
+            line = (f"{row['name']:<36}{row['status']:>10}{'' if row['cpu'] is None else row['cpu']:>6}"
+                    f"{row['running']:>8}{row['tasks_done']:>8}{row['heartbeat_age_s']:>8}"
+                    f"{row['expected_cache_hit_rate']:>16.1%}")
+            self.stdout.write(line if row['alive'] or row['status'] == 'stopped' else self.style.WARNING(line))
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'最近 {minutes} 分钟各语言评测吞吐量'))
+        self.stdout.write(f"{'语言':<12}{'评测数':>8}{'每分钟':>10}{'平均耗时ms':>12}{'最大耗时ms':>12}{'每核秒':>10}")
+        for row in language_throughput(minutes):
+            self.stdout.write(
+                f"{row['name']:<12}{row['judged']:>8}{row['per_minute']:>10.2f}"
+                f"{row['avg_judge_ms']:>12}{row['max_judge_ms']:>12}{row['per_core_second']:>10.2f}"
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from judge.task_queue import reap_stuck_submissions
+
+
+class Command(BaseCommand):
+    help = '回收卡住的提交：重新入队失联评测进程和超时的任务，为没有评测任务的 pending/judging 提交补建任务'
+
+    def handle(self, *args, **options):
+        counts = reap_stuck_submissions()
+        self.stdout.write(self.style.SUCCESS(
+            f"重新入队 {counts['requeued']} 个任务，放弃 {counts['failed']} 个（超过重试次数），"
+            f"补建 {counts['orphans']} 个任务"
+        ))
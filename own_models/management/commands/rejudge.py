@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from judge.rejudge import advance_rejudge_jobs, cancel_rejudge_job, create_rejudge_job, finalize_rejudge_jobs
+from own_models.judge_models import RejudgeJob
+from own_models.organize_competitions_models import Paper
+from own_models.problem_models import Problem
+
+
+class Command(BaseCommand):
+    help = '批量重新评测一道题目或一份试卷的全部提交（低优先级、限速分批入队，可中断后继续）'
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--problem', type=int, help='题目 ID')
+        scope.add_argument('--paper', type=int, help='试卷 ID')
+        scope.add_argument('--list', action='store_true', help='列出未完成的重新评测')
+        scope.add_argument('--cancel', type=int, metavar='JOB_ID', help='停止继续入队，已入队的任务照常评测')
+        parser.add_argument('--rate', type=int, default=None, help='每分钟最多入队的提交数')
+        parser.add_argument('--wait', action='store_true',
+                            help='在前台推进直到完成（没有运行评测进程池时使用）')
+        parser.add_argument('--interval', type=float, default=5, help='--wait 时的推进间隔秒数，默认 5')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for job in RejudgeJob.objects.filter(finished_at__isnull=True).order_by('id'):
+                self.stdout.write(str(job))
+            return
+        if options['cancel']:
+            if not cancel_rejudge_job(options['cancel']):
+                raise CommandError(f"重新评测 {options['cancel']} 不存在或已停止")
+            self.stdout.write(self.style.SUCCESS(f"重新评测 {options['cancel']} 已停止入队"))
+            return
+
+        try:
+            if options['problem']:
+                job = create_rejudge_job(problem=Problem.objects.get(id=options['problem']),
+                                         rate_per_minute=options['rate'])
+            else:
+                job = create_rejudge_job(paper=Paper.objects.get(id=options['paper']),
+                                         rate_per_minute=options['rate'])
+        except (Problem.DoesNotExist, Paper.DoesNotExist):
+            raise CommandError('题目或试卷不存在')
+        self.stdout.write(self.style.SUCCESS(
+            f'已创建重新评测 {job.id}：共 {job.total} 条提交，每分钟最多入队 {job.rate_per_minute} 条'
+        ))
+        if not options['wait']:
+            return
+
+        while True:
+            advance_rejudge_jobs()
+            finalize_rejudge_jobs()
+            job.refresh_from_db()
+            self.stdout.write(f'{job.enqueued}/{job.total}')
+            if job.finished_at is not None:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'重新评测 {job.id} 已完成'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from judge.conf import judge_setting
+from judge.cores import available_cpus
+from judge.pool import WorkerPool
+
+
+class Command(BaseCommand):
+    help = '启动评测节点：注册节点并运行评测进程池，按空闲并发批量认领并评测提交（SIGTERM 平滑退出）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='评测进程数，默认为可用 CPU 核数')
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='每个评测进程同时评测的任务数')
+        parser.add_argument('--no-pin', action='store_true', help='不把评测进程绑定到固定 CPU 核')
+        parser.add_argument('--name', default=None, help='评测节点名称，默认为主机名；同一台机器上运行多个节点时必须不同')
+        parser.add_argument('--once', action='store_true', help='队列清空后退出')
+
+    def handle(self, *args, **options):
+        pool = WorkerPool(
+            processes=options['processes'],
+            concurrency=options['concurrency'] or judge_setting('JUDGE_WORKER_CONCURRENCY'),
+            pin_cpus=not options['no_pin'],
+            exit_when_empty=options['once'],
+            name_prefix=options['name'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'评测节点 {pool.name_prefix}：启动 {pool.processes} 个评测进程（可用 CPU {len(available_cpus())} 个，'
+            f'每进程并发 {pool.concurrency}）'
+        ))
+        pool.run()
+        self.stdout.write('评测进程池已退出')
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0008_customuser_is_staff"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="time_limit",
+            field=models.PositiveIntegerField(default=1000, verbose_name="时间限制(ms)"),
+        ),
+        migrations.AddField(
+            model_name="problem",
+            name="memory_limit",
+            field=models.PositiveIntegerField(default=256, verbose_name="内存限制(MB)"),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0009_problem_time_limit_memory_limit"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="submission",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "等待评测"),
+                    ("judging", "评测中"),
+                    ("accepted", "通过"),
+                    ("wrong_answer", "答案错误"),
+                    ("time_limit_exceeded", "超时"),
+                    ("memory_limit_exceeded", "内存超限"),
+                    ("runtime_error", "运行时错误"),
+                    ("compile_error", "编译错误"),
+                    ("system_error", "系统错误"),
+                ],
+                default="pending",
+                max_length=30,
+                verbose_name="状态",
+            ),
+        ),
+        migrations.CreateModel(
+            name="JudgeTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("queued", "排队中"), ("running", "评测中")],
+                        default="queued",
+                        max_length=10,
+                        verbose_name="状态",
+                    ),
+                ),
+                (
+                    "worker",
+                    models.CharField(
+                        blank=True, default="", max_length=100, verbose_name="评测进程"
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0, verbose_name="认领次数")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="入队时间"),
+                ),
+                (
+                    "claimed_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="认领时间"),
+                ),
+                (
+                    "submission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="judge_task",
+                        to="own_models.submission",
+                        verbose_name="提交记录",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "评测任务",
+                "verbose_name_plural": "评测任务",
+                "db_table": "own_models_judge_task",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="judge_task_status_idx"
+                    )
+                ],
+            },
+        ),
+    ]
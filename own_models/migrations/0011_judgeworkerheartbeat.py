@@ -0,0 +1,65 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0010_judgetask_submission_judging_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JudgeWorkerHeartbeat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=100, unique=True, verbose_name="评测进程"),
+                ),
+                ("hostname", models.CharField(max_length=100, verbose_name="主机名")),
+                ("pid", models.IntegerField(verbose_name="进程号")),
+                (
+                    "cpu",
+                    models.IntegerField(blank=True, null=True, verbose_name="绑定CPU"),
+                ),
+                ("concurrency", models.IntegerField(default=1, verbose_name="并发数")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "运行中"),
+                            ("draining", "停止中"),
+                            ("stopped", "已停止"),
+                        ],
+                        default="running",
+                        max_length=10,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("tasks_done", models.IntegerField(default=0, verbose_name="已评测数")),
+                (
+                    "started_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="启动时间"),
+                ),
+                (
+                    "last_heartbeat",
+                    models.DateTimeField(db_index=True, verbose_name="最后心跳"),
+                ),
+            ],
+            options={
+                "verbose_name": "评测进程心跳",
+                "verbose_name_plural": "评测进程心跳",
+                "db_table": "own_models_judge_worker_heartbeat",
+            },
+        ),
+    ]
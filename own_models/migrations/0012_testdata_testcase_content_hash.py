@@ -0,0 +1,99 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:20
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def move_test_data(apps, schema_editor):
+    """把测试用例的输入/期望输出移到按哈希去重的 TestData 表"""
+    TestCase = apps.get_model("own_models", "TestCase")
+    TestData = apps.get_model("own_models", "TestData")
+    for case in TestCase.objects.all().iterator():
+        for field, text in (("input", case.input_data), ("output", case.expected_output)):
+            content = (text or "").encode("utf-8")
+            sha256 = hashlib.sha256(content).hexdigest()
+            TestData.objects.get_or_create(
+                sha256=sha256, defaults={"size": len(content), "content": content}
+            )
+            setattr(case, f"{field}_hash", sha256)
+            setattr(case, f"{field}_size", len(content))
+        case.save(update_fields=["input_hash", "input_size", "output_hash", "output_size"])
+
+
+def restore_test_data(apps, schema_editor):
+    TestCase = apps.get_model("own_models", "TestCase")
+    TestData = apps.get_model("own_models", "TestData")
+    for case in TestCase.objects.all().iterator():
+        case.input_data = bytes(TestData.objects.get(sha256=case.input_hash).content).decode("utf-8")
+        case.expected_output = bytes(TestData.objects.get(sha256=case.output_hash).content).decode("utf-8")
+        case.save(update_fields=["input_data", "expected_output"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0011_judgeworkerheartbeat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TestData",
+            fields=[
+                (
+                    "sha256",
+                    models.CharField(
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="SHA-256",
+                    ),
+                ),
+                ("size", models.BigIntegerField(verbose_name="大小(字节)")),
+                ("content", models.BinaryField(verbose_name="内容")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "测试数据",
+                "verbose_name_plural": "测试数据",
+                "db_table": "own_models_test_data",
+            },
+        ),
+        migrations.AddField(
+            model_name="problem",
+            name="test_data_version",
+            field=models.PositiveIntegerField(default=0, verbose_name="测试数据版本"),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="input_hash",
+            field=models.CharField(default="", max_length=64, verbose_name="输入数据SHA-256"),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="input_size",
+            field=models.BigIntegerField(default=0, verbose_name="输入数据大小(字节)"),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="output_hash",
+            field=models.CharField(default="", max_length=64, verbose_name="期望输出SHA-256"),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="output_size",
+            field=models.BigIntegerField(default=0, verbose_name="期望输出大小(字节)"),
+        ),
+        migrations.RunPython(move_test_data, restore_test_data),
+        migrations.RemoveField(
+            model_name="testcase",
+            name="input_data",
+        ),
+        migrations.RemoveField(
+            model_name="testcase",
+            name="expected_output",
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0012_testdata_testcase_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="checker_mode",
+            field=models.CharField(
+                choices=[
+                    ("exact", "完全一致"),
+                    ("trailing_whitespace", "忽略行末空白"),
+                    ("tokens", "按单词比较"),
+                    ("float", "浮点数误差"),
+                ],
+                default="trailing_whitespace",
+                max_length=20,
+                verbose_name="输出比对方式",
+            ),
+        ),
+        migrations.AddField(
+            model_name="problem",
+            name="float_epsilon",
+            field=models.FloatField(
+                default=1e-06,
+                help_text="比对方式为浮点数误差时，允许的绝对或相对误差",
+                verbose_name="浮点数允许误差",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0013_problem_checker_mode_float_epsilon"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="judge_policy",
+            field=models.CharField(
+                choices=[
+                    ("stop_on_failure", "遇到未通过的测试用例即停止"),
+                    ("run_all", "运行全部测试用例"),
+                ],
+                default="stop_on_failure",
+                help_text="试卷中的题目对已分配该试卷的学生始终运行全部测试用例以便给部分分",
+                max_length=20,
+                verbose_name="评测策略",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="testcaseresult",
+            name="status",
+            field=models.CharField(
+                choices=[("passed", "通过"), ("failed", "失败"), ("skipped", "跳过")],
+                max_length=10,
+                verbose_name="状态",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0014_problem_judge_policy_testcaseresult_skipped"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="judge_key",
+            field=models.CharField(blank=True, db_index=True, default="", max_length=64, verbose_name="评测键"),
+        ),
+    ]
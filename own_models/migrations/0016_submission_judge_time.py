@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0015_submission_judge_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="judge_time",
+            field=models.IntegerField(default=0, verbose_name="评测耗时(ms)"),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0016_submission_judge_time"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="judgetask",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "比赛"), (1, "重新评测"), (2, "练习")], default=2, verbose_name="优先级"
+            ),
+        ),
+        migrations.AddField(
+            model_name="judgetask",
+            name="virtual_time",
+            field=models.BigIntegerField(default=0, verbose_name="虚拟时间"),
+        ),
+        migrations.AddIndex(
+            model_name="judgetask",
+            index=models.Index(
+                fields=["status", "priority", "virtual_time", "id"], name="judge_task_schedule_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="judge_priority",
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name="评测优先级"),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="queue_wait",
+            field=models.IntegerField(default=0, verbose_name="排队时间(ms)"),
+        ),
+    ]
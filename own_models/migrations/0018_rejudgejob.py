@@ -0,0 +1,84 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0017_judgetask_priority_virtual_time"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="judgetask",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "比赛"), (2, "练习"), (3, "重新评测")], default=2, verbose_name="优先级"
+            ),
+        ),
+        migrations.CreateModel(
+            name="RejudgeJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("paper_id", models.IntegerField(blank=True, null=True, verbose_name="试卷ID")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("running", "进行中"), ("finished", "已完成"), ("cancelled", "已取消")],
+                        default="running",
+                        max_length=10,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("rate_per_minute", models.IntegerField(default=600, verbose_name="每分钟入队数")),
+                ("total", models.IntegerField(default=0, verbose_name="提交总数")),
+                ("enqueued", models.IntegerField(default=0, verbose_name="已入队数")),
+                ("last_submission_id", models.IntegerField(default=0, verbose_name="最后入队的提交ID")),
+                ("last_advanced_at", models.DateTimeField(blank=True, null=True, verbose_name="最后入队时间")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="创建时间")),
+                ("finished_at", models.DateTimeField(blank=True, null=True, verbose_name="完成时间")),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="rejudge_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="创建者",
+                    ),
+                ),
+                (
+                    "problem",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rejudge_jobs",
+                        to="own_models.problem",
+                        verbose_name="题目",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "重新评测",
+                "verbose_name_plural": "重新评测",
+                "db_table": "own_models_rejudge_job",
+            },
+        ),
+        migrations.AddField(
+            model_name="judgetask",
+            name="rejudge_job",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="tasks",
+                to="own_models.rejudgejob",
+                verbose_name="重新评测",
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0018_rejudgejob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="problem",
+            name="checker_mode",
+            field=models.CharField(
+                choices=[
+                    ("exact", "完全一致"),
+                    ("trailing_whitespace", "忽略行末空白"),
+                    ("tokens", "按单词比较"),
+                    ("float", "浮点数误差"),
+                    ("special", "特殊评测程序"),
+                ],
+                default="trailing_whitespace",
+                max_length=20,
+                verbose_name="输出比对方式",
+            ),
+        ),
+        migrations.AddField(
+            model_name="problem",
+            name="checker_code",
+            field=models.TextField(blank=True, default="", verbose_name="特殊评测程序代码"),
+        ),
+        migrations.AddField(
+            model_name="problem",
+            name="checker_language",
+            field=models.CharField(
+                choices=[
+                    ("python", "Python"),
+                    ("java", "Java"),
+                    ("cpp", "C++"),
+                    ("c", "C"),
+                    ("javascript", "JavaScript"),
+                ],
+                default="cpp",
+                max_length=20,
+                verbose_name="特殊评测程序语言",
+            ),
+        ),
+    ]
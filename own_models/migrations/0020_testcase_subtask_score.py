@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0019_problem_checker_code"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testcase",
+            name="subtask",
+            field=models.PositiveIntegerField(default=0, verbose_name="子任务"),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="score",
+            field=models.PositiveIntegerField(
+                default=0, help_text="题目的所有测试用例分值都为 0 时每个测试用例分值相同", verbose_name="分值"
+            ),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="score",
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="得分"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0020_testcase_subtask_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="answer_key",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="选择题填选项字母，如 ACD；填空题每行一个空，可接受的多个答案用 | 分隔；判断题填 对 或 错",
+                verbose_name="标准答案",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0021_problem_answer_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="submission",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "等待评测"),
+                    ("judging", "评测中"),
+                    ("accepted", "通过"),
+                    ("wrong_answer", "答案错误"),
+                    ("time_limit_exceeded", "超时"),
+                    ("memory_limit_exceeded", "内存超限"),
+                    ("runtime_error", "运行时错误"),
+                    ("output_limit_exceeded", "输出超限"),
+                    ("compile_error", "编译错误"),
+                    ("system_error", "系统错误"),
+                ],
+                default="pending",
+                max_length=30,
+                verbose_name="状态",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0022_submission_output_limit_exceeded"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="judgeworkerheartbeat",
+            name="expected_cache_hits",
+            field=models.BigIntegerField(default=0, verbose_name="答案缓存命中"),
+        ),
+        migrations.AddField(
+            model_name="judgeworkerheartbeat",
+            name="expected_cache_misses",
+            field=models.BigIntegerField(default=0, verbose_name="答案缓存未命中"),
+        ),
+    ]
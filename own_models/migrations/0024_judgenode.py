@@ -0,0 +1,48 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0023_judgeworkerheartbeat_expected_cache"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JudgeNode",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=100, unique=True, verbose_name="节点名称")),
+                ("hostname", models.CharField(max_length=100, verbose_name="主机名")),
+                ("pid", models.IntegerField(verbose_name="监督进程号")),
+                ("cpu_count", models.IntegerField(verbose_name="CPU核数")),
+                ("processes", models.IntegerField(verbose_name="评测进程数")),
+                ("concurrency", models.IntegerField(default=1, verbose_name="每进程并发数")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("running", "运行中"), ("draining", "停止中"), ("stopped", "已停止")],
+                        default="running",
+                        max_length=10,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("claim_batches", models.BigIntegerField(default=0, verbose_name="认领批次")),
+                ("tasks_claimed", models.BigIntegerField(default=0, verbose_name="认领任务数")),
+                ("started_at", models.DateTimeField(verbose_name="启动时间")),
+                ("last_heartbeat", models.DateTimeField(db_index=True, verbose_name="最后心跳")),
+            ],
+            options={
+                "verbose_name": "评测节点",
+                "verbose_name_plural": "评测节点",
+                "db_table": "own_models_judge_node",
+            },
+        ),
+        migrations.AddField(
+            model_name="judgeworkerheartbeat",
+            name="node",
+            field=models.CharField(blank=True, db_index=True, default="", max_length=100, verbose_name="评测节点"),
+        ),
+    ]
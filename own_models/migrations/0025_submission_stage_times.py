@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0024_judgenode"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="compile_time",
+            field=models.IntegerField(default=0, verbose_name="编译耗时(ms)"),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="run_time",
+            field=models.IntegerField(default=0, verbose_name="运行耗时(ms)"),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="check_time",
+            field=models.IntegerField(default=0, verbose_name="比对耗时(ms)"),
+        ),
+    ]
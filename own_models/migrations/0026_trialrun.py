@@ -0,0 +1,107 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def shift_contest_priority(apps, schema_editor):
+    """试运行使用优先级 0，比赛任务从 0 改为 1"""
+    JudgeTask = apps.get_model("own_models", "JudgeTask")
+    Submission = apps.get_model("own_models", "Submission")
+    JudgeTask.objects.filter(priority=0).update(priority=1)
+    Submission.objects.filter(judge_priority=0).update(judge_priority=1)
+
+
+def unshift_contest_priority(apps, schema_editor):
+    JudgeTask = apps.get_model("own_models", "JudgeTask")
+    Submission = apps.get_model("own_models", "Submission")
+    JudgeTask.objects.filter(priority=0).delete()
+    JudgeTask.objects.filter(priority=1).update(priority=0)
+    Submission.objects.filter(judge_priority=1).update(judge_priority=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0025_submission_stage_times"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrialRun",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("language", models.CharField(max_length=20, verbose_name="编程语言")),
+                ("code", models.TextField(verbose_name="代码")),
+                ("custom_input", models.TextField(blank=True, null=True, verbose_name="自定义输入")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("pending", "运行中"), ("finished", "已完成")],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("result", models.JSONField(blank=True, default=dict, verbose_name="运行结果")),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="创建时间")),
+                ("finished_at", models.DateTimeField(blank=True, null=True, verbose_name="完成时间")),
+                (
+                    "problem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trial_runs",
+                        to="own_models.problem",
+                        verbose_name="题目",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trial_runs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="用户",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "试运行",
+                "verbose_name_plural": "试运行",
+                "db_table": "own_models_trial_run",
+            },
+        ),
+        migrations.AlterField(
+            model_name="judgetask",
+            name="submission",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="judge_task",
+                to="own_models.submission",
+                verbose_name="提交记录",
+            ),
+        ),
+        migrations.AddField(
+            model_name="judgetask",
+            name="trial_run",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="judge_task",
+                to="own_models.trialrun",
+                verbose_name="试运行",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="judgetask",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "试运行"), (1, "比赛"), (2, "练习"), (3, "重新评测")], default=2, verbose_name="优先级"
+            ),
+        ),
+        migrations.RunPython(shift_contest_priority, unshift_contest_priority),
+    ]
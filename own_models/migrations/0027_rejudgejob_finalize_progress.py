@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0026_trialrun"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rejudgejob",
+            name="judged_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="评测完成时间"),
+        ),
+        migrations.AddField(
+            model_name="rejudgejob",
+            name="finalized_user_id",
+            field=models.IntegerField(default=0, verbose_name="已更新统计的用户ID"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0027_rejudgejob_finalize_progress"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="judgetask",
+            name="attempts",
+            field=models.IntegerField(default=0, verbose_name="评测次数"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0028_alter_judgetask_attempts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="core_wait",
+            field=models.IntegerField(default=0, verbose_name="等待核(ms)"),
+        ),
+    ]
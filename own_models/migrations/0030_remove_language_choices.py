@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("own_models", "0029_submission_core_wait"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="submission",
+            name="language",
+            field=models.CharField(max_length=20, verbose_name="编程语言"),
+        ),
+        migrations.AlterField(
+            model_name="problem",
+            name="checker_language",
+            field=models.CharField(default="cpp", max_length=20, verbose_name="特殊评测程序语言"),
+        ),
+    ]
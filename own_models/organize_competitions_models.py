@@ -39,6 +39,19 @@ class PaperAssignment(models.Model):
         else:
             return "未开始"
     
+    def update_completion_rate(self):
+        """按试卷中每道题的最高得分计算正确率，已完成的试卷只计完成前的提交"""
+        from .student_practice import Submission
+        from django.db.models import Max
+        
+        problem_ids = list(self.paper.problems.values_list('id', flat=True))
+        submissions = Submission.objects.filter(user_id=self.user_id, problem_id__in=problem_ids)
+        if self.is_completed and self.completed_at:
+            submissions = submissions.filter(created_at__lte=self.completed_at)
+        best_scores = submissions.values('problem_id').annotate(best=Max('score')).values_list('best', flat=True)
+        self.completion_rate = round(sum(best_scores) / len(problem_ids)) if problem_ids else 0
+        self.save(update_fields=['completion_rate'])
+    
     def get_progress_color(self):
         """获取进度条颜色"""
         if self.completion_progress >= 80:
@@ -1,6 +1,8 @@
 # _*_ coding:utf-8 _*_
 from __future__ import unicode_literals
+from django.core.exceptions import ValidationError
 from django.db import models
+from judge.languages import is_registered
 from .custom_user_models import CustomUser
 
 class Tag(models.Model):
@@ -43,6 +45,19 @@ class Problem(models.Model):
         (5, "简答题"),
     )
     
+    CHECKER_MODE_CHOICES = (
+        ('exact', "完全一致"),
+        ('trailing_whitespace', "忽略行末空白"),
+        ('tokens', "按单词比较"),
+        ('float', "浮点数误差"),
+        ('special', "特殊评测程序"),
+    )
+    
+    JUDGE_POLICY_CHOICES = (
+        ('stop_on_failure', "遇到未通过的测试用例即停止"),
+        ('run_all', "运行全部测试用例"),
+    )
+    
     # 题目基本信息
     title = models.CharField(("题目标题"), max_length=200)
     description = models.TextField(("题目描述"))
@@ -53,8 +68,26 @@ class Problem(models.Model):
     sample_input = models.TextField(("样例输入"), blank=True)
     sample_output = models.TextField(("样例输出"), blank=True)
     hint = models.TextField(("提示"), blank=True, null=True)
+    # 客观题（选择、填空、判断）的标准答案，格式见 judge.objective
+    answer_key = models.TextField(("标准答案"), blank=True, default='',
+                                  help_text="选择题填选项字母，如 ACD；填空题每行一个空，可接受的多个答案用 | 分隔；判断题填 对 或 错")
     difficulty = models.PositiveSmallIntegerField(("难度"), choices=DIFFICULTY_CHOICES, default=1)
     
+    # 评测限制
+    time_limit = models.PositiveIntegerField(("时间限制(ms)"), default=1000)
+    memory_limit = models.PositiveIntegerField(("内存限制(MB)"), default=256)
+    checker_mode = models.CharField(("输出比对方式"), max_length=20, choices=CHECKER_MODE_CHOICES, default='trailing_whitespace')
+    # 比对方式为特殊评测程序时使用，调用方式为 checker <输入文件> <程序输出> <标准答案>，
+    # 退出码 0 表示通过，1 或 2 表示答案错误（与 testlib 一致），输出的第一行作为评测信息
+    checker_code = models.TextField(("特殊评测程序代码"), blank=True, default='')
+    # 可选的语言由评测语言注册表决定（见 judge.languages），保存时在 clean 中校验
+    checker_language = models.CharField(("特殊评测程序语言"), max_length=20, default='cpp')
+    float_epsilon = models.FloatField(("浮点数允许误差"), default=1e-6, help_text="比对方式为浮点数误差时，允许的绝对或相对误差")
+    judge_policy = models.CharField(("评测策略"), max_length=20, choices=JUDGE_POLICY_CHOICES, default='stop_on_failure',
+                                    help_text="试卷中的题目对已分配该试卷的学生始终运行全部测试用例以便给部分分")
+    # 测试用例每次增删改都会递增，评测节点用它判断本地缓存的测试数据是否过期
+    test_data_version = models.PositiveIntegerField(("测试数据版本"), default=0)
+    
     # 题目元数据
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="created_problems", verbose_name=("创建者"))
     created_at = models.DateTimeField(("创建时间"), auto_now_add=True)
@@ -69,4 +102,14 @@ class Problem(models.Model):
     tags = models.ManyToManyField(Tag, verbose_name=("标签"), blank=True, related_name="problems")
     
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+    
+    def clean(self):
+        super().clean()
+        if self.checker_mode == 'special' and not is_registered(self.checker_language):
+            raise ValidationError({'checker_language': f'不支持的语言：{self.checker_language}'})
+        # judge.objective 导入了本模块，只能在这里导入
+        from judge.objective import OBJECTIVE_TYPES, is_valid_key, parse_key
+        if self.problem_type in OBJECTIVE_TYPES and not is_valid_key(self.problem_type,
+                                                                     parse_key(self.problem_type, self.answer_key)):
+            raise ValidationError({'answer_key': '客观题必须填写有效的标准答案'})
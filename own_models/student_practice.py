@@ -1,8 +1,15 @@
 # _*_ coding:utf-8 _*_
 from __future__ import unicode_literals
+import hashlib
+import os
+
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from .custom_user_models import CustomUser
 from .problem_models import Problem
+from judge.languages import language_name
 
 class Submission(models.Model):
     """
@@ -14,37 +21,46 @@ class Submission(models.Model):
         verbose_name_plural = "提交记录"
     
     STATUS_CHOICES = (
-        ('pending', '评测中'),
+        ('pending', '等待评测'),
+        ('judging', '评测中'),
         ('accepted', '通过'),
         ('wrong_answer', '答案错误'),
         ('time_limit_exceeded', '超时'),
         ('memory_limit_exceeded', '内存超限'),
         ('runtime_error', '运行时错误'),
+        ('output_limit_exceeded', '输出超限'),
         ('compile_error', '编译错误'),
         ('system_error', '系统错误'),
     )
     
-    LANGUAGE_CHOICES = (
-        ('python', 'Python'),
-        ('java', 'Java'),
-        ('cpp', 'C++'),
-        ('c', 'C'),
-        ('javascript', 'JavaScript'),
-    )
-    
     # 关联信息
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="submissions", verbose_name="提交用户")
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name="submissions", verbose_name="题目")
     
     # 提交内容
     code = models.TextField("代码")
-    language = models.CharField("编程语言", max_length=20, choices=LANGUAGE_CHOICES)
+    # 可选的语言由评测语言注册表决定（见 judge.languages），提交时在视图中校验
+    language = models.CharField("编程语言", max_length=20)
     
     # 评测结果
     status = models.CharField("状态", max_length=30, choices=STATUS_CHOICES, default='pending')
     execution_time = models.IntegerField("执行时间(ms)", default=0)
     memory_used = models.IntegerField("内存使用(KB)", default=0)
     error_message = models.TextField("错误信息", blank=True, null=True)
+    # 百分制得分，按子任务计算部分分，见 judge.engine._score
+    score = models.PositiveSmallIntegerField("得分", default=0)
+    # 评测键，相同评测键的提交直接复用评测结果
+    judge_key = models.CharField("评测键", max_length=64, blank=True, default='', db_index=True)
+    judge_time = models.IntegerField("评测耗时(ms)", default=0)
+    # 评测各阶段耗时，运行和比对为各测试用例之和，复用评测结果的提交为 0
+    compile_time = models.IntegerField("编译耗时(ms)", default=0)
+    run_time = models.IntegerField("运行耗时(ms)", default=0)
+    check_time = models.IntegerField("比对耗时(ms)", default=0)
+    # 评测进程开始评测前等待自己的核（正被其他提交借用）的时间
+    core_wait = models.IntegerField("等待核(ms)", default=0)
+    # 最近一次评测的队列优先级（见 JudgeTask.PRIORITY_CHOICES）和排队时间，用于统计各优先级的等待时间
+    judge_priority = models.PositiveSmallIntegerField("评测优先级", null=True, blank=True)
+    queue_wait = models.IntegerField("排队时间(ms)", default=0)
     
     # 元数据
     created_at = models.DateTimeField("提交时间", auto_now_add=True)
@@ -52,10 +68,56 @@ class Submission(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.problem.title} - {self.get_status_display()}"
+    
+    def get_language_display(self):
+        return language_name(self.language)
+    
+    @property
+    def is_judging(self):
+        """是否还在排队或评测中"""
+        return self.status in ('pending', 'judging')
+
+class TestData(models.Model):
+    """
+    测试数据内容，按 SHA-256 去重存储
+    测试用例行只保存哈希和大小，评测节点按哈希把内容缓存到本地磁盘
+    """
+    class Meta:
+        db_table = "own_models_test_data"
+        verbose_name = "测试数据"
+        verbose_name_plural = "测试数据"
+    
+    sha256 = models.CharField("SHA-256", max_length=64, primary_key=True)
+    size = models.BigIntegerField("大小(字节)")
+    content = models.BinaryField("内容")
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    
+    def __str__(self):
+        return f"测试数据 {self.sha256[:12]} ({self.size} 字节)"
+    
+    @staticmethod
+    def digest(content):
+        """返回 (SHA-256, 大小)，content 为 bytes"""
+        return hashlib.sha256(content).hexdigest(), len(content)
+    
+    @classmethod
+    def store(cls, content):
+        """保存内容（已存在则跳过），返回 (SHA-256, 大小)"""
+        sha256, size = cls.digest(content)
+        if not cls.objects.filter(sha256=sha256).exists():
+            cls.objects.get_or_create(sha256=sha256, defaults={'size': size, 'content': content})
+        return sha256, size
+    
+    @staticmethod
+    def relative_path(sha256):
+        """内容在本地存储目录中的相对路径"""
+        return os.path.join(sha256[:2], sha256)
 
 class TestCase(models.Model):
     """
     测试用例模型
+    输入和期望输出保存在 TestData 中，这里只记录哈希和大小；
+    input_data / expected_output 属性用于读写内容
     """
     class Meta:
         db_table = "own_models_testcase"
@@ -66,9 +128,15 @@ class TestCase(models.Model):
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name="test_cases", verbose_name="题目")
     
     # 测试用例内容
-    input_data = models.TextField("输入数据")
-    expected_output = models.TextField("期望输出")
+    input_hash = models.CharField("输入数据SHA-256", max_length=64, default='')
+    input_size = models.BigIntegerField("输入数据大小(字节)", default=0)
+    output_hash = models.CharField("期望输出SHA-256", max_length=64, default='')
+    output_size = models.BigIntegerField("期望输出大小(字节)", default=0)
     is_sample = models.BooleanField("是否为样例", default=False)
+    # 子任务：同一子任务的测试用例全部通过才得到它们的分值之和，评测时遇到第一个未通过的测试用例即跳过该子任务剩余的测试用例；
+    # 0 表示不属于任何子任务，单独计分
+    subtask = models.PositiveIntegerField("子任务", default=0)
+    score = models.PositiveIntegerField("分值", default=0, help_text="题目的所有测试用例分值都为 0 时每个测试用例分值相同")
     
     # 元数据
     created_at = models.DateTimeField("创建时间", auto_now_add=True)
@@ -76,6 +144,48 @@ class TestCase(models.Model):
     
     def __str__(self):
         return f"测试用例 {self.id} - 题目 {self.problem.id}"
+    
+    def _set_content(self, field, value):
+        content = value.encode('utf-8') if isinstance(value, str) else value
+        pending = self.__dict__.setdefault('_pending_content', {})
+        pending[field] = content
+        sha256, size = TestData.digest(content)
+        setattr(self, f'{field}_hash', sha256)
+        setattr(self, f'{field}_size', size)
+    
+    def _get_content(self, field):
+        pending = self.__dict__.get('_pending_content', {})
+        if field in pending:
+            content = pending[field]
+        else:
+            content = bytes(TestData.objects.get(sha256=getattr(self, f'{field}_hash')).content)
+        return content.decode('utf-8', errors='replace')
+    
+    @property
+    def input_data(self):
+        return self._get_content('input')
+    
+    @input_data.setter
+    def input_data(self, value):
+        self._set_content('input', value)
+    
+    @property
+    def expected_output(self):
+        return self._get_content('output')
+    
+    @expected_output.setter
+    def expected_output(self, value):
+        self._set_content('output', value)
+    
+    def save(self, *args, **kwargs):
+        for content in self.__dict__.pop('_pending_content', {}).values():
+            TestData.store(content)
+        super().save(*args, **kwargs)
+
+@receiver([post_save, post_delete], sender=TestCase)
+def bump_test_data_version(sender, instance, **kwargs):
+    """测试用例变化时递增题目的测试数据版本，评测节点据此判断本地缓存是否过期"""
+    Problem.objects.filter(id=instance.problem_id).update(test_data_version=F('test_data_version') + 1)
 
 class TestCaseResult(models.Model):
     """
@@ -89,6 +199,7 @@ class TestCaseResult(models.Model):
     STATUS_CHOICES = (
         ('passed', '通过'),
         ('failed', '失败'),
+        ('skipped', '跳过'),
     )
     
     # 关联信息
@@ -137,38 +248,23 @@ class StudentStatistics(models.Model):
         return f"{self.user.username} 的统计数据"
     
     def update_statistics(self):
-        """更新统计数据"""
+        """更新统计数据（一次聚合查询）"""
         from django.db.models import Count, Q
         
-        # 获取用户的所有提交
-        submissions = Submission.objects.filter(user=self.user)
-        
-        # 更新提交统计
-        self.total_submissions = submissions.count()
-        self.accepted_submissions = submissions.filter(status='accepted').count()
-        
-        # 获取尝试过的题目和解决的题目
-        attempted_problems = submissions.values('problem').annotate(count=Count('problem')).count()
-        solved_problems = submissions.filter(status='accepted').values('problem').annotate(count=Count('problem')).count()
-        
-        self.total_problems_attempted = attempted_problems
-        self.total_problems_solved = solved_problems
-        
-        # 更新难度统计
-        self.easy_problems_solved = submissions.filter(
-            status='accepted', 
-            problem__difficulty=1  # 使用数字1代表简单
-        ).values('problem').annotate(count=Count('problem')).count()
-        
-        self.medium_problems_solved = submissions.filter(
-            status='accepted', 
-            problem__difficulty=2  # 使用数字2代表中等
-        ).values('problem').annotate(count=Count('problem')).count()
-        
-        self.hard_problems_solved = submissions.filter(
-            status='accepted', 
-            problem__difficulty=3  # 使用数字3代表困难
-        ).values('problem').annotate(count=Count('problem')).count()
+        accepted = Q(status='accepted')
+        counts = Submission.objects.filter(user_id=self.user_id).aggregate(
+            total_submissions=Count('id'),
+            accepted_submissions=Count('id', filter=accepted),
+            # 尝试过的题目和解决的题目
+            total_problems_attempted=Count('problem', distinct=True),
+            total_problems_solved=Count('problem', filter=accepted, distinct=True),
+            # 难度统计：1 简单，2 中等，3 困难
+            easy_problems_solved=Count('problem', filter=accepted & Q(problem__difficulty=1), distinct=True),
+            medium_problems_solved=Count('problem', filter=accepted & Q(problem__difficulty=2), distinct=True),
+            hard_problems_solved=Count('problem', filter=accepted & Q(problem__difficulty=3), distinct=True),
+        )
+        for field, value in counts.items():
+            setattr(self, field, value)
         
         # 保存更新
-        self.save()
\ No newline at end of file
+        self.save()
@@ -29,4 +29,7 @@ urlpatterns = [
     # 统计和管理
     path('statistics/', log_management_views.log_statistics, name='statistics'),
     path('clear/', log_management_views.clear_logs, name='clear_logs'),
+    
+    # 评测监控
+    path('judge/metrics/', log_management_views.judge_metrics, name='judge_metrics'),
 ]
\ No newline at end of file
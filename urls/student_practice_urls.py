@@ -1,7 +1,7 @@
 from django.urls import path
 from views.student_practice import (
-    student_problem_list, student_problem_detail, student_submit_solution,
-    student_submission_detail, student_statistics,code_editing
+    student_problem_list, student_problem_detail, student_submit_solution, student_run_code, student_run_result,
+    student_submission_events, student_submission_detail, student_statistics,code_editing
 )
 
 
@@ -11,6 +11,9 @@ urlpatterns = [
     path('problems/', student_problem_list, name='problem_list'),
     path('problem/<int:problem_id>/', student_problem_detail, name='problem_detail'),
     path('problem/<int:problem_id>/submit/', student_submit_solution, name='submit_solution'),
+    path('problem/<int:problem_id>/run/', student_run_code, name='run_code'),
+    path('problem/<int:problem_id>/run/<int:trial_id>/', student_run_result, name='run_result'),
+    path('problem/<int:problem_id>/events/', student_submission_events, name='submission_events'),
     path('submission/<int:submission_id>/', student_submission_detail, name='submission_detail'),
     path('statistics/', student_statistics, name='statistics'),
     # Code editing page
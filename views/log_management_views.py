@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from permission_system.decorators import admin_required
 from own_models.log_management_models import SystemLog, UserOperationLog, ErrorLog, LoginLog
 from own_models.custom_user_models import CustomUser
+from judge.stats import node_stats, queue_stats, worker_stats
 import json
 
 
@@ -460,4 +461,27 @@ def clear_logs(request):
             'msg': f'成功清理 {deleted_count} 条日志记录'
         })
     
-    return JsonResponse({'code': 1, 'msg': '请求方法错误'})
\ No newline at end of file
+    return JsonResponse({'code': 1, 'msg': '请求方法错误'})
+
+
+# judge_metrics 统计的最长时间窗口（分钟），统计会读取窗口内的全部提交
+JUDGE_METRICS_MAX_MINUTES = 24 * 60
+
+
+@admin_required
+def judge_metrics(request):
+    """评测队列、评测节点和评测进程状态接口，供监控系统采集；minutes 为统计窗口，不超过一天"""
+    try:
+        minutes = int(request.GET.get('minutes', 60))
+    except ValueError:
+        return JsonResponse({'code': 1, 'msg': 'minutes 必须是整数'}, status=400)
+    minutes = min(max(minutes, 1), JUDGE_METRICS_MAX_MINUTES)
+    return JsonResponse({
+        'code': 0,
+        'msg': '',
+        'data': {
+            'queue': queue_stats(minutes),
+            'nodes': node_stats(),
+            'workers': worker_stats(),
+        }
+    })
@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from own_models.organize_competitions_models import Competition, Paper, PaperAssignment
 from own_models.problem_models import Problem
+from judge.objective import OBJECTIVE_TYPES, grade_answers
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
@@ -93,10 +94,18 @@ def student_paper_detail(request, paper_id):
     paper = get_object_or_404(Paper, id=paper_id)
     assignment = get_object_or_404(PaperAssignment, paper=paper, user=request.user)
     if request.method == 'POST':
-        # 这里只做简单标记完成，实际可扩展为保存答案等
+        # 客观题整卷一次评分，编程题和简答题的答案暂不在此处保存
+        answers = {}
+        for problem_id in paper.problems.filter(problem_type__in=OBJECTIVE_TYPES).values_list('id', flat=True):
+            answer = request.POST.get(f'answer_{problem_id}', '').strip()
+            if answer:
+                answers[problem_id] = answer
+        if answers:
+            grade_answers(request.user.id, answers)
         assignment.is_completed = True
         assignment.completed_at = timezone.now()
-        assignment.save()
+        # 只保存完成状态，不覆盖评分时 update_completion_rate 写入的正确率
+        assignment.save(update_fields=['is_completed', 'completed_at'])
         return redirect('organize_competitions:student_paper_list')
     return render(request, 'organize_competitions/student_paper_detail.html', {'paper': paper})
 
@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from own_models.models import Problem, CustomUser
@@ -150,6 +151,7 @@ def addProblem(request):
             sample_input = request.POST.get("sample_input", "")
             sample_output = request.POST.get("sample_output", "")
             hint = request.POST.get("hint", "")
+            answer_key = request.POST.get("answer_key", "")
             difficulty = int(request.POST.get("difficulty", 1))
             knowledge_point = request.POST.get("knowledge_point", "")
             is_active = request.POST.get("is_active") == "on"
@@ -169,14 +171,18 @@ def addProblem(request):
                     sample_input=sample_input,
                     sample_output=sample_output,
                     hint=hint,
+                    answer_key=answer_key,
                     difficulty=difficulty,
                     knowledge_point=knowledge_point,
                     is_active=is_active,
                     created_by=user
                 )
+                problem.clean()
                 problem.save()
             
             return JsonResponse({"success": True})
+        except ValidationError as e:
+            return JsonResponse({"success": False, "message": "；".join(e.messages)})
         except Exception as e:
             return JsonResponse({"success": False, "message": str(e)})
     
@@ -209,6 +215,7 @@ def editProblem(request, problem_id):
             sample_input = request.POST.get("sample_input", "")
             sample_output = request.POST.get("sample_output", "")
             hint = request.POST.get("hint", "")
+            answer_key = request.POST.get("answer_key", "")
             difficulty = int(request.POST.get("difficulty", 1))
             knowledge_point = request.POST.get("knowledge_point", "")
             is_active = request.POST.get("is_active") == "on"
@@ -223,15 +230,19 @@ def editProblem(request, problem_id):
                 problem.sample_input = sample_input
                 problem.sample_output = sample_output
                 problem.hint = hint
+                problem.answer_key = answer_key
                 problem.difficulty = difficulty
                 problem.knowledge_point = knowledge_point
                 problem.is_active = is_active
+                problem.clean()
                 problem.save()
                 
                 # 清除缓存
                 cache.delete(cache_key)
             
             return JsonResponse({"success": True})
+        except ValidationError as e:
+            return JsonResponse({"success": False, "message": "；".join(e.messages)})
         except Exception as e:
             return JsonResponse({"success": False, "message": str(e)})
     
@@ -253,6 +264,7 @@ def editProblem(request, problem_id):
         'sample_input': problem.sample_input,
         'sample_output': problem.sample_output,
         'hint': problem.hint,
+        'answer_key': problem.answer_key,
         'difficulty': problem.difficulty,
         'difficulty_text': difficulty_text,
         'knowledge_point': problem.knowledge_point or "",
@@ -1,17 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.core.cache import cache
 import json
 import datetime
-import random
+import time
 
 from own_models.models import Problem, CustomUser
-from own_models.student_practice import Submission, TestCase, TestCaseResult, StudentStatistics
+from own_models.student_practice import Submission, TestCaseResult, StudentStatistics
+from judge.conf import judge_setting
+from judge.events import EVENT_FIELDS, POLL_OVERLAP, hub
+from judge.languages import is_registered, language_choices
+from judge.objective import OBJECTIVE_TYPES, grade_answers
+from judge.task_queue import enqueue_submission
+from judge.trial_run import TrialRunBusy, create_trial_run, take_result
 from django.views.decorators.cache import cache_page
 
 # Student problem list page
@@ -168,8 +175,16 @@ def student_problem_detail(request, problem_id):
         user_id = request.session.get('user_id')
         user = CustomUser.objects.get(id=user_id)
         
+        # 获取用户最后一次提交的代码
+        last_submission = Submission.objects.filter(user=user, problem=problem).order_by('-created_at').first()
+        last_code = last_submission.code if last_submission else ""
+        
+        # 缓存按 Web 进程各自保存，评测进程无法让它失效：缓存键带上最后一次提交的 ID，新的提交在所有进程中都换用新键；
+        # 含有未完成提交的结果会随评测变化，不缓存
+        version = last_submission.id if last_submission else 0
+        
         # 获取用户对该题目的提交记录 - 使用缓存减少数据库查询
-        submissions_cache_key = f'user_{user_id}_problem_{problem_id}_submissions'
+        submissions_cache_key = f'user_{user_id}_problem_{problem_id}_submissions_{version}'
         submissions = cache.get(submissions_cache_key)
         
         if submissions is None:
@@ -181,18 +196,15 @@ def student_problem_detail(request, problem_id):
                 ).order_by('-created_at')[:20])  # 只获取最近20条记录并转换为列表
                 
                 # 缓存结果5分钟
-                cache.set(submissions_cache_key, submissions, 60 * 5)
+                if not any(submission.is_judging for submission in submissions):
+                    cache.set(submissions_cache_key, submissions, 60 * 5)
             except Exception as e:
                 # 如果查询失败，使用空列表
                 submissions = []
                 print(f"Error fetching submissions: {str(e)}")
         
-        # 获取用户最后一次提交的代码
-        last_submission = Submission.objects.filter(user=user, problem=problem).order_by('-created_at').first()
-        last_code = last_submission.code if last_submission else ""
-        
         # 使用缓存获取统计数据
-        stats_cache_key = f'user_{user_id}_problem_{problem_id}_stats'
+        stats_cache_key = f'user_{user_id}_problem_{problem_id}_stats_{version}'
         submission_stats = cache.get(stats_cache_key)
         
         if submission_stats is None:
@@ -203,11 +215,13 @@ def student_problem_detail(request, problem_id):
                     problem=problem
                 ).aggregate(
                     total=Count('id'),
-                    accepted=Count('id', filter=Q(status='accepted'))
+                    accepted=Count('id', filter=Q(status='accepted')),
+                    unfinished=Count('id', filter=Q(status__in=['pending', 'judging'])),
                 )
                 
                 # 缓存结果10分钟
-                cache.set(stats_cache_key, submission_stats, 60 * 10)
+                if not submission_stats['unfinished']:
+                    cache.set(stats_cache_key, submission_stats, 60 * 10)
             except Exception as e:
                 # 如果查询失败，使用默认值
                 submission_stats = {'total': 0, 'accepted': 0}
@@ -242,7 +256,8 @@ def student_problem_detail(request, problem_id):
             'last_code': last_code,
             'accepted_count': accepted_count,
             'problem_pass_rate': problem_pass_rate,
-            'user_pass_rate': user_pass_rate
+            'user_pass_rate': user_pass_rate,
+            'languages': language_choices(),
         })
     
     except Exception as e:
@@ -269,6 +284,20 @@ def student_submit_solution(request, problem_id):
     user_id = request.session.get('user_id')
     user = CustomUser.objects.get(id=user_id)
     
+    # 客观题不进入评测队列，直接与标准答案比较
+    if problem.problem_type in OBJECTIVE_TYPES:
+        answer = request.POST.get('answer', request.POST.get('code', '')).strip()
+        if not answer:
+            return JsonResponse({'success': False, 'message': 'Answer cannot be empty'})
+        submission = grade_answers(user.id, {problem.id: answer})[problem.id]
+        return JsonResponse({
+            'success': True,
+            'message': 'Answer submitted successfully',
+            'status': submission.status,
+            'score': submission.score,
+            'submission_id': submission.id
+        })
+    
     # 获取提交数据
     code = request.POST.get('code', '').strip()
     language = request.POST.get('language', '')
@@ -280,9 +309,12 @@ def student_submit_solution(request, problem_id):
     if not language:
         return JsonResponse({'success': False, 'message': 'Please select a programming language'})
     
+    if not is_registered(language):
+        return JsonResponse({'success': False, 'message': 'Unsupported programming language'})
+    
     try:
+        # 创建提交记录并放入评测队列，由独立的评测进程评测，请求立即返回
         with transaction.atomic():
-            # 创建提交记录
             submission = Submission.objects.create(
                 user=user,
                 problem=problem,
@@ -290,55 +322,121 @@ def student_submit_solution(request, problem_id):
                 language=language,
                 status='pending'
             )
-            
-            # Simulate code evaluation (in a real project, this should call an actual evaluation system)
-            # Here we randomly generate evaluation results for demonstration
-            import time
-            time.sleep(1)  # Simulate evaluation time
-            
-            # Randomly generate evaluation results
-            statuses = ['accepted', 'wrong_answer', 'time_limit_exceeded', 'runtime_error']
-            weights = [0.6, 0.25, 0.1, 0.05]  # 60% pass rate
-            result_status = random.choices(statuses, weights=weights)[0]
-            
-            # 更新提交结果
-            submission.status = result_status
-            submission.execution_time = random.randint(50, 2000)
-            submission.memory_used = random.randint(1024, 65536)
-            
-            if result_status != 'accepted':
-                error_messages = {
-                    'wrong_answer': 'Wrong Answer: Output does not match expected result',
-                    'time_limit_exceeded': 'Time Limit Exceeded: Program execution time exceeds limit',
-                    'runtime_error': 'Runtime Error: Exception occurred during program execution'
-                }
-                submission.error_message = error_messages.get(result_status, '未知错误')
-            
-            submission.save()
-            
-            # 更新题目统计
-            problem.submission_count += 1
-            if result_status == 'accepted':
-                problem.accepted_count += 1
-            problem.save()
-            
-            # 更新用户统计
-            stats, created = StudentStatistics.objects.get_or_create(user=user)
-            stats.update_statistics()
-            
-            return JsonResponse({
-                'success': True,
-                'message': 'Code submitted successfully',
-                'status': result_status,
-                'submission_id': submission.id,
-                'execution_time': submission.execution_time,
-                'memory_used': submission.memory_used,
-                'error_message': submission.error_message
-            })
+            enqueue_submission(submission)
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Code submitted successfully',
+            'status': submission.status,
+            'submission_id': submission.id
+        }, status=202)
             
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Submission failed: {str(e)}'})
 
+def student_run_code(request, problem_id):
+    """
+    试运行：用样例或自定义输入运行代码，不创建提交记录
+
+    POST 参数 code、language，可选 input（提供时使用自定义输入，否则使用题目样例）。
+    代码由评测进程以最高优先级运行，这里只放入评测队列并返回 trial_id，结果由 student_run_result 查询。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request method'})
+    if 'user_id' not in request.session or request.session.get('user_role') not in [1, 3]:
+        return JsonResponse({'success': False, 'message': 'User not logged in or insufficient permissions'})
+    problem = get_object_or_404(Problem, id=problem_id, is_active=True)
+    if problem.problem_type in OBJECTIVE_TYPES:
+        return JsonResponse({'success': False, 'message': 'This problem does not support code runs'})
+
+    code = request.POST.get('code', '').strip()
+    language = request.POST.get('language', '')
+    custom_input = request.POST.get('input')
+    if not code:
+        return JsonResponse({'success': False, 'message': 'Code cannot be empty'})
+    if not is_registered(language):
+        return JsonResponse({'success': False, 'message': 'Unsupported programming language'})
+
+    # 试运行取走结果后就被删除，两次试运行的间隔记在会话中
+    interval = judge_setting('JUDGE_TRIAL_RUN_INTERVAL_SECONDS')
+    last_run = request.session.get('last_trial_run_at')
+    if interval and last_run is not None and 0 <= time.time() - last_run < interval:
+        return JsonResponse({'success': False, 'message': 'Please wait a moment before running again'}, status=429)
+
+    try:
+        trial = create_trial_run(problem, language, code, request.session.get('user_id'), custom_input)
+    except TrialRunBusy as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=429)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Run failed: {str(e)}'})
+    request.session['last_trial_run_at'] = time.time()
+    return JsonResponse({'success': True, 'trial_id': trial.id, 'finished': False}, status=202)
+
+
+def student_run_result(request, problem_id, trial_id):
+    """
+    试运行的结果：未完成时 finished 为 False，完成时附带 judge.trial_run.run_trial 返回的各项
+
+    完成的结果只返回一次，返回后试运行记录即被删除。
+    """
+    if 'user_id' not in request.session or request.session.get('user_role') not in [1, 3]:
+        return JsonResponse({'success': False, 'message': 'User not logged in or insufficient permissions'}, status=403)
+    result = take_result(trial_id, problem_id, request.session.get('user_id'))
+    if result is None:
+        return JsonResponse({'success': False, 'message': 'Code run not found or expired'}, status=404)
+    return JsonResponse({'success': True, **result})
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def student_submission_events(request, problem_id):
+    """
+    当前用户在该题目上的提交状态推送（Server-Sent Events）
+
+    连接时先推送一次未完成提交的当前状态，之后推送状态变化，同一提交的同一状态只推送一次。
+    连接在 JUDGE_EVENTS_STREAM_SECONDS 秒后关闭，浏览器会自动重连；页面上没有未完成的提交时由浏览器关闭。
+    事件 ID 为连接建立的时间（毫秒），重连时浏览器通过 Last-Event-ID 带回，
+    断开期间出结果的提交在重连时补推，不会一直显示为评测中。
+    """
+    if 'user_id' not in request.session or request.session.get('user_role') not in [1, 3]:
+        return JsonResponse({'success': False, 'message': 'User not logged in or insufficient permissions'}, status=403)
+    user_id = request.session.get('user_id')
+    connected_at = timezone.now()
+    # 先订阅再读取当前状态，两者之间发生的变化不会丢失
+    subscription = hub.subscribe(user_id)
+    current = Q(status__in=['pending', 'judging'])
+    try:
+        last_connected = datetime.datetime.fromtimestamp(
+            int(request.headers.get('Last-Event-ID', '')) / 1000, tz=datetime.timezone.utc
+        )
+        current |= Q(updated_at__gte=last_connected - POLL_OVERLAP)
+    except (ValueError, OverflowError, OSError):
+        # 没有或无法解析的 Last-Event-ID（由客户端提供）按首次连接处理
+        pass
+    for row in Submission.objects.filter(current, user_id=user_id, problem_id=problem_id).values(*EVENT_FIELDS):
+        subscription.put(row)
+
+    def stream():
+        try:
+            yield f'retry: 1000\nid: {int(connected_at.timestamp() * 1000)}\n\n'
+            deadline = time.monotonic() + judge_setting('JUDGE_EVENTS_STREAM_SECONDS')
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=judge_setting('JUDGE_EVENTS_KEEPALIVE_SECONDS'))
+                if event is None:
+                    yield ': keepalive\n\n'
+                elif event['problem_id'] == problem_id:
+                    yield _sse('submission', event)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 关闭 nginx 的响应缓冲
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # Student submission detail page
 def student_submission_detail(request, submission_id):
     # 检查用户是否已登录且是学生或管理员
@@ -353,7 +451,7 @@ def student_submission_detail(request, submission_id):
     submission = get_object_or_404(Submission, id=submission_id, user=user)
     
     # 获取测试用例结果
-    test_results = TestCaseResult.objects.filter(submission=submission)
+    test_results = TestCaseResult.objects.filter(submission=submission).order_by('test_case_id')
     
     return render(request, 'student_practice/submission_detail.html', {
         'submission': submission,
@@ -114,6 +114,8 @@ DATABASES = {
         },
         "CONN_MAX_AGE": 60,          # 连接最大存活时间（秒）
         "ATOMIC_REQUESTS": False,    # 不要将每个请求包装在事务中
+        # 迁移没有覆盖全部模型（如试卷、比赛相关的表），测试数据库直接按模型建表
+        "TEST": {"MIGRATE": False},
     }
 }
 
@@ -168,4 +170,9 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),  # 确保这里指向你的静态文件目录
 ]
 
-DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
\ No newline at end of file
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# 评测系统配置，未列出的配置项见 judge/conf.py 中的默认值
+JUDGE_DEFAULT_TIME_LIMIT_MS = 1000
+JUDGE_DEFAULT_MEMORY_LIMIT_MB = 256
+JUDGE_POLL_INTERVAL = 0.5